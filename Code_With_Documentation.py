@@ -1,34 +1,455 @@
+# Startup profile
+# `StartupProfile` measures how long each part of the startup takes. It is imported before anything else so that,
+# when the bot is started with `python bot.py --profile-startup`, it can also time every module imported below.
+# The report is printed when the bot is ready; without the flag nothing is measured.
+from startup import StartupProfile
+
+profile = StartupProfile.from_argv()
+
+import asyncio  # Imports asyncio, used to load the command extensions in the background while the bot connects.
 import discord  # Imports the discord.py library to interact with the Discord API.
 from discord.ext import commands, tasks  # Imports additional modules to handle commands and looping tasks with discord.py.
-from webserver import keep_alive  # Imports a custom function `keep_alive` to keep the bot online.
-import datetime  # Imports the `datetime` library to handle and manipulate dates and times.
-import asyncio  # Imports asyncio for asynchronous functions, essential for non-blocking operations.
-from urllib import parse, request  # Imports modules to work with URLs and make HTTP requests.
-import re  # Imports the regular expressions module `re` to analyze text patterns.
+from webserver import app, keep_alive  # Imports the web application and the `keep_alive` function that keeps the bot online.
+from content import LOCALES_PATH, Locales, PageButton, context_catalog  # Imports the locale files location, the cache that turns each language into embeds and the page buttons.
+from presence import PresenceUpdater  # Imports the helper that updates the bot's status only when it changes.
+from cluster import ClusterBot, ClusterClient, launch_options, run_coordinator, worker_options  # Imports the helpers of the multi-process cluster mode.
+from slash import sync_tree  # Imports the function that registers the slash commands on Discord.
+from profiles import cache_report, client_options  # Imports the gateway/cache profiles and the startup cache report.
+from metrics import Metrics  # Imports the collector of command and gateway statistics.
+from throttle import Deduper, Throttle  # Imports the command cooldowns and the duplicate embed filter.
+from discord.ext.commands import CheckFailure, CommandNotFound, CommandOnCooldown, UserInputError  # Imports the cooldown, unknown command, permission and wrong input errors.
+from rcon import RconPool  # Imports the RCON client that runs commands on the Minecraft server.
+from relay import ChatRelay, LogTail  # Imports the relay that mirrors the Minecraft chat to a Discord channel and back.
+from sessions import SessionMonitor  # Imports the helper that times the connection to Discord and closes it properly on shutdown.
+from status import Network, StatusCache  # Imports the cached status of the Minecraft server.
+from guildconfig import GuildConfig  # Imports the per-server settings (prefix, server IP and store link).
+from outbox import Outbox, OutboxContext  # Imports the queue that sends the bot's messages by priority.
+from search import RULE_SECTIONS, RuleIndex, Suggester  # Imports the rule search and the command suggestions.
+from economy import EconomyImport  # Imports the mirror of the server's economy for +baltop and +balance.
+from auction import AuctionImport  # Imports the mirror of the server's auction house for +ah.
+from broadcast import Broadcaster  # Imports the sender of the staff announcements to every server.
+from watchdog import Watchdog  # Imports the watchdog that finds the code blocking the bot.
+import config  # Imports the bot settings (for example, the slash-only mode).
+import logging  # Imports logging to report command errors in the console.
+
+# Marks the end of the imports in the startup profile.
+profile.mark('imports')
 
 # Bot permission configuration (intents)
 # Discord allows bots to use "intents" to define which events and data they can access.
 # These intents control the bot’s permissions specifically, enhancing security and privacy on Discord.
 
-# First, an intents object called `intents` is created using `discord.Intents.default()`.
-# `discord.Intents.default()` returns a basic set of predefined permissions that the bot can use.
-intents = discord.Intents.default()
+# `log` is the logger used to report errors. Messages written with it appear in the console next to discord.py's own logs.
+log = logging.getLogger(__name__)
+
+# `client_options` (in `profiles.py`) builds the intents and the cache settings of the bot:
+# - The `message_content` permission allows the bot to read the text of messages, which is essential for `+` commands.
+#    Without it, the bot cannot see message content and therefore cannot respond to `+` commands.
+# - Every command is also available as a slash command (for example `/minor`), which does not need to read messages.
+#    When `config.SLASH_ONLY` is enabled (environment variable `BOT_SLASH_ONLY=1`), the bot skips `message_content`
+#    and also disables `guild_messages`, so Discord stops sending it every message written in every server.
+#    In that mode the `+` prefix only works in direct messages and users use the slash commands instead.
+# - `config.PROFILE` (environment variable `BOT_PROFILE`) chooses between two profiles:
+#    "default" uses `discord.Intents.default()`, a basic set of predefined permissions, and the usual caches.
+#    "lean" only enables the intents the commands need (servers and messages) and turns off the caches of
+#    messages and members, which no command reads. In thousands of servers this saves hundreds of MB of memory.
+# The result is a dictionary (`intents`, `max_messages`, ...) that is passed to the bot constructor below.
+options = client_options(config.PROFILE, config.SLASH_ONLY)
+
+# Per-server settings
+# Each Discord server can change the command prefix, the address shown by `+ip`, the store link shown by `+store` and
+# the channel that receives the staff's announcements with the `+settings` command, so one copy of the bot can serve
+# several communities.
+# The settings are saved in an SQLite database (`guilds.db`, or `BOT_GUILD_DB_PATH`). `GuildConfig` reads it in a
+# separate thread, so the bot never waits for the disk, and keeps the settings in memory (a cache of up to
+# `config.GUILD_CACHE_SIZE` servers): all of them are read once at startup (`guild_config.preload()`, in
+# `load_extensions` below) and servers that never changed anything are answered without reading the database.
+guild_config = GuildConfig(config.GUILD_DB_PATH, config.GUILD_CACHE_SIZE)
+
+
+# `guild_prefix` is called by discord.py for every message to know which prefix the commands use there.
+# In direct messages, and in servers that did not choose their own, it is the default `config.PREFIX` ("+").
+async def guild_prefix(bot, message):
+    if message.guild is None:
+        return config.PREFIX
+    return (await guild_config.get(message.guild.id)).prefix or config.PREFIX
 
-# Next, the specific `message_content` permission is enabled in the `intents` object.
-# `message_content` is a permission that allows the bot to access the text of messages in text channels.
-# This permission is essential for the bot to read and respond to user commands.
-# Without this permission, the bot cannot see message content and therefore cannot respond to commands.
-intents.message_content = True
 
 # Bot creation
 # The bot is initialized using the `commands.Bot` class from discord.py, setting the command prefix,
 # disabling the default help command, and assigning the configured intents.
 
-# - `command_prefix="+":` Defines the prefix users must use for bot commands, in this case `+`.
-#    This means that any command must start with `+`.
+# - `command_prefix=guild_prefix`: Defines the prefix users must use for bot commands, `+` unless the server chose
+#    another one. This means that any command must start with that prefix.
 # - `help_command=None`: Disables the default help command from `discord.py`, allowing for a custom help command to be defined.
-# - `intents=intents`: Passes the `intents` object with the configured permissions, necessary for the bot to function correctly with the established permissions.
-bot = commands.Bot(command_prefix="+", help_command=None, intents=intents)
+# - `**options`: Passes the intents and cache settings built above, necessary for the bot to function correctly with the established permissions.
+
+# Cluster mode
+# Large installations can run the bot as a cluster: `python bot.py --cluster --shards 8 --workers 2` starts a small
+# coordinator that launches 2 worker processes, each one running 4 of the 8 shards (gateway connections) with its own
+# event loop. The coordinator restarts workers that die and adds up statistics, such as the number of servers, for all of them.
+# The coordinator starts each worker by running this same file with some environment variables:
+# - `ClusterClient.from_environment()` returns the connection to the coordinator when this process is a worker,
+#    or `None` when the bot runs normally.
+# - `worker_options()` returns the shards this worker is responsible for (`shard_ids`) and the total (`shard_count`).
+# - `ClusterBot` is an `AutoShardedBot` (a bot that can run several shards) that asks the coordinator before connecting
+#    each shard, because Discord only allows starting one session every 5 seconds for the whole bot.
+cluster = ClusterClient.from_environment()
+if cluster:
+    bot = ClusterBot(command_prefix=guild_prefix, help_command=None, cluster=cluster, **options, **worker_options())
+else:
+    bot = commands.Bot(command_prefix=guild_prefix, help_command=None, **options)
+
+
+# Metrics
+# `Metrics` counts how many times each command runs, how many fail and how long each one takes (including sending
+# the reply), and follows the gateway: heartbeat latency, connections, disconnections, resumes and rate limits.
+# It also measures the event loop lag: how late the bot wakes up from a short sleep, which grows when something blocks the bot.
+# - `metrics.install()` subscribes to the bot events it needs.
+# - `app.router.add_get('/metrics', metrics.handle)` adds a `/metrics` page to the keep-alive web server.
+#    The page uses the Prometheus text format, so it can be collected by Prometheus or read in a browser.
+metrics = Metrics(bot)
+metrics.install()
+app.router.add_get('/metrics', metrics.handle)
+
+# Watchdog
+# Every command and event of the bot runs on one event loop, so a slow call that does not `await` (reading a big
+# file, a heavy computation, a library that is not asynchronous) freezes the whole bot, including its heartbeats.
+# `Watchdog` watches the loop from a separate thread: when the loop has been stuck for more than
+# `config.WATCHDOG_THRESHOLD` seconds (0.25 by default), it takes the stack of the code that is running, which shows
+# the command or task responsible.
+# - The stall is logged, and the `config.WATCHDOG_WORST` longest ones (10 by default) are kept. Staff can see them with
+#    `+debug loop`, and they are also shown in `/health` and counted in `/metrics`.
+# - With `BOT_WATCHDOG_PROFILE=loop.folded`, the thread also samples the loop every `config.WATCHDOG_PROFILE_INTERVAL`
+#    seconds and writes the stacks to that file every minute, in the "collapsed" format of flamegraph.pl and
+#    speedscope.app, to see where the bot spends its time. Sampling costs a little CPU, so it is off by default.
+# The watchdog starts in `setup_hook`, once the event loop is running.
+watchdog = Watchdog(threshold=config.WATCHDOG_THRESHOLD, size=config.WATCHDOG_WORST, profile=config.WATCHDOG_PROFILE or None, profile_interval=config.WATCHDOG_PROFILE_INTERVAL, worker=cluster.worker if cluster else None)
+metrics.collectors.extend(watchdog.collectors())
+
+
+# Gateway session
+# When a bot starts, it "identifies" with Discord: Discord creates a new session and sends the bot every server it is in.
+# - `SessionMonitor` prints the time from start until the bot is connected and shows it in `/metrics`
+#    (`bot_gateway_connect_seconds`), to follow how long restarts take.
+# - `sessions.handle_signals` makes the bot close its connection properly when the process is stopped with SIGTERM
+#    (for example by a service manager), like it already does with Ctrl+C, so Discord shows it offline right away.
+sessions = SessionMonitor(bot)
+metrics.collectors.extend(sessions.collectors())
+metrics.collectors.extend(guild_config.collectors())
+
+# Outbox
+# Discord only lets a bot send a few messages per channel every few seconds. When many messages are waiting, the
+# important ones should go first, so every message of the bot goes through `Outbox`, which keeps one queue per
+# channel with three priority lanes:
+# - moderation: the answers of the staff commands (`+mc`), which always go first;
+# - reply: the answers of the other commands;
+# - background: the messages the bot posts by itself, such as the Minecraft chat relay.
+# Discord tells the bot in each answer how many messages it can still send in that channel. When none are left, the
+# outbox waits until the limit resets instead of sending more, and it drops the background messages that have been
+# waiting for more than `config.OUTBOX_STALE` seconds (10 by default), since an old chat message is no longer useful.
+# Each channel holds at most `config.OUTBOX_QUEUE` waiting messages (50 by default).
+outbox = Outbox(bot, stale=config.OUTBOX_STALE, size=config.OUTBOX_QUEUE)
+metrics.collectors.extend(outbox.collectors())
+
+
+# Cooldowns
+# Nothing stops a user (or a raid) from typing `+major` fifty times a second, and every answer is a large embed
+# that uses the same Discord rate limit as the legitimate answers in that channel.
+# `Throttle` limits how many commands can be used in a period of time, separately per user, per channel and per server.
+# The limits come from `config.py` (for example, 5 commands every 10 seconds per user). When a limit is exceeded the
+# command fails with `CommandOnCooldown` before sending anything.
+# `bot.add_check` applies it to every command, both `+` commands and slash commands. The "Did you mean" answers to
+# mistyped commands are counted against the same limits with `throttle.allows`, so a typo cannot be spammed either.
+throttle = Throttle(config.COOLDOWN_USER, config.COOLDOWN_CHANNEL, config.COOLDOWN_GUILD)
+bot.add_check(throttle)
+
+# Duplicate filter
+# When the same embed (for example `+major`) was already posted in a channel a few seconds ago (`config.DEDUP_SECONDS`),
+# `Deduper` answers with a short reply pointing to that message instead of sending the whole embed again.
+deduper = Deduper(config.DEDUP_SECONDS)
+
+
+# Static content registry
+# Every static command (help, ip, rules, minor, major, ...) always answers with the same text or embed.
+# Instead of building a new `discord.Embed` on every call, `EmbedRegistry` builds each one a single time and
+# hands out the same object afterwards.
+# - `LOCALES_PATH` points to the `locales` folder, with one file per language: `en.json` (English) and `es.json`
+#    (Spanish). Each file has the titles, rule lines and footers of each command, and under `messages` every other
+#    text the commands answer with. Editing a file is enough to change a rule; the bot does not need to be restarted.
+# - `Locales` gives each language its own registry, so the embeds of every language are built once, like the
+#    English ones: answering in Spanish only picks another registry. A text missing from a language is taken from
+#    `config.LOCALE` (`en` by default).
+# - `locales.load()` reads the files for the first time and `locales.warm()` builds every payload of every language
+#    now, at startup, so the first user does not pay for it either.
+# - `locales.missing()` lists the texts of English that another language does not have yet, which are written to the
+#    console as warnings. `python content.py` shows the same list without starting the bot.
+# - The commands answer in the language chosen with `+settings language`, or else in the language of the user's
+#    Discord (slash commands) or of the server (`+` commands).
+# - `variables` fills the `{prefix}`, `{ip}` and `{store}` placeholders of the files with the defaults. A server that
+#    set its own prefix, address or store link gets its own copy of the payloads that use them, also built only once,
+#    so `+help` lists the commands with `!` in a server whose prefix is `!`. The messages of the commands, such as the
+#    usage of `+mc`, fill `{prefix}` the same way.
+# - `per_page` splits the long sections (`+major`, `+commands`) into pages of at most `config.PAGE_LINES` lines, also
+#    built here once. The first page is sent with ◀ ▶ buttons; clicking one edits that same message to show the other
+#    page instead of sending a new one.
+# - `bot.add_dynamic_items(PageButton)` tells discord.py how to answer those buttons. The section, page number and
+#    language are part of each button's ID, so the buttons of old messages keep working after the bot restarts.
+locales = Locales(LOCALES_PATH, default=config.LOCALE, variables={'prefix': config.PREFIX, 'ip': config.SERVER_IP, 'store': config.STORE_URL}, per_page=config.PAGE_LINES)
+locales.load()
+locales.warm()
+for locale, missing in locales.missing().items():
+    log.warning('The %s locale has no %s', locale, ', '.join(missing))
+bot.add_dynamic_items(PageButton)
+
+# Rule search
+# `+rule redstone clocks` looks for the rules (and in-game commands) that contain those words. Reading every rule
+# for every search would be slow, so `RuleIndex` builds an index once: for each word, the list of rule lines that
+# contain it, like the index at the end of a book. A search only reads the lists of the words in the question and
+# ranks the lines by how many of those words they contain and how rare each word is.
+# Misspelled words ("redstne") are replaced by the closest words of the rules before searching.
+# Each language has its own index of its own rules, built again when they change (see `reload_content` below).
+rule_indexes = {}
+for locale in locales:
+    rule_indexes[locale] = RuleIndex()
+    rule_indexes[locale].build(locales[locale])
+
+
+# Minecraft server status
+# `StatusCache` asks the Minecraft server whether it is online, using the same "Server List Ping" that the
+# Minecraft client uses to show servers in its multiplayer menu (players online, version, MOTD and latency).
+# The answer is kept in memory: the `+status` command reads it instead of connecting to the server every time.
+# - `config.MINECRAFT_HOST` and `config.MINECRAFT_PORT` are the address of the server (play.olympusland.xyz by default).
+# - `ttl` is how long an answer is considered recent. If it is older, the next `+status` waits for a new ping;
+#    if many users ask at the same time, they all share that single ping.
+# - `timeout` is how long to wait for a server before considering it offline.
+# - `history` is how many answers are kept per server (2880, a day at one ping every 30 seconds) to compute its
+#    uptime, peak players and average latency. They are stored in a fixed-size buffer: the oldest answer is
+#    overwritten by the newest one, so memory use never grows.
+# `Network` groups all the servers in `config.MINECRAFT_SERVERS` (the main server first, then the other backends)
+# and pings them at the same time, at most `config.STATUS_CONCURRENCY` at once.
+# `network.primary` is the main server, shown by `+status`.
+network = Network([
+    StatusCache(host, port, ttl=config.STATUS_INTERVAL * 2, timeout=config.STATUS_TIMEOUT, name=name, history=config.STATUS_HISTORY)
+    for name, host, port in config.MINECRAFT_SERVERS
+], concurrency=config.STATUS_CONCURRENCY)
+
+# Minecraft server console (RCON)
+# RCON lets the bot run console commands on the Minecraft server, such as `kick` or `say`.
+# `RconPool` keeps `config.RCON_POOL_SIZE` connections open (2 by default) and logs in only once per connection,
+# so a staff command does not wait for a new connection and login every time. Several commands can be sent on the
+# same connection without waiting for the previous answer; each answer is matched to its command by an ID.
+# If a connection drops, a new one is opened the next time a command is run.
+# The commands are disabled while `BOT_RCON_PASSWORD` is empty.
+rcon = RconPool(config.RCON_HOST, config.RCON_PORT, config.RCON_PASSWORD, size=config.RCON_POOL_SIZE)
+
+# Chat relay
+# When `BOT_RELAY_CHANNEL` (a channel ID) and `BOT_RELAY_LOG` (the path of the server's `logs/latest.log`) are set,
+# the Minecraft chat is posted in that channel, and messages written in the channel are shown in the game.
+# - `LogTail` reads the new lines of the log file as the server writes them.
+# - The chat lines wait in a queue and are posted together every `config.RELAY_FLUSH` seconds (2 by default):
+#    a busy chat sends one Discord message every 2 seconds instead of one per line, which would hit Discord's rate limits.
+# - The queue holds at most `config.RELAY_QUEUE` lines (500 by default). A line repeated several times in a row is
+#    merged into one with a counter ("(x3)"); if the queue is full, the oldest lines are dropped and the next message
+#    says how many were skipped, in the language of the relay channel's server.
+# - Messages from Discord are sent to the game with `tellraw` through the RCON connections above.
+# - The messages are posted through the background lane of the outbox, behind the answers to commands.
+# `metrics.collectors.extend` adds the queue size, the waiting time and the relayed lines to the `/metrics` page.
+relay = None
+if config.RELAY_CHANNEL and config.RELAY_LOG:
+    relay = ChatRelay(bot, config.RELAY_CHANNEL, LogTail(config.RELAY_LOG), rcon, flush=config.RELAY_FLUSH, size=config.RELAY_QUEUE, outbox=outbox)
+    metrics.collectors.extend(relay.collectors())
+
+# Economy
+# When `BOT_ECONOMY_PATH` is set, `+baltop` and `+balance <player>` show the balances of the players without logging in
+# to the server. The path points to an export of the server's economy: an SQLite database (read with the query in
+# `BOT_ECONOMY_QUERY`), a JSON file or a CSV file with the name and balance of each player.
+# - The export is read again every `config.ECONOMY_INTERVAL` seconds (60 by default), but only if the file changed,
+#    and it is read in a separate thread so a big file does not pause the bot.
+# - Only the players whose balance changed since the previous import are updated.
+# - The players are kept sorted by balance, so `+baltop` just takes the first 10 of the list and `+balance` finds the
+#    rank of a player with a binary search, instead of sorting every player each time.
+economy = None
+if config.ECONOMY_PATH:
+    economy = EconomyImport(config.ECONOMY_PATH, config.ECONOMY_QUERY)
+    metrics.collectors.extend(economy.collectors())
+
+# Auction house
+# When `BOT_AUCTION_PATH` is set, `+ah search <item>` and `+ah cheapest <item>` show the listings of the server's
+# auction house (`/ah` in game). The path points to an export of the listings: an SQLite database (read with the query
+# in `BOT_AUCTION_QUERY`), a CSV file or a JSON Lines file (one listing per line).
+# - The export is read again every `config.AUCTION_INTERVAL` seconds (5 minutes by default) if the file changed. It is
+#    read row by row in a separate thread, so a big export is never loaded whole into memory and does not pause the bot.
+# - The listings are grouped by item and sorted by price once per import, so the cheapest listings of an item are
+#    simply the first ones of its list; item names are found through an index of their words.
+# - After each import, the lowest price of each item is saved, for the last `config.AUCTION_HISTORY` imports, to show
+#    the price trend in `+ah cheapest`.
+auction = None
+if config.AUCTION_PATH:
+    auction = AuctionImport(config.AUCTION_PATH, config.AUCTION_QUERY, history=config.AUCTION_HISTORY)
+    metrics.collectors.extend(auction.collectors())
+
+# Announcements
+# `+broadcast <message>` (bot owners only) sends a message to every server the bot is in: to the channel chosen with
+# `+settings announcements`, or else to the server's system channel.
+# - Up to `config.BROADCAST_CONCURRENCY` messages (16 by default) are sent at the same time, at most
+#    `config.BROADCAST_RATE` per second (40 by default), below Discord's global limit of 50 requests per second.
+#    Each message goes through the background lane of the outbox, which waits when a channel is rate limited.
+# - Every `config.BROADCAST_INTERVAL` seconds (5 by default), the servers still left are saved to `broadcast.json`
+#    and the status message shows how many were reached, how many failed and how fast it goes. If the bot restarts in
+#    the middle, it continues with the servers left (see `start_background` below).
+broadcaster = Broadcaster(bot, config.BROADCAST_CHECKPOINT, concurrency=config.BROADCAST_CONCURRENCY, rate=config.BROADCAST_RATE, interval=config.BROADCAST_INTERVAL, worker=cluster.worker if cluster else None)
+metrics.collectors.extend(broadcaster.collectors())
+
+
+# Command extensions
+# The commands are not defined in this file but in the `cogs` folder, split by topic into discord.py "extensions":
+# - `cogs/info.py`: the commands that answer with a fixed text or embed from the `locales` files (help, a, store, ip,
+#    rules, minor, major, trial, clans, staff and commands), and `+rule`, which searches the rules.
+# - `cogs/server.py`: `+status` and `+network`, which answer with the last pings of the Minecraft servers.
+# - `cogs/staff.py`: the `+mc kick` and `+mc say` staff commands, which run on the Minecraft server through RCON.
+#    Only members of the staff server `config.STAFF_GUILD` (`BOT_STAFF_GUILD`) with a role whose ID is in
+#    `config.STAFF_ROLES` (`BOT_STAFF_ROLES`) can use them.
+# - `cogs/settings.py`: `+settings`, which shows and changes the prefix, the address, the store link, the
+#    announcements channel and the language of the server.
+#    Only members with the Manage Server permission can use it.
+# - `cogs/economy.py`: `+baltop` and `+balance`, which answer from the economy export.
+# - `cogs/auction.py`: `+ah search` and `+ah cheapest`, which answer from the auction house export.
+# - `cogs/broadcast.py`: `+broadcast`, which sends an announcement to every server. Only the users listed in
+#    `config.OWNER_IDS` (`BOT_OWNER_IDS`) can use it.
+# - `cogs/debug.py`: `+debug loop`, which shows the longest stalls of the event loop. Only staff can use it.
+# The extensions use the objects created above (the registries of each language, the duplicate filter, the server
+# status, the RCON connections, the server settings, the outbox, the rule indexes, the economy, the auction house, the
+# announcements and the watchdog), so they are attached to the bot, which every extension receives.
+bot.deduper = deduper
+bot.network = network
+bot.rcon = rcon
+bot.guild_config = guild_config
+bot.outbox = outbox
+bot.locales = locales
+bot.rule_indexes = rule_indexes
+bot.economy = economy
+bot.auction = auction
+bot.broadcaster = broadcaster
+bot.watchdog = watchdog
+
+EXTENSIONS = ('cogs.info', 'cogs.server', 'cogs.staff', 'cogs.settings', 'cogs.economy', 'cogs.auction', 'cogs.broadcast', 'cogs.debug')
+
+
+# Bot status
+# The bot shows a "playing" status with the number of servers it is in, for example "In 12 servers. Prefix +".
+# `status_text` builds that text; `len(bot.guilds)` gets the number of servers the bot is present in.
+# In cluster mode each worker only sees its own servers, so the total reported by the coordinator
+# (`cluster.totals['guilds']`) is used instead, as long as it has already been received.
+def status_text():
+    guilds = cluster.totals.get('guilds', len(bot.guilds)) if cluster else len(bot.guilds)
+    return "In " + str(guilds) + " servers. Prefix " + config.PREFIX
+
+# `PresenceUpdater` sends the status to Discord only when it is needed, instead of every few seconds:
+# - It waits 5 seconds after a change so that several joins or leaves in a row produce a single update.
+# - It does nothing if the text is the same as the one already shown.
+# - It sends at most one update every 15 seconds, because Discord limits how many messages a bot
+#   can send through its connection (120 per minute) and presence updates compete with everything else.
+presence = PresenceUpdater(bot, status_text)
+
+
+# `refresh_status` asks for a status update. In cluster mode, it first sends this worker's number of servers
+# to the coordinator, which answers with the total of the whole cluster.
+async def refresh_status():
+    if cluster:
+        await cluster.report(guilds=len(bot.guilds))
+    presence.schedule()
+
+
+# Loading the extensions
+# `load_extensions` first reads the settings of every server into memory with `guild_config.preload()`, then loads
+# each extension of `EXTENSIONS` with `bot.load_extension`, which imports the file and adds its commands to the bot.
+# `profile.step` measures how long each one takes.
+# Once all the commands exist, `Suggester.from_bot` indexes their names for the "Did you mean" suggestions
+# (see `on_command_error` below).
+# Then the slash commands have to be registered (uploaded) on Discord before users can see them.
+# `sync_tree` only uploads them when they changed since the last upload: it stores a hash (a fingerprint)
+# of the commands in `tree_hash.json` and skips the upload when the fingerprint is the same.
+# In cluster mode, only the first worker does it, since all workers have the same commands.
+# If Discord rejects the upload, the error is logged and the bot keeps running with the commands already registered.
+async def load_extensions():
+    with profile.step('load guild settings'):
+        await guild_config.preload()
+    for name in EXTENSIONS:
+        with profile.step('load ' + name):
+            await bot.load_extension(name)
+    bot.suggester = Suggester.from_bot(bot)
+    if cluster is None or cluster.worker == 0:
+        with profile.step('sync application commands'):
+            try:
+                await sync_tree(bot, config.TREE_HASH_PATH)
+            except discord.HTTPException:
+                log.exception('Could not sync the application commands')
+
+
+# Setup hook
+# `setup_hook` runs once, after the bot logs in and before it connects to Discord.
+# Instead of waiting for the extensions to load, `asyncio.create_task` loads them in the background, so the bot
+# connects to Discord at the same time. The task is kept in `bot.extensions_loaded` to wait for it when needed.
+# `watchdog.start()` starts watching the event loop, which is only running from this point.
+@bot.event
+async def setup_hook():
+    profile.mark('login')
+    watchdog.start()
+    bot.extensions_loaded = asyncio.create_task(load_extensions())
+    # Closes the connection to Discord properly when the process is asked to stop.
+    sessions.handle_signals(asyncio.get_running_loop())
+
+
+# Message event
+# discord.py runs `on_message` for every message the bot receives. `bot.get_context` finds the `+` command in it and
+# `bot.invoke` runs it; messages from bots (including this one) are ignored. A message that arrives while the
+# extensions are still loading waits for them first, so a command typed right after a restart is not lost.
+# `cls=OutboxContext` makes `ctx.send` in the commands go through the outbox, in the lane of the command.
+@bot.event
+async def on_message(message):
+    await bot.extensions_loaded
+    if message.author.bot:
+        return
+    await bot.invoke(await bot.get_context(message, cls=OutboxContext))
+
+
+# Background tasks
+# `start_background` starts everything that runs in the background once the bot is connected.
+# It is called from `on_ready`, which can run again after a reconnection, and `reload_content.is_running()` makes
+# sure it only runs once.
+async def start_background():
+    if reload_content.is_running():
+        return
+    # Waits until every extension is loaded (usually long before the bot is ready).
+    await bot.extensions_loaded
+    # With `--profile-startup`, prints how long the imports, the setup, the login, each extension and the
+    # connection to Discord took, and the slowest imported modules.
+    if profile.enabled:
+        profile.mark('gateway ready')
+        print(profile.report())
+    # `cache_report` prints how much the bot cached (servers, channels, members, messages, ...) and the memory
+    # used by the process, which shows the effect of the chosen profile.
+    print(cache_report(bot))
+    # Starts the task that watches the `locales` files for changes.
+    reload_content.start()
+    # Starts the task that pings the Minecraft server in the background.
+    poll_status.start()
+    # Starts the chat relay. In cluster mode the relay channel belongs to a single worker, so only the process that
+    # can see the channel starts it.
+    if relay and (cluster is None or bot.get_channel(config.RELAY_CHANNEL)):
+        relay.start()
+    # Starts the task that imports the economy export, if there is one.
+    if economy:
+        import_economy.start()
+    # Starts the task that imports the auction house export, if there is one.
+    if auction:
+        import_auction.start()
+    # Continues the announcement that was being sent when the bot stopped, if there was one.
+    broadcaster.resume()
+    # In cluster mode, starts the task that periodically reports this worker's servers to the coordinator.
+    if cluster and not report_cluster_stats.is_running():
+        report_cluster_stats.start()
 
 
 # Bot initialization event
@@ -47,401 +468,161 @@ async def on_ready():
     # This confirmation message helps verify that the connection was successful.
     print('The bot is ready')
 
+    # Discord clears the status when the bot starts a new session, so `presence.reset()` forgets the last
+    # text that was sent and `presence.schedule()` sends the current one.
+    presence.reset()
+    await refresh_status()
 
-# Looping task to change the bot's status
-# `@tasks.loop` is a decorator that allows creating a looping task that executes repeatedly with a specified interval.
-# In this case, an interval of 10 seconds is set, meaning the following function will execute every 10 seconds.
-
-@tasks.loop(seconds=10)
-async def change_status():
-    # The `change_status` function is defined as asynchronous (using `async def`), allowing the bot to perform this
-    # task in parallel with other tasks without blocking the processing of other events.
-
-    # `await` indicates that the bot should wait until `change_presence` completes its execution before continuing.
-    # This allows other tasks to execute while the bot waits, avoiding blockages in the bot’s operation.
-
-    # `bot.change_presence` is a method that changes the bot's visible status on Discord.
-    # Here, the bot shows a message in its "playing" status, indicating the number of servers it’s on and its command prefix.
-    # `len(bot.guilds)` gets the number of servers the bot is present in.
-    await bot.change_presence(activity=discord.Game(name="In " + str(len(bot.guilds)) + " servers. Prefix +"))
-
-
-# Help command that displays an embedded message with the list of bot commands.
-# `@bot.command` is a decorator that turns the following function into a command accessible to users.
-# By using `@bot.command(name='help')`, a `+help` command is defined that users can type to see the list of commands.
-
-@bot.command(name='help')
-async def help(ctx):
-    # The `help` function is asynchronous, allowing the bot to handle this task without blocking other operations.
-    # The function receives a `ctx` parameter, representing the context in which the command was called and allowing access
-    # to the channel where the response should be sent.
-
-    # Creates an "embed" or embedded message, which is a stylized message with a title, description, fields, and other details.
-    embed = discord.Embed(
-        title='Commands',  # Title of the embed
-        description='Here are the commands you can use to enhance your experience on Discord and in the Minecraft server.',
-        color=discord.Color.purple()  # Border color of the embed, in this case, purple
-    )
-    # Uses `add_field` to add each command with its description in the embed.
-    # The `name` parameter specifies the field name (command), and `value` specifies the description.
-    # `inline=False` makes each field appear on a separate line.
-    embed.add_field(name='`+ip`', value='Displays the IP of the Minecraft server.', inline=False)
-    embed.add_field(name='`+rules`', value='Classification of Minecraft server rules: major, minor, trial, and staff.', inline=False)
-    embed.add_field(name='`+minor`', value='Displays minor rules.', inline=False)
-    embed.add_field(name='`+major`', value='Displays major rules.', inline=False)
-    embed.add_field(name='`+trial`', value='Displays rules applicable in trial.', inline=False)
-    embed.add_field(name='`+staff`', value='Displays Minecraft staff rules.', inline=False)
-    embed.add_field(name='`+clans`', value='Displays clan rules.', inline=False)
-    embed.add_field(name='`+commands`', value='List of commands you can use on the server.', inline=False)
-    embed.add_field(name='`+store`', value='Donations and ranks page.', inline=False)
-    embed.add_field(name='Emergency', value='To report a bug or issue with OlympusBot, contact the creator Paulidex.', inline=False)
-    
-    # `embed.set_footer` allows including a section at the bottom of the embedded message.
-    # This footer can contain text that remains fixed and visible regardless of the fields added in the embed.
-    # In this case, the footer provides contact information, indicating how to communicate for hiring purposes.
-    embed.set_footer(text='For hiring, contact Paulidex#9510.')
-
-    # `ctx.send` is a method that sends a message to the channel where the command was called.
-    # `ctx` is the command context that contains information about how and where it was used, including the channel and user who executed the command.
-    # `await` is used to wait until the message is sent before continuing with other operations.
-
-    # Here, `embed=embed` indicates that the message will be sent in embed format, using the embedded message
-    # that was previously defined with the title, description, commands, and footer.
-    await ctx.send(embed=embed)
-
-# Command to verify if the bot is working
-# `@bot.command()` is a decorator that turns the following function into a bot command.
-# Here, a command without a specific name is defined, meaning its name will be the same as the function: `a`.
-# Users can type `+a` to execute this command and check if the bot is active.
-
-@bot.command()
-async def a(ctx):
-    # The `a` function is asynchronous, allowing the bot to respond to this command without blocking other operations.
-    # The `ctx` (context) parameter contains information about where the command was called,
-    # including the channel where the response should be sent.
-
-    # `ctx.send` is the method that sends a message to the channel from which the command was called.
-    # Here, the message "The bot is working correctly" is sent as confirmation that the bot is active.
-    # `await` is used to wait for the message to be sent before continuing with other operations.
-    await ctx.send('The bot is working correctly')  # Sends the confirmation message as a test.
-
-
-# Command to send a link to the donation store
-# `@bot.command()` is a decorator that turns the following function into a bot command.
-# Here, a command without a specific name is defined, so the command name will be the same as the function: `store`.
-# Users can type `+store` to execute this command and receive the link to the donation store.
-
-@bot.command()
-async def store(ctx):
-    # The `store` function is asynchronous, allowing the bot to respond to this command without blocking other operations.
-    # The `ctx` (context) parameter provides information about where the command was called,
-    # including the channel where the response should be sent.
-
-    # `ctx.send` is the method that sends a message to the channel where the command was called.
-    # Here, the message includes the link to the donation store with a friendly message.
-    # `await` is used to wait for the message to be sent before continuing with other operations.
-    await ctx.send('Visit our store to see our ranks and make donations ^.^ `https://olympusland.tebex.io`')
-
-
-# Command to display the IP of the Minecraft server
-# `@bot.command()` is a decorator that turns the following function into a bot command.
-# Since no name is specified, the command will use the function’s name: `ip`.
-# Users can type `+ip` to execute this command and receive the Minecraft server's IP address.
-
-@bot.command()
-async def ip(ctx):
-    # Defines `ip` as an asynchronous function to allow the bot to handle this command without interfering with other tasks.
-    # The `ctx` (context) parameter provides information about where and how the command was executed,
-    # allowing the bot to send the response in the same channel.
-
-    # `embed = discord.Embed(...)` creates an embedded message or "embed" to present the information in a stylized way.
-    # An embed is a visually structured message that allows including a title, description, color, and more,
-    # offering an organized and attractive format for users.
-
-    # In this embed:
-    # - `title='Minecraft Java Server'` sets the embed title, which will appear at the top and in a larger text size.
-    # - `description='...'` defines the main content, which includes the server IP and compatible versions.
-    # - `color=discord.Color.purple()` sets a purple color for the embed’s border, making it visually prominent.
-    embed = discord.Embed(
-        title='Minecraft Java Server',  # Title of the embed
-        description='Version 1.16.5 - 1.17.1: play.olympusland.xyz',  # Description with the server IP and versions
-        color=discord.Color.purple()  # Border color of the embed
-    )
-
-    # Adds a footer to the embed to provide additional context.
-    # `set_footer` places text at the bottom of the embed. In this case, the footer suggests that the user
-    # type `+help` to see other bot commands.
-    embed.set_footer(text='To see more commands, type +help')
-
-    # Sends the embedded message in the channel where the user executed the command.
-    # `ctx.send(embed=embed)` uses the context (`ctx`) to send the embed, displaying the server’s IP and versions in an organized way.
-    # `await` is used to wait for the message to be sent before continuing with other operations.
-    await ctx.send(embed=embed)
-
-
-# Command that shows how to access the server rules
-# `@bot.command()` is a decorator that turns the following function into a bot command.
-# Since no name is specified, the command will use the function’s name: `rules`.
-# Users can type `+rules` to execute this command and receive information on how to view the server rules.
-
-@bot.command()
-async def rules(ctx):
-    # The `rules` function is asynchronous, allowing the bot to respond to this command without blocking other operations.
-    # The `ctx` (context) parameter provides information about where the command was called,
-    # allowing the bot to send the response in the same channel.
-
-    # `ctx.send` is the method that sends a message to the channel where the command was activated.
-    # Here, the message informs that the rules are classified and suggests commands to view each type of rule.
-    # `await` is used to wait for the message to be sent before continuing with other operations.
-    await ctx.send('The rules are classified as severe, minor, staff, and trial. To view them, type `+major` `+minor` `+staff` `+trial` `+clans`')
-
-# Command that shows the server's minor rules
-# `@bot.command(name='minor')` converts the following function into a bot command accessible to users.
-# With `name='minor'`, the command is executed by typing `+minor`, allowing users to view the minor rules.
-
-@bot.command(name='minor')
-async def minor(ctx):
-    # Defines `minor` as an asynchronous function to allow the bot to handle this command without interfering with other tasks.
-    # The `ctx` (context) parameter provides information about where and how the command was executed,
-    # allowing the bot to send the response in the same channel.
-
-    # `embed = discord.Embed(...)` creates an embedded message or "embed" to present information in a stylized way.
-    # An embed is a visually structured message that allows for including a title, description, color, and more,
-    # offering an organized and attractive format for users.
-
-    # In this embed:
-    # - `title='Minor Rules'` sets the title of the embed, which will be displayed at the top in larger text.
-    # - `description='...'` defines the main content, listing the server's minor rules.
-    # - `color=discord.Color.purple()` sets a purple color for the embed’s border, making it visually prominent.
-    embed = discord.Embed(
-        title='Minor Rules',  # Title of the embed
-        description='1) Bugs are allowed, but you must first check with staff for permission. \n'
-                    '2) Do not insult other players if they do not appreciate it. \n'
-                    '3) Avoid flooding (e.g., helloooooo), spamming, or unnecessary text that clutters the chat. \n'
-                    '4) More than two Redstone clocks are not allowed; lag generators and chunk loaders are prohibited. \n'
-                    '5) Pets are private property; it is forbidden to kill them intentionally, even if they are in an unprotected area. \n'
-                    '6) Wolves cannot be used as weapons for PvP. \n'
-                    '7) In isolated issues, staff may hold meetings to find a fair solution. \n'
-                    '8) Do not leave a trial.',  # Minor rules listed in the description
-        color=discord.Color.purple()  # Purple border
-    )
-
-    # Adds a footer to the embed to provide additional context.
-    # `set_footer` places text at the bottom of the embed. Here it suggests the user type `+help` to see more commands
-    # and informs that the rules are cumulative.
-    embed.set_footer(text='Rules are cumulative, and punishments may vary depending on the person. For more commands, type +help')
-
-    # Sends the embedded message in the channel where the user executed the command.
-    # `ctx.send(embed=embed)` uses the context (`ctx`) to send the embed, which presents the rules in an organized way.
-    # `await` is used to wait for the message to be sent before continuing with other operations.
-    await ctx.send(embed=embed)
-
-
-# Command that shows the server's severe rules
-# `@bot.command(name='major')` converts the following function into a bot command accessible to users.
-# With `name='major'`, the command is executed by typing `+major`, allowing users to view the severe rules.
-
-@bot.command(name='major')
-async def major(ctx):
-    # Defines `major` as an asynchronous function to allow the bot to handle this command without interfering with other tasks.
-    # The `ctx` (context) parameter provides information about where and how the command was executed,
-    # allowing the bot to send the response in the same channel.
-
-    # `embed = discord.Embed(...)` creates an embedded message or "embed" to present information in a stylized way.
-    # The embed contains a title, a description with severe rules, and a border color.
-    embed = discord.Embed(
-        title='Severe Rules',  # Title of the embed
-        description='1) The use of multiple accounts is prohibited. If you want to change accounts, notify staff to transfer your items and properties. \n'
-                    '2) Hacks are prohibited and will be sanctioned with an IP ban. \n'
-                    '3) Destroying protected builds and stealing items in other players’ areas is prohibited. \n'
-                    '4) Any type of killing, such as tpakill and spawn kill, is prohibited. \n'
-                    '5) Exploiting bugs, such as duplication or mobility glitches, is prohibited. \n'
-                    '6) The use of hacks like xray or autoclick is prohibited. \n'
-                    '7) External links cannot be distributed without staff approval. \n'
-                    '8) Respect staff and avoid disrespectful behavior. \n'
-                    '9) Attempting to evade penalties will increase the punishment; helping another player evade is also punishable. \n'
-                    '10) Lying to staff is prohibited. \n'
-                    '11) Impersonating staff is prohibited. \n'
-                    '12) Do not use other cases to justify actions. \n'
-                    '13) Offensive messages and builds are prohibited. \n'
-                    '14) Escaping jail is prohibited. \n'
-                    '15) Do not help a prisoner escape jail. \n'
-                    '16) Do not explore, mine, or cut trees in the normal world; use /warp resources.',  # Severe rules listed in the description
-        color=discord.Color.purple()  # Purple color for the embed border
-    )
-
-    # Adds a footer to the embed to provide additional context.
-    # `set_footer` places text at the bottom of the embed. Here it suggests the user type `+help` to see more commands
-    # and informs that the rules are cumulative.
-    embed.set_footer(text='Rules are cumulative, and punishments may vary depending on the person. For more commands, type +help')
-
-    # Sends the embedded message in the channel where the user executed the command.
-    # `ctx.send(embed=embed)` uses the context (`ctx`) to send the embed, which presents the rules in an organized way.
-    # `await` is used to wait for the message to be sent before continuing with other operations.
-    await ctx.send(embed=embed)
-
-
-# Command that shows the trial rules
-# `@bot.command(name='trial')` converts the following function into a bot command accessible to users.
-# With `name='trial'`, the command is executed by typing `+trial`, allowing users to view the rules applicable in trials.
-
-@bot.command(name='trial')
-async def trial(ctx):
-    # Defines `trial` as an asynchronous function to allow the bot to handle this command without interfering with other tasks.
-    # The `ctx` (context) parameter provides information about where and how the command was executed,
-    # allowing the bot to send the response in the same channel.
-
-    # `embed = discord.Embed(...)` creates an embedded message or "embed" to present information in a stylized way.
-    # The embed contains a title, a description with trial rules, and a border color.
-    embed = discord.Embed(
-        title='Trial Rules',  # Title of the embed
-        description='1) Do not interrupt the trial. \n'
-                    '2) Present evidence. \n'
-                    '3) Do not waste the judge’s time. \n'
-                    '4) Read the rules before requesting a trial. \n'
-                    '5) Only witnesses and involved parties are allowed in the trial. \n'
-                    '6) Only Owners, Admins, and Mods can act as judges. \n'
-                    '7) Both parties (accused and accusers) must be present.',  # Trial rules listed in the description
-        color=discord.Color.purple()  # Purple color for the embed border
-    )
-
-    # Adds a footer to the embed to provide additional context.
-    # `set_footer` places text at the bottom of the embed. Here it suggests the user type `+help` to see more commands
-    # and informs that the rules are cumulative.
-    embed.set_footer(text='Rules are cumulative, and punishments may vary depending on the person. For more commands, type +help')
-
-    # Sends the embedded message in the channel where the user executed the command.
-    # `ctx.send(embed=embed)` uses the context (`ctx`) to send the embed, which presents the rules in an organized way.
-    # `await` is used to wait for the message to be sent before continuing with other operations.
-    await ctx.send(embed=embed)
-
-
-# Command that shows clan rules
-# `@bot.command(name='clans')` converts the following function into a bot command accessible to users.
-# With `name='clans'`, the command is executed by typing `+clans`, allowing users to view the rules applicable to clans.
-
-@bot.command(name='clans')
-async def clans(ctx):
-    # Defines `clans` as an asynchronous function to allow the bot to handle this command without interfering with other tasks.
-    # The `ctx` (context) parameter provides information about where and how the command was executed,
-    # allowing the bot to send the response in the same channel.
-
-    # `embed = discord.Embed(...)` creates an embedded message or "embed" to present information in a stylized way.
-    # The embed contains a title, a description with clan rules, and a border color.
-    embed = discord.Embed(
-        title='Clan Rules',  # Title of the embed
-        description='1) Any type of PvP is allowed if both players belong to a clan. \n'
-                    '2) Griefing is allowed but only to clan bases.',  # Clan rules listed in the description
-        color=discord.Color.purple()  # Purple color for the embed border
-    )
-
-    # Adds a footer to the embed to provide additional context.
-    # `set_footer` places text at the bottom of the embed. Here it suggests the user type `+help` to see more commands
-    # and informs that the rules are cumulative.
-    embed.set_footer(text='Rules are cumulative, and punishments may vary depending on the person. For more commands, type +help')
-
-    # Sends the embedded message in the channel where the user executed the command.
-    # `ctx.send(embed=embed)` uses the context (`ctx`) to send the embed, which presents the rules in an organized way.
-    # `await` is used to wait for the message to be sent before continuing with other operations.
-    await ctx.send(embed=embed)
-
-
-# Command that shows staff rules
-# `@bot.command(name='staff')` converts the following function into a bot command accessible to users.
-# With `name='staff'`, the command is executed by typing `+staff`, allowing users to view the rules applicable to staff.
-
-@bot.command(name='staff')
-async def staff(ctx):
-    # Defines `staff` as an asynchronous function to allow the bot to handle this command without interfering with other tasks.
-    # The `ctx` (context) parameter provides information about where and how the command was executed,
-    # allowing the bot to send the response in the same channel.
-
-    # `embed = discord.Embed(...)` creates an embedded message or "embed" to present information in a stylized way.
-    # The embed contains a title, a description with staff rules, and a border color.
-    embed = discord.Embed(
-        title='Staff Rules',  # Title of the embed
-        description='1) Ban complaints are handled via Discord. \n'
-                    '2) Staff-exclusive items should not fall into players’ hands; both involved will be sanctioned if this happens. \n'
-                    '3) Respond to players’ questions. \n'
-                    '4) Greet new players. \n'
-                    '5) Do not abuse power. \n'
-                    '6) Only Owners, Admins, and Mods can sanction. \n'
-                    '7) Treat all players equally. \n'
-                    '8) Do not give players creative items; only survival items are allowed. \n'
-                    '9) Be neutral in trials. \n'
-                    '10) Unjustified inactivity may result in staff dismissal. \n'
-                    '11) Do not reveal upcoming features to players.',  # Staff rules listed in the description
-        color=discord.Color.purple()  # Purple color for the embed border
-    )
-
-    # Adds a footer to the embed to provide additional context.
-    # `set_footer` places text at the bottom of the embed. Here it suggests the user type `+help` to see more commands
-    # and informs that the rules are cumulative.
-    embed.set_footer(text='Rules are cumulative, and punishments may vary depending on the person. For more commands, type +help')
-
-    # Sends the embedded message in the channel where the user executed the command.
-    # `ctx.send(embed=embed)` uses the context (`ctx`) to send the embed, which presents the rules in an organized way.
-    # `await` is used to wait for the message to be sent before continuing with other operations.
-    await ctx.send(embed=embed)
-
-
-# Command that shows the available commands on the server
-# `@bot.command(name='commands')` converts the following function into a bot command accessible to users.
-# With `name='commands'`, the command is executed by typing `+commands`, allowing users to view a list of available server commands.
-
-@bot.command(name='commands')
-async def commands(ctx):
-    # Defines `commands` as an asynchronous function to allow the bot to handle this command without interfering with other tasks.
-    # The `ctx` (context) parameter provides information about where and how the command was executed,
-    # allowing the bot to send the response in the same channel.
-
-    # `embed = discord.Embed(...)` creates an embedded message or "embed" to present information in a stylized way.
-    # The embed contains a title, a description with the server command list, and a border color.
-    embed = discord.Embed(
-        title='Commands you can use on the server',  # Title of the embed
-        description='/tpa (teleport to another player) \n'
-                    '/tpaccept (accept teleport request) \n'
-                    '/tpahere (bring another player) \n'
-                    '/back (return to the previous location) \n'
-                    '/sit (sit down) \n'
-                    '/afk (go AFK) \n'
-                    '/sethome (mark a home) \n'
-                    '/home "name" (go to a marked home) \n'
-                    '/delhome "name" (delete a home) \n'
-                    '/ps add "name" (add a person to your protection stone) \n'
-                    '/ps remove "name" (remove a person from your stone) \n'
-                    '/store (see the store) \n'
-                    '/stones (information about the protection stone) \n'
-                    '/jobs (to earn money) \n'
-                    '/jobs join "name" (join a job) \n'
-                    '/jobs remove "name" (leave a job) \n'
-                    '/ec (access ender chest) \n'
-                    '/pay "amount" "nickname" (pay another player) \n'
-                    '/money (see your money) \n'
-                    '/baltop (view the richest people on Olympus) \n'
-                    '/ah (auction house) \n'
-                    '/ah sell "price" (sell item in hand in ah) \n'
-                    '/store (buy stones, turrets, etc.) \n'
-                    '/warp resources (for material gathering, building here is not recommended) \n'
-                    '/warp slaughterhouse (get food) \n'
-                    '/warp wedding (church) \n\n'
-                    'You can create elevators by placing a quartz block with a redstone block underneath.',  # Server commands listed in the description
-        color=discord.Color.purple()  # Purple color for the embed border
-    )
-
-    # Adds a footer to the embed.
-    # `set_footer` places text at the bottom of the embed. Here it suggests the user type `+help` to see more commands.
-    embed.set_footer(text='To see more commands, type +help')
-
-    # Sends the embedded message in the channel where the user executed the command.
-    # `ctx.send(embed=embed)` uses the context (`ctx`) to send the embed, which presents the commands in an organized way.
-    # `await` is used to wait for the message to be sent before continuing with other operations.
-    await ctx.send(embed=embed)
-
-
-# Calls the keep_alive function to keep the bot online on a web server.
-keep_alive()
-
-# Starts the bot. Replace "BOT_TOKEN" with the actual token of the Discord bot.
-bot.run("BOT_TOKEN")
+    # `on_ready` can run again after a reconnection; the background tasks are only started the first time.
+    await start_background()
+
+
+# Shard ready event
+# When the bot runs several shards, `on_shard_ready` runs each time one of them connects.
+# Like in `on_ready`, the status of that shard was cleared by Discord and has to be sent again.
+@bot.event
+async def on_shard_ready(shard_id):
+    presence.reset(shard_id)
+    presence.schedule()
 
+
+# Server join and leave events
+# `on_guild_join` runs when the bot is added to a server and `on_guild_remove` when it is removed from one.
+# These are the only moments in which the number of servers changes, so they are the only moments
+# in which the status needs to be updated.
+@bot.event
+async def on_guild_join(guild):
+    await refresh_status()
+
+
+@bot.event
+async def on_guild_remove(guild):
+    await refresh_status()
+
+
+# Looping task that pings the Minecraft server
+# Every `config.STATUS_INTERVAL` seconds (30 by default), `network.refresh()` pings every server and stores
+# the answers, so the `+status` and `+network` commands always find recent answers ready.
+@tasks.loop(seconds=config.STATUS_INTERVAL)
+async def poll_status():
+    await network.refresh()
+
+
+# Command error event
+# `on_command_error` runs when a command fails: an unknown command, a missing permission or an error in the code.
+# `metrics.command_failed` counts the error for the `/metrics` page, and `log.error` writes it to the console with
+# its traceback, as discord.py does when this event is not defined.
+# Cooldown errors are expected, so they are not written to the console. A `+` command over the limit is simply
+# ignored (answering would spend the rate limit the cooldown protects), but a slash command must always be answered,
+# so the user gets a message only they can see (`ephemeral=True`) with the time left.
+# `CheckFailure` means a user without permission tried a staff command; they are told so instead of logging an error.
+# `UserInputError` means the command was typed wrong, for example `+balance` without a player name or `+ah search`
+# without an item. The user gets the usage of the command, such as "Usage: `+balance <player>`", instead of an error.
+# `CommandNotFound` means the message started with the prefix but no command has that name, often a typo such as
+# `+majr`. `bot.suggester.suggest` finds the command names closest to it (within one or two wrong letters, using a
+# BK-tree, or sharing most groups of three letters, using a trigram index) and the bot answers "Did you mean `+major`?".
+# When nothing is close, for example "+1" in a normal conversation, or the user is over the cooldown, the bot stays
+# silent.
+# These answers are written in the language of the server or the user, from the `messages` of the `locales` files.
+@bot.event
+async def on_command_error(ctx, error):
+    metrics.command_failed(ctx, error)
+    if isinstance(error, CommandOnCooldown):
+        if ctx.interaction:
+            registry, _ = await context_catalog(ctx)
+            await ctx.send(registry.text('cooldown', seconds=round(error.retry_after, 1)), ephemeral=True)
+        return
+    if isinstance(error, CheckFailure):
+        registry, _ = await context_catalog(ctx)
+        await ctx.send(registry.text('forbidden'), ephemeral=True)
+        return
+    if isinstance(error, UserInputError):
+        registry, _ = await context_catalog(ctx)
+        usage = (ctx.clean_prefix + ctx.command.qualified_name + ' ' + ctx.command.signature).strip()
+        await ctx.send(registry.text('usage', usage=usage), ephemeral=True)
+        return
+    if isinstance(error, CommandNotFound):
+        suggestions = bot.suggester.suggest(ctx.invoked_with)
+        if suggestions and throttle.allows(ctx):
+            registry, _ = await context_catalog(ctx)
+            await ctx.send(registry.text('did_you_mean', commands=registry.text('or').join('`' + ctx.prefix + name + '`' for name in suggestions)))
+        return
+    log.error('Ignoring exception in command %s', ctx.command, exc_info=error)
+
+
+# Looping task that keeps the cluster total up to date
+# Servers joined or left by the other workers do not trigger events in this process, so every 30 seconds
+# the worker reports its count again and receives the new total.
+@tasks.loop(seconds=30)
+async def report_cluster_stats():
+    await refresh_status()
+
+
+# Looping task that reloads the content file
+# Every 5 seconds, `locales.poll()` checks the modification time and size of each file of the `locales` folder.
+# A file is only read again when one of them changed, and only the sections whose text actually changed
+# are rebuilt, in the languages that use them; the other embeds stay cached. If the file contains an error (for example while it is being
+# saved), the problem is logged and the previous content keeps being used.
+# `poll()` returns the names of the sections that changed in each language, which are printed to the console.
+# When a rule section changed, the rule search index of that language is built again.
+
+@tasks.loop(seconds=5)
+async def reload_content():
+    for locale, changed in locales.poll().items():
+        print('Reloaded content (' + locale + '): ' + ', '.join(changed))
+        if set(changed) & set(RULE_SECTIONS):
+            rule_indexes[locale].build(locales[locale])
+
+
+# Looping task that imports the economy export
+# `economy.poll()` reads the export when it changed and returns how many balances changed, which is printed to the
+# console. If the file cannot be read, the previous balances keep being used.
+
+@tasks.loop(seconds=config.ECONOMY_INTERVAL)
+async def import_economy():
+    changes = await economy.poll()
+    if changes:
+        print('Imported economy: ' + str(changes) + ' balances changed')
+
+
+# Looping task that imports the auction house export
+# `auction.poll()` reads the export when it changed. The commands keep answering from the previous listings until the
+# new ones are ready. If the file cannot be read, the previous listings keep being used.
+
+@tasks.loop(seconds=config.AUCTION_INTERVAL)
+async def import_auction():
+    if await auction.poll():
+        print('Imported auction house: ' + str(auction.index.listings) + ' listings')
+
+
+# Token of the Discord bot. Replace "BOT_TOKEN" with the actual token of the bot.
+TOKEN = "BOT_TOKEN"
+
+# Everything below only runs when this file is started directly (`python Code_With_Documentation.py`).
+# When another program imports it, for example the benchmark in the `bench` folder, it gets the bot with all of its
+# commands without connecting to Discord.
+if __name__ == '__main__':
+    # `launch_options()` reads `--cluster`, `--shards` and `--workers` from the command line.
+    # It returns `None` when the bot was started normally.
+    launch = launch_options()
+
+    # Starts the bot. With `--cluster`, this process becomes the coordinator and the workers run the bot;
+    # otherwise `bot.run` connects to Discord as usual.
+    # When `--shards` is not given, the coordinator uses the number of shards recommended by Discord.
+
+    # Calls the keep_alive function to keep the bot online on a web server.
+    # - The coordinator has no bot of its own, so `keep_alive()` runs the web server in a background thread.
+    # - A normal bot passes itself (`keep_alive(bot)`): the web server then runs on the bot's event loop and its
+    #    `/health` page reports whether the bot is connected to Discord and its latency.
+    # - Only one process can listen on each port, so cluster workers use ports 8081, 8082, ... for their own
+    #    `/health` and `/metrics` pages, while the coordinator keeps port 8080.
+    if launch:
+        keep_alive()
+        run_coordinator(TOKEN, __file__, **launch)
+    else:
+        keep_alive(bot, port=8081 + cluster.worker if cluster else 8080)
+        # Marks the end of the setup (creating the bot and loading the content) in the startup profile.
+        profile.mark('setup')
+        bot.run(TOKEN)
+        # Stops the watchdog once the bot is closed, which writes the loop profile one last time when it is on.
+        watchdog.stop()
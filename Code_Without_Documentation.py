@@ -1,190 +1,260 @@
+from startup import StartupProfile
+
+profile = StartupProfile.from_argv()
+
+import asyncio
 import discord
 from discord.ext import commands, tasks
-from webserver import keep_alive
-import datetime
-import asyncio
-from urllib import parse, request
-import re
+from webserver import app, keep_alive
+from content import LOCALES_PATH, Locales, PageButton, context_catalog
+from presence import PresenceUpdater
+from cluster import ClusterBot, ClusterClient, launch_options, run_coordinator, worker_options
+from slash import sync_tree
+from profiles import cache_report, client_options
+from metrics import Metrics
+from throttle import Deduper, Throttle
+from status import Network, StatusCache
+from rcon import RconPool
+from relay import ChatRelay, LogTail
+from sessions import SessionMonitor
+from guildconfig import GuildConfig
+from outbox import Outbox, OutboxContext
+from search import RULE_SECTIONS, RuleIndex, Suggester
+from economy import EconomyImport
+from auction import AuctionImport
+from broadcast import Broadcaster
+from watchdog import Watchdog
+from discord.ext.commands import CheckFailure, CommandNotFound, CommandOnCooldown, UserInputError
+import config
+import logging
+
+profile.mark('imports')
+
+log = logging.getLogger(__name__)
+
+options = client_options(config.PROFILE, config.SLASH_ONLY)
+
+guild_config = GuildConfig(config.GUILD_DB_PATH, config.GUILD_CACHE_SIZE)
+
+async def guild_prefix(bot, message):
+    if message.guild is None:
+        return config.PREFIX
+    return (await guild_config.get(message.guild.id)).prefix or config.PREFIX
+
+cluster = ClusterClient.from_environment()
+if cluster:
+    bot = ClusterBot(command_prefix=guild_prefix, help_command=None, cluster=cluster, **options, **worker_options())
+else:
+    bot = commands.Bot(command_prefix=guild_prefix, help_command=None, **options)
+
+metrics = Metrics(bot)
+metrics.install()
+app.router.add_get('/metrics', metrics.handle)
+
+watchdog = Watchdog(threshold=config.WATCHDOG_THRESHOLD, size=config.WATCHDOG_WORST, profile=config.WATCHDOG_PROFILE or None, profile_interval=config.WATCHDOG_PROFILE_INTERVAL, worker=cluster.worker if cluster else None)
+metrics.collectors.extend(watchdog.collectors())
+
+sessions = SessionMonitor(bot)
+metrics.collectors.extend(sessions.collectors())
+metrics.collectors.extend(guild_config.collectors())
+
+outbox = Outbox(bot, stale=config.OUTBOX_STALE, size=config.OUTBOX_QUEUE)
+metrics.collectors.extend(outbox.collectors())
+
+throttle = Throttle(config.COOLDOWN_USER, config.COOLDOWN_CHANNEL, config.COOLDOWN_GUILD)
+bot.add_check(throttle)
+deduper = Deduper(config.DEDUP_SECONDS)
+
+locales = Locales(LOCALES_PATH, default=config.LOCALE, variables={'prefix': config.PREFIX, 'ip': config.SERVER_IP, 'store': config.STORE_URL}, per_page=config.PAGE_LINES)
+locales.load()
+locales.warm()
+for locale, missing in locales.missing().items():
+    log.warning('The %s locale has no %s', locale, ', '.join(missing))
+bot.add_dynamic_items(PageButton)
+
+rule_indexes = {}
+for locale in locales:
+    rule_indexes[locale] = RuleIndex()
+    rule_indexes[locale].build(locales[locale])
+
+network = Network([
+    StatusCache(host, port, ttl=config.STATUS_INTERVAL * 2, timeout=config.STATUS_TIMEOUT, name=name, history=config.STATUS_HISTORY)
+    for name, host, port in config.MINECRAFT_SERVERS
+], concurrency=config.STATUS_CONCURRENCY)
+
+rcon = RconPool(config.RCON_HOST, config.RCON_PORT, config.RCON_PASSWORD, size=config.RCON_POOL_SIZE)
+
+relay = None
+if config.RELAY_CHANNEL and config.RELAY_LOG:
+    relay = ChatRelay(bot, config.RELAY_CHANNEL, LogTail(config.RELAY_LOG), rcon, flush=config.RELAY_FLUSH, size=config.RELAY_QUEUE, outbox=outbox)
+    metrics.collectors.extend(relay.collectors())
+
+economy = None
+if config.ECONOMY_PATH:
+    economy = EconomyImport(config.ECONOMY_PATH, config.ECONOMY_QUERY)
+    metrics.collectors.extend(economy.collectors())
+
+auction = None
+if config.AUCTION_PATH:
+    auction = AuctionImport(config.AUCTION_PATH, config.AUCTION_QUERY, history=config.AUCTION_HISTORY)
+    metrics.collectors.extend(auction.collectors())
+
+broadcaster = Broadcaster(bot, config.BROADCAST_CHECKPOINT, concurrency=config.BROADCAST_CONCURRENCY, rate=config.BROADCAST_RATE, interval=config.BROADCAST_INTERVAL, worker=cluster.worker if cluster else None)
+metrics.collectors.extend(broadcaster.collectors())
 
-intents = discord.Intents.default()
-intents.message_content = True
+bot.deduper = deduper
+bot.network = network
+bot.rcon = rcon
+bot.guild_config = guild_config
+bot.outbox = outbox
+bot.locales = locales
+bot.rule_indexes = rule_indexes
+bot.economy = economy
+bot.auction = auction
+bot.broadcaster = broadcaster
+bot.watchdog = watchdog
 
-bot = commands.Bot(command_prefix="+", help_command=None, intents=intents)
+EXTENSIONS = ('cogs.info', 'cogs.server', 'cogs.staff', 'cogs.settings', 'cogs.economy', 'cogs.auction', 'cogs.broadcast', 'cogs.debug')
+
+def status_text():
+    guilds = cluster.totals.get('guilds', len(bot.guilds)) if cluster else len(bot.guilds)
+    return "In " + str(guilds) + " servers. Prefix " + config.PREFIX
+
+presence = PresenceUpdater(bot, status_text)
+
+async def refresh_status():
+    if cluster:
+        await cluster.report(guilds=len(bot.guilds))
+    presence.schedule()
+
+async def load_extensions():
+    with profile.step('load guild settings'):
+        await guild_config.preload()
+    for name in EXTENSIONS:
+        with profile.step('load ' + name):
+            await bot.load_extension(name)
+    bot.suggester = Suggester.from_bot(bot)
+    if cluster is None or cluster.worker == 0:
+        with profile.step('sync application commands'):
+            try:
+                await sync_tree(bot, config.TREE_HASH_PATH)
+            except discord.HTTPException:
+                log.exception('Could not sync the application commands')
+
+@bot.event
+async def setup_hook():
+    profile.mark('login')
+    watchdog.start()
+    bot.extensions_loaded = asyncio.create_task(load_extensions())
+    sessions.handle_signals(asyncio.get_running_loop())
+
+@bot.event
+async def on_message(message):
+    await bot.extensions_loaded
+    if message.author.bot:
+        return
+    await bot.invoke(await bot.get_context(message, cls=OutboxContext))
+
+async def start_background():
+    if reload_content.is_running():
+        return
+    await bot.extensions_loaded
+    if profile.enabled:
+        profile.mark('gateway ready')
+        print(profile.report())
+    print(cache_report(bot))
+    reload_content.start()
+    poll_status.start()
+    if relay and (cluster is None or bot.get_channel(config.RELAY_CHANNEL)):
+        relay.start()
+    if economy:
+        import_economy.start()
+    if auction:
+        import_auction.start()
+    broadcaster.resume()
+    if cluster and not report_cluster_stats.is_running():
+        report_cluster_stats.start()
 
 @bot.event
 async def on_ready():
     print('The bot is ready')
+    presence.reset()
+    await refresh_status()
+    await start_background()
+
+@bot.event
+async def on_shard_ready(shard_id):
+    presence.reset(shard_id)
+    presence.schedule()
+
+@bot.event
+async def on_guild_join(guild):
+    await refresh_status()
+
+@bot.event
+async def on_guild_remove(guild):
+    await refresh_status()
+
+@tasks.loop(seconds=config.STATUS_INTERVAL)
+async def poll_status():
+    await network.refresh()
+
+@bot.event
+async def on_command_error(ctx, error):
+    metrics.command_failed(ctx, error)
+    if isinstance(error, CommandOnCooldown):
+        if ctx.interaction:
+            registry, _ = await context_catalog(ctx)
+            await ctx.send(registry.text('cooldown', seconds=round(error.retry_after, 1)), ephemeral=True)
+        return
+    if isinstance(error, CheckFailure):
+        registry, _ = await context_catalog(ctx)
+        await ctx.send(registry.text('forbidden'), ephemeral=True)
+        return
+    if isinstance(error, UserInputError):
+        registry, _ = await context_catalog(ctx)
+        usage = (ctx.clean_prefix + ctx.command.qualified_name + ' ' + ctx.command.signature).strip()
+        await ctx.send(registry.text('usage', usage=usage), ephemeral=True)
+        return
+    if isinstance(error, CommandNotFound):
+        suggestions = bot.suggester.suggest(ctx.invoked_with)
+        if suggestions and throttle.allows(ctx):
+            registry, _ = await context_catalog(ctx)
+            await ctx.send(registry.text('did_you_mean', commands=registry.text('or').join('`' + ctx.prefix + name + '`' for name in suggestions)))
+        return
+    log.error('Ignoring exception in command %s', ctx.command, exc_info=error)
+
+@tasks.loop(seconds=30)
+async def report_cluster_stats():
+    await refresh_status()
+
+@tasks.loop(seconds=5)
+async def reload_content():
+    for locale, changed in locales.poll().items():
+        print('Reloaded content (' + locale + '): ' + ', '.join(changed))
+        if set(changed) & set(RULE_SECTIONS):
+            rule_indexes[locale].build(locales[locale])
+
+@tasks.loop(seconds=config.ECONOMY_INTERVAL)
+async def import_economy():
+    changes = await economy.poll()
+    if changes:
+        print('Imported economy: ' + str(changes) + ' balances changed')
+
+@tasks.loop(seconds=config.AUCTION_INTERVAL)
+async def import_auction():
+    if await auction.poll():
+        print('Imported auction house: ' + str(auction.index.listings) + ' listings')
+
+TOKEN = "BOT_TOKEN"
 
-@tasks.loop(seconds=10)
-async def change_status():
-    await bot.change_presence(activity=discord.Game(name="In " + str(len(bot.guilds)) + " servers. Prefix +"))
-
-@bot.command(name='help')
-async def help(ctx):
-    embed = discord.Embed(
-        title='Commands',
-        description='Here are the commands you can use to enhance your experience on Discord and in the Minecraft server.',
-        color=discord.Color.purple()
-    )
-    embed.add_field(name='`+ip`', value='Displays the IP of the Minecraft server.', inline=False)
-    embed.add_field(name='`+rules`', value='Classification of Minecraft server rules: major, minor, trial, and staff.', inline=False)
-    embed.add_field(name='`+minor`', value='Displays minor rules.', inline=False)
-    embed.add_field(name='`+major`', value='Displays major rules.', inline=False)
-    embed.add_field(name='`+trial`', value='Displays rules applicable in trial.', inline=False)
-    embed.add_field(name='`+staff`', value='Displays Minecraft staff rules.', inline=False)
-    embed.add_field(name='`+clans`', value='Displays clan rules.', inline=False)
-    embed.add_field(name='`+commands`', value='List of commands you can use on the server.', inline=False)
-    embed.add_field(name='`+store`', value='Donations and ranks page.', inline=False)
-    embed.add_field(name='Emergency', value='To report a bug or issue with OlympusBot, contact the creator Paulidex.', inline=False)
-    embed.set_footer(text='For hiring, contact Paulidex#9510.')
-    await ctx.send(embed=embed)
-
-@bot.command()
-async def a(ctx):
-    await ctx.send('The bot is working correctly')
-
-@bot.command()
-async def store(ctx):
-    await ctx.send('Visit our store to see our ranks and make donations ^.^ `https://olympusland.tebex.io`')
-
-@bot.command()
-async def ip(ctx):
-    embed = discord.Embed(
-        title='Minecraft Java Server',
-        description='Version 1.16.5 - 1.17.1: play.olympusland.xyz',
-        color=discord.Color.purple()
-    )
-    embed.set_footer(text='To see more commands, type +help')
-    await ctx.send(embed=embed)
-
-@bot.command()
-async def rules(ctx):
-    await ctx.send('The rules are classified as major, minor, staff, and trial. To view them, type `+major` `+minor` `+staff` `+trial` `+clans`')
-
-@bot.command(name='minor')
-async def minor(ctx):
-    embed = discord.Embed(
-        title='Minor Rules',
-        description='1) Bugs are allowed, but you must first check with staff for permission. \n'
-                    '2) Do not insult other players if they do not appreciate it. \n'
-                    '3) Avoid flooding (e.g., helloooooo), spamming, or unnecessary text that clutters the chat. \n'
-                    '4) More than two Redstone clocks are not allowed; lag generators and chunk loaders are prohibited. \n'
-                    '5) Pets are private property; it is forbidden to kill them intentionally, even if they are in an unprotected area. \n'
-                    '6) Wolves cannot be used as weapons for PvP. \n'
-                    '7) In isolated issues, staff may hold meetings to find a fair solution. \n'
-                    '8) Do not leave a trial.',
-        color=discord.Color.purple()
-    )
-    embed.set_footer(text='Rules are cumulative, and punishments may vary depending on the person. For more commands, type +help')
-    await ctx.send(embed=embed)
-
-@bot.command(name='major')
-async def major(ctx):
-    embed = discord.Embed(
-        title='Major Rules',
-        description='1) The use of multiple accounts is prohibited. If you want to change accounts, notify staff to transfer your items and properties. \n'
-                    '2) Hacks are prohibited and will be sanctioned with an IP ban. \n'
-                    '3) Destroying protected builds and stealing items in other players’ areas is prohibited. \n'
-                    '4) Any type of killing, such as tpakill and spawn kill, is prohibited. \n'
-                    '5) Exploiting bugs, such as duplication or mobility glitches, is prohibited. \n'
-                    '6) The use of hacks like xray or autoclick is prohibited. \n'
-                    '7) External links cannot be distributed without staff approval. \n'
-                    '8) Respect staff and avoid disrespectful behavior. \n'
-                    '9) Attempting to evade penalties will increase the punishment; helping another player evade is also punishable. \n'
-                    '10) Lying to staff is prohibited. \n'
-                    '11) Impersonating staff is prohibited. \n'
-                    '12) Do not use other cases to justify actions. \n'
-                    '13) Offensive messages and builds are prohibited. \n'
-                    '14) Escaping jail is prohibited. \n'
-                    '15) Do not help a prisoner escape jail. \n'
-                    '16) Do not explore, mine, or cut trees in the normal world; use /warp resources.',
-        color=discord.Color.purple()
-    )
-    embed.set_footer(text='Rules are cumulative, and punishments may vary depending on the person. For more commands, type +help')
-    await ctx.send(embed=embed)
-
-@bot.command(name='trial')
-async def trial(ctx):
-    embed = discord.Embed(
-        title='Trial Rules',
-        description='1) Do not interrupt the trial. \n'
-                    '2) Present evidence. \n'
-                    '3) Do not waste the judge’s time. \n'
-                    '4) Read the rules before requesting a trial. \n'
-                    '5) Only witnesses and involved parties are allowed in the trial. \n'
-                    '6) Only Owners, Admins, and Mods can act as judges. \n'
-                    '7) Both parties (accused and accusers) must be present.',
-        color=discord.Color.purple()
-    )
-    embed.set_footer(text='Rules are cumulative, and punishments may vary depending on the person. For more commands, type +help')
-    await ctx.send(embed=embed)
-
-@bot.command(name='clans')
-async def clans(ctx):
-    embed = discord.Embed(
-        title='Clan Rules',
-        description='1) Any type of PvP is allowed if both players belong to a clan. \n'
-                    '2) Griefing is allowed but only to clan bases.',
-        color=discord.Color.purple()
-    )
-    embed.set_footer(text='Rules are cumulative, and punishments may vary depending on the person. For more commands, type +help')
-    await ctx.send(embed=embed)
-
-@bot.command(name='staff')
-async def staff(ctx):
-    embed = discord.Embed(
-        title='Staff Rules',
-        description='1) Ban complaints are handled via Discord. \n'
-                    '2) Staff-exclusive items should not fall into players’ hands; both involved will be sanctioned if this happens. \n'
-                    '3) Respond to players’ questions. \n'
-                    '4) Greet new players. \n'
-                    '5) Do not abuse power. \n'
-                    '6) Only Owners, Admins, and Mods can sanction. \n'
-                    '7) Treat all players equally. \n'
-                    '8) Do not give players creative items; only survival items are allowed. \n'
-                    '9) Be neutral in trials. \n'
-                    '10) Unjustified inactivity may result in staff dismissal. \n'
-                    '11) Do not reveal upcoming features to players.',
-        color=discord.Color.purple()
-    )
-    embed.set_footer(text='Rules are cumulative, and punishments may vary depending on the person. For more commands, type +help')
-    await ctx.send(embed=embed)
-
-@bot.command(name='commands')
-async def commands(ctx):
-    embed = discord.Embed(
-        title='Commands you can use on the server',
-        description='/tpa (teleport to another player) \n'
-                    '/tpaccept (accept teleport request) \n'
-                    '/tpahere (bring another player) \n'
-                    '/back (return to the previous location) \n'
-                    '/sit (sit down) \n'
-                    '/afk (go AFK) \n'
-                    '/sethome (mark a home) \n'
-                    '/home "name" (go to a marked home) \n'
-                    '/delhome "name" (delete a home) \n'
-                    '/ps add "name" (add a person to your protection stone) \n'
-                    '/ps remove "name" (remove a person from your stone) \n'
-                    '/store (see the store) \n'
-                    '/stones (information about the protection stone) \n'
-                    '/jobs (to earn money) \n'
-                    '/jobs join "name" (join a job) \n'
-                    '/jobs remove "name" (leave a job) \n'
-                    '/ec (access ender chest) \n'
-                    '/pay "amount" "nickname" (pay another player) \n'
-                    '/money (see your money) \n'
-                    '/baltop (view the richest people on Olympus) \n'
-                    '/ah (auction house) \n'
-                    '/ah sell "price" (sell item in hand in ah) \n'
-                    '/store (buy stones, turrets, etc.) \n'
-                    '/warp resources (for material gathering, building here is not recommended) \n'
-                    '/warp slaughterhouse (get food) \n'
-                    '/warp wedding (church) \n\n'
-                    'You can create elevators by placing a quartz block with a redstone block underneath.',
-        color=discord.Color.purple()
-    )
-    embed.set_footer(text='To see more commands, type +help')
-    await ctx.send(embed=embed)
-
-keep_alive()
-bot.run("BOT_TOKEN")
+if __name__ == '__main__':
+    launch = launch_options()
+    if launch:
+        keep_alive()
+        run_coordinator(TOKEN, __file__, **launch)
+    else:
+        keep_alive(bot, port=8081 + cluster.worker if cluster else 8080)
+        profile.mark('setup')
+        bot.run(TOKEN)
+        watchdog.stop()
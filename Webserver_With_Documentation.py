@@ -1,34 +1,102 @@
-from flask import Flask  # Imports Flask, a framework for creating web applications simply and quickly.
+import asyncio  # Imports asyncio, used to run the web server when there is no bot event loop to share.
+import math  # Imports math to detect latencies that are not available yet (NaN or infinity).
 
-from threading import Thread  # Imports Thread from threading to run functions in parallel without blocking program execution.
+from aiohttp import web  # Imports aiohttp's web server. discord.py already depends on aiohttp, so nothing new is installed.
 
-# Initializes an instance of the Flask application.
-# Flask takes the current module name as an argument, which in this case is an empty string ('').
-# This allows Flask to locate files and resources related to the application.
-app = Flask('')
+from threading import Thread  # Imports Thread from threading, only used when `keep_alive` is called without a bot.
+
+# Creates the web application.
+# `web.Application()` holds the routes (URLs) that the server answers.
+# `routes` is a table where each decorated function below is registered with its URL.
+# `BOT` is the key under which the application keeps the bot. aiohttp asks for a `web.AppKey` instead of a plain
+# string such as 'bot', so two parts of a program cannot use the same name by accident (and no warning is printed).
+app = web.Application()
+routes = web.RouteTableDef()
+BOT = web.AppKey('bot', object)
 
 # Defines the root route of the web application.
-# @app.route('/') is a decorator that specifies that the `home` function will be executed
-# when the root URL (/) of the server is accessed. This sets up an access point to the application.
-@app.route('/')
-def home():
+# `@routes.get('/')` registers the `home` function for GET requests to the root URL (/).
+# This is the page UptimeRobot visits to keep the bot online.
+@routes.get('/')
+async def home(request):
     # The `home` function responds with the text "I'm alive" when the root URL is requested.
     # This indicates that the server is running correctly.
-    return "I'm alive"
+    return web.Response(text="I'm alive")
+
+# Converts a latency in seconds to milliseconds.
+# Before the first heartbeat with Discord the latency is not known and discord.py reports NaN or infinity,
+# which cannot be written in JSON, so `None` (null) is returned instead.
+def latency_ms(latency):
+    return None if math.isnan(latency) or math.isinf(latency) else round(latency * 1000, 1)
+
+# Defines the `/health` route, which reports the real state of the bot instead of a fixed text.
+# - `ready` is true when the bot finished connecting to Discord and the connection is not closed.
+# - `latency_ms` is the time Discord takes to answer the bot's heartbeats.
+# - `guilds` is the number of servers the bot is in.
+# - With several shards, `shards` shows the latency and state of each connection.
+# - With the watchdog running, `loop` shows the event loop lag and the callbacks that blocked it the longest.
+# The answer has status 200 when the bot is ready and 503 when it is not, so monitors such as UptimeRobot
+# can detect a bot that is running but disconnected from Discord.
+@routes.get('/health')
+async def health(request):
+    # `request.app.get(BOT)` returns the bot given to `keep_alive`, or `None` if there is none.
+    bot = request.app.get(BOT)
+    if bot is None:
+        return web.json_response({'status': 'alive', 'gateway': None})
+    ready = bot.is_ready() and not bot.is_closed()
+    body = {
+        'status': 'ok' if ready else 'starting',
+        'ready': ready,
+        'latency_ms': latency_ms(bot.latency),
+        'guilds': len(bot.guilds),
+    }
+    if hasattr(bot, 'shards'):
+        body['shards'] = {
+            str(shard_id): {'latency_ms': latency_ms(shard.latency), 'closed': shard.is_closed()}
+            for shard_id, shard in bot.shards.items()
+        }
+    if getattr(bot, 'watchdog', None) is not None:
+        body['loop'] = bot.watchdog.summary()
+    return web.json_response(body, status=200 if ready else 503)
+
+# Adds the routes defined above to the application.
+app.add_routes(routes)
+
+# Starts the web server on the event loop that is currently running.
+# - `app[BOT] = bot` stores the bot so `/health` can read its state.
+# - `web.AppRunner` prepares the application, and `web.TCPSite` makes it listen on the given host and port.
+# - host='0.0.0.0' allows public access to the server on the network, ideal for applications that need external monitoring.
+# - port=8080 sets the port on which the server will listen for incoming requests.
+# The function returns as soon as the server is listening; requests are then handled by the same event loop.
+async def start(bot=None, host='0.0.0.0', port=8080):
+    app[BOT] = bot
+    runner = web.AppRunner(app, access_log=None)
+    await runner.setup()
+    await web.TCPSite(runner, host, port).start()
+    return runner
 
-# Defines a `run` function that will start the Flask server when called.
-# This function configures the server to be publicly accessible on the network.
-def run():
-    # `app.run` starts the Flask server with the following configurations:
-    # - host='0.0.0.0' allows public access to the server on the network, ideal for applications that need external monitoring.
-    # - port=8080 sets the port on which the server will listen for incoming requests.
-    app.run(host='0.0.0.0', port=8080)
+# Runs the web server with its own event loop.
+# It is only used when there is no bot whose event loop can be shared (for example, in the cluster coordinator).
+def run(port=8080):
+    async def serve():
+        await start(port=port)
+        # Waits forever so the server keeps running.
+        await asyncio.Event().wait()
+    asyncio.run(serve())
 
 # Defines a `keep_alive` function that keeps the web server running in the background.
-# This is useful for bots or services that need a continuously running server without blocking the main program flow.
-def keep_alive():
-    # Creates and starts a new thread that will run the `run` function independently.
-    # `Thread(target=run)` creates a thread that will run the `run` function.
-    # `t.start()` starts the thread, running the Flask server in the background.
-    t = Thread(target=run)
-    t.start()
+# - When a bot is given (`keep_alive(bot)`), the server runs on the bot's own event loop: no extra thread or web framework.
+#   The bot's `setup_hook` (which runs once, before it connects to Discord) is replaced by a version that first
+#   starts the web server and then runs the original `setup_hook`.
+# - When it is called without a bot (`keep_alive()`), the server runs in a background thread, like the previous version.
+# - `port` is the port the server listens on; cluster workers use a different port each so they do not collide.
+def keep_alive(bot=None, port=8080):
+    if bot is None:
+        t = Thread(target=run, args=(port,), daemon=True)
+        t.start()
+        return
+    setup_hook = bot.setup_hook
+    async def start_with_bot():
+        await start(bot, port=port)
+        await setup_hook()
+    bot.setup_hook = start_with_bot
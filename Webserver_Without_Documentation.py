@@ -1,16 +1,64 @@
-from flask import Flask
+import asyncio
+import math
+
+from aiohttp import web
 
 from threading import Thread
 
-app = Flask('')
+app = web.Application()
+routes = web.RouteTableDef()
+BOT = web.AppKey('bot', object)
+
+@routes.get('/')
+async def home(request):
+    return web.Response(text="I'm alive")
+
+def latency_ms(latency):
+    return None if math.isnan(latency) or math.isinf(latency) else round(latency * 1000, 1)
+
+@routes.get('/health')
+async def health(request):
+    bot = request.app.get(BOT)
+    if bot is None:
+        return web.json_response({'status': 'alive', 'gateway': None})
+    ready = bot.is_ready() and not bot.is_closed()
+    body = {
+        'status': 'ok' if ready else 'starting',
+        'ready': ready,
+        'latency_ms': latency_ms(bot.latency),
+        'guilds': len(bot.guilds),
+    }
+    if hasattr(bot, 'shards'):
+        body['shards'] = {
+            str(shard_id): {'latency_ms': latency_ms(shard.latency), 'closed': shard.is_closed()}
+            for shard_id, shard in bot.shards.items()
+        }
+    if getattr(bot, 'watchdog', None) is not None:
+        body['loop'] = bot.watchdog.summary()
+    return web.json_response(body, status=200 if ready else 503)
+
+app.add_routes(routes)
 
-@app.route('/')
-def home():
-    return "I'm alive"
+async def start(bot=None, host='0.0.0.0', port=8080):
+    app[BOT] = bot
+    runner = web.AppRunner(app, access_log=None)
+    await runner.setup()
+    await web.TCPSite(runner, host, port).start()
+    return runner
 
-def run():
-    app.run(host='0.0.0.0', port=8080)
+def run(port=8080):
+    async def serve():
+        await start(port=port)
+        await asyncio.Event().wait()
+    asyncio.run(serve())
 
-def keep_alive():
-    t = Thread(target=run)
-    t.start()
+def keep_alive(bot=None, port=8080):
+    if bot is None:
+        t = Thread(target=run, args=(port,), daemon=True)
+        t.start()
+        return
+    setup_hook = bot.setup_hook
+    async def start_with_bot():
+        await start(bot, port=port)
+        await setup_hook()
+    bot.setup_hook = start_with_bot
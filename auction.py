@@ -0,0 +1,263 @@
+import array
+import asyncio
+import collections
+import csv
+import heapq
+import itertools
+import json
+import logging
+import math
+import os
+import sqlite3
+import time
+
+from metrics import Counter, Gauge
+from search import WORD, TrigramIndex, stem
+
+log = logging.getLogger(__name__)
+
+# Query used when the export is an SQLite database. It must return these
+# columns in this order; the price is the price of the whole listing.
+DEFAULT_QUERY = 'SELECT id, item, seller, price, amount, expires FROM listings'
+
+Listing = collections.namedtuple('Listing', 'id item seller price amount expires')
+
+
+def item_key(name):
+    """Normalizes an item name, so "minecraft:Diamond_Sword" and "diamond sword" match."""
+    name = name.lower().rsplit(':', 1)[-1].replace('_', ' ')
+    return ' '.join(WORD.findall(name))
+
+
+def parse_listing(id, item, seller, price, amount=1, expires=None):
+    amount = int(amount or 1)
+    price = float(price)
+    if amount < 1 or not math.isfinite(price) or price < 0:
+        raise ValueError('invalid listing')
+    return Listing(str(id), str(item), str(seller), price, amount, float(expires) if expires else None)
+
+
+def read_listings(path, query=DEFAULT_QUERY):
+    """Yields the rows of an auction house export one at a time.
+
+    The export can be an SQLite database (.db, .sqlite or .sqlite3), a CSV
+    file with a header line, or a JSON Lines file with one listing object
+    per line. Rows are read as they are needed, so the whole export is
+    never held in memory. Each row is a tuple or dict of the fields of
+    ``Listing``.
+    """
+    extension = os.path.splitext(path)[1].lower()
+    if extension in ('.db', '.sqlite', '.sqlite3'):
+        db = sqlite3.connect(f'file:{path}?mode=ro', uri=True)
+        try:
+            yield from db.execute(query)
+        finally:
+            db.close()
+    elif extension == '.csv':
+        with open(path, encoding='utf-8', newline='') as file:
+            yield from csv.DictReader(file)
+    else:
+        with open(path, encoding='utf-8') as file:
+            for line in file:
+                if line.strip():
+                    try:
+                        yield json.loads(line)
+                    except ValueError:
+                        # Counted as a skipped row by the index.
+                        yield None
+
+
+class AuctionIndex:
+    """Listings of the auction house grouped by item and sorted by unit price.
+
+    Each item keeps a list of ``(unit price, number, listing)`` sorted once
+    when the index is built, so the cheapest listings of an item are a slice
+    and a search over several items merges their lists lazily. Item names are
+    found through an inverted index of their words, with a trigram index
+    for misspelled names, so no lookup scans every listing. Listings that
+    have expired are left out when the index is built and skipped by the
+    lookups afterwards, since the export is only read when it changes.
+    """
+
+    def __init__(self):
+        self.items = {}
+        self.names = {}
+        self.words = collections.defaultdict(set)
+        self.trigrams = TrigramIndex()
+        self.listings = 0
+        self.skipped = 0
+
+    @classmethod
+    def build(cls, rows):
+        """Builds an index from an iterable of rows, consumed one at a time."""
+        index = cls()
+        # Item and seller names repeat across listings; one copy of each is
+        # kept, and the key of each item name is only worked out once.
+        names = {}
+        keys = {}
+        now = time.time()
+        for row in rows:
+            try:
+                if isinstance(row, dict):
+                    # Exports may have more columns than a listing needs.
+                    listing = parse_listing(**{field: row[field] for field in Listing._fields if field in row})
+                else:
+                    listing = parse_listing(*row)
+            except (TypeError, ValueError):
+                index.skipped += 1
+                continue
+            if listing.expires and listing.expires <= now:
+                continue
+            key = keys.get(listing.item)
+            if key is None:
+                key = keys[listing.item] = item_key(listing.item)
+            if not key:
+                index.skipped += 1
+                continue
+            listing = listing._replace(item=names.setdefault(listing.item, listing.item), seller=names.setdefault(listing.seller, listing.seller))
+            entries = index.items.get(key)
+            if entries is None:
+                entries = index.items[key] = []
+                index.names[key] = listing.item.rsplit(':', 1)[-1].replace('_', ' ').title()
+            # The number keeps listings with the same price in export order.
+            entries.append((listing.price / listing.amount, index.listings, listing))
+            index.listings += 1
+        for key, entries in index.items.items():
+            entries.sort()
+            for word in key.split():
+                index.words[stem(word)].add(key)
+        index.trigrams = TrigramIndex(index.items)
+        return index
+
+    def resolve(self, query):
+        """The keys of the items a query names, the best matches first.
+
+        An exact name comes first, then the items whose name contains every
+        word of the query, shortest names first, and otherwise the items
+        with the most similar names.
+        """
+        key = item_key(query)
+        words = [stem(word) for word in key.split()]
+        if not words:
+            return []
+        matches = set.intersection(*(self.words.get(word, set()) for word in words))
+        if matches:
+            return sorted(matches, key=lambda match: (match != key, len(match), match))
+        return [match for _, match in self.trigrams.search(key)][:5]
+
+    @staticmethod
+    def _live(entries):
+        now = time.time()
+        return (entry for entry in entries if not entry[2].expires or entry[2].expires > now)
+
+    def cheapest(self, key, count):
+        return [entry[2] for entry in itertools.islice(self._live(self.items.get(key, ())), count)]
+
+    def search(self, query, count):
+        """The ``count`` cheapest listings, by unit price, of the items a query names."""
+        keys = self.resolve(query)
+        merged = heapq.merge(*(self.items[key] for key in keys))
+        return keys, [entry[2] for entry in itertools.islice(self._live(merged), count)]
+
+
+class PriceHistory:
+    """Lowest unit price of an item at each import, in ``array`` columns.
+
+    Works like ``status.History``: it holds the last ``size`` samples in a
+    ring and keeps the sum of the prices, so the average never walks the
+    samples. The columns grow up to ``size`` instead of being allocated up
+    front, since most items are only listed now and then.
+    """
+
+    def __init__(self, size):
+        self.size = size
+        self.timestamps = array.array('d')
+        self.lows = array.array('d')
+        self._next = 0
+        self._total = 0.0
+
+    def __len__(self):
+        return len(self.lows)
+
+    def append(self, timestamp, low):
+        if len(self.lows) < self.size:
+            self.timestamps.append(timestamp)
+            self.lows.append(low)
+        else:
+            self._total -= self.lows[self._next]
+            self.timestamps[self._next] = timestamp
+            self.lows[self._next] = low
+            self._next = (self._next + 1) % self.size
+        self._total += low
+
+    def average(self):
+        return self._total / len(self.lows) if self.lows else None
+
+    def oldest(self):
+        """``(timestamp, low)`` of the oldest sample kept."""
+        if not self.lows:
+            return None
+        index = self._next if len(self.lows) == self.size else 0
+        return self.timestamps[index], self.lows[index]
+
+
+class AuctionImport:
+    """Mirrors the auction house export into an ``AuctionIndex``.
+
+    ``poll`` only reads the export when its modification time or size has
+    changed. A new index is built from the rows in an executor, so the
+    commands keep answering from the previous one until it is swapped in,
+    and the lowest price of each item is added to its ``PriceHistory``.
+    """
+
+    def __init__(self, path, query=DEFAULT_QUERY, history=288):
+        self.path = path
+        self.query = query
+        self.history_size = history
+        self.index = AuctionIndex()
+        self.history = {}
+        self.imported_at = None
+        self._stamp = None
+        self.imports = Counter('bot_auction_imports_total', 'Auction house imports by outcome.', ('outcome',))
+        self.skipped = Counter('bot_auction_rows_skipped_total', 'Rows of the auction house export that could not be read.')
+
+    def collectors(self):
+        return [
+            self.imports,
+            self.skipped,
+            Gauge('bot_auction_listings', 'Listings in the auction house index.', lambda: {(): self.index.listings}),
+            Gauge('bot_auction_items', 'Items listed in the auction house.', lambda: {(): len(self.index.items)}),
+        ]
+
+    def _read_stamp(self):
+        stat = os.stat(self.path)
+        return stat.st_mtime_ns, stat.st_size
+
+    async def poll(self):
+        """Imports the export if it changed; returns True when it did.
+
+        An export that cannot be read is logged and skipped; the previous
+        listings stay in use.
+        """
+        loop = asyncio.get_running_loop()
+        try:
+            stamp = self._read_stamp()
+            if stamp == self._stamp:
+                self.imports.inc('unchanged')
+                return False
+            index = await loop.run_in_executor(None, AuctionIndex.build, read_listings(self.path, self.query))
+        except (OSError, ValueError, sqlite3.Error) as error:
+            self.imports.inc('failed')
+            log.warning('Could not import %s: %s', self.path, error)
+            return False
+        self._stamp = stamp
+        self.index = index
+        self.imported_at = time.time()
+        for key, entries in index.items.items():
+            history = self.history.get(key)
+            if history is None:
+                history = self.history[key] = PriceHistory(self.history_size)
+            history.append(self.imported_at, entries[0][0])
+        self.imports.inc('imported')
+        self.skipped.inc(amount=index.skipped)
+        return True
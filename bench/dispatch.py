@@ -0,0 +1,352 @@
+"""Offline benchmark of the command pipeline.
+
+Imports the bot script without connecting to Discord, replaces the HTTP
+session of discord.py with an in-memory transport and feeds it synthetic
+MESSAGE_CREATE events, as the gateway would. Every message goes through the
+real pipeline: event parsing, ``on_message``, the prefix resolver, the
+checks, the command and ``ctx.send`` with discord.py's request handling.
+
+For each command it reports the throughput with ``--concurrency`` messages
+in flight, the p50 and p99 latency from the event to the end of the
+command, and the memory allocated per invocation (peak traced by
+tracemalloc, measured in a separate pass so it does not slow the timed
+one). Results are appended to ``bench/results.jsonl`` with the commit they
+were measured on and compared with the previous run of the same settings.
+
+    python bench/dispatch.py
+    python bench/dispatch.py --commands help,major --invocations 5000 --profile
+"""
+import argparse
+import asyncio
+import cProfile
+import datetime
+import importlib
+import importlib.util
+import itertools
+import json
+import os
+import platform
+import pstats
+import runpy
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+
+import discord
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+RESULTS_PATH = os.path.join(ROOT, 'bench', 'results.jsonl')
+
+BOT_ID = 100000000000000001
+GUILD_ID = 100000000000000002
+CHANNEL_ID = 100000000000000003
+USER_ID = 100000000000000004
+
+
+def percentile(samples, fraction):
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+def user(user_id, name):
+    return {'id': str(user_id), 'username': name, 'discriminator': '0', 'global_name': None, 'avatar': None, 'bot': user_id == BOT_ID}
+
+
+class FakeResponse:
+    """The subset of ``aiohttp.ClientResponse`` that discord.py reads."""
+
+    def __init__(self, status, data):
+        self.status = status
+        self.reason = 'OK'
+        # A bucket that never runs out, so discord.py does not serialize the
+        # requests of a route while it waits to learn its limit.
+        self.headers = {
+            'content-type': 'application/json',
+            'X-Ratelimit-Bucket': 'benchmark',
+            'X-Ratelimit-Limit': '1000000',
+            'X-Ratelimit-Remaining': '1000000',
+            'X-Ratelimit-Reset-After': '60',
+        }
+        self._text = json.dumps(data)
+
+    async def text(self, encoding='utf-8'):
+        return self._text
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        return False
+
+
+class FakeTransport:
+    """In-memory stand-in for the aiohttp session of ``bot.http``.
+
+    Sent messages are answered with the message Discord would create;
+    every other request gets an empty object. The rate limit headers never
+    run out, so the benchmark measures the bot and not Discord's limits.
+    """
+
+    def __init__(self):
+        self.requests = 0
+        self._ids = itertools.count(200000000000000000)
+
+    def request(self, method, url, **kwargs):
+        self.requests += 1
+        # HTTPClient.request has already serialized the JSON body into ``data``.
+        payload = json.loads(kwargs['data']) if isinstance(kwargs.get('data'), str) else {}
+        if method == 'POST' and url.endswith('/messages'):
+            return FakeResponse(200, self.message(int(url.split('/')[-2]), payload))
+        if method == 'PUT' and url.endswith('/commands'):
+            return FakeResponse(200, [dict(command, id=str(next(self._ids)), application_id=str(BOT_ID)) for command in payload])
+        return FakeResponse(200, {})
+
+    def message(self, channel_id, payload):
+        return {
+            'id': str(next(self._ids)),
+            'channel_id': str(channel_id),
+            'guild_id': str(GUILD_ID),
+            'author': user(BOT_ID, 'Bot'),
+            'content': payload.get('content') or '',
+            'embeds': payload.get('embeds') or [],
+            'timestamp': datetime.datetime.now(datetime.timezone.utc).isoformat(),
+            'edited_timestamp': None,
+            'tts': False,
+            'mention_everyone': False,
+            'mentions': [],
+            'mention_roles': [],
+            'attachments': [],
+            'pinned': False,
+            'type': 0,
+        }
+
+    def install(self, http):
+        # What HTTPClient.static_login would set up, without logging in.
+        http._HTTPClient__session = self
+        http._global_over = asyncio.Event()
+        http._global_over.set()
+
+    async def close(self):
+        pass
+
+
+class Gateway:
+    """Feeds synthetic gateway events to the bot's connection state."""
+
+    def __init__(self, bot):
+        self.bot = bot
+        self.state = bot._connection
+        self.ids = itertools.count(300000000000000000)
+
+    def connect(self):
+        state = self.state
+        state.application_id = BOT_ID
+        state.user = discord.ClientUser(state=state, data=user(BOT_ID, 'Bot'))
+        state._add_guild_from_data({
+            'id': str(GUILD_ID),
+            'name': 'Benchmark',
+            'owner_id': str(USER_ID),
+            'member_count': 2,
+            'roles': [{'id': str(GUILD_ID), 'name': '@everyone', 'permissions': '0', 'position': 0, 'color': 0, 'hoist': False, 'managed': False, 'mentionable': False}],
+            'channels': [{'id': str(CHANNEL_ID), 'type': 0, 'name': 'general', 'position': 0, 'permission_overwrites': []}],
+            'members': [{'user': user(BOT_ID, 'Bot'), 'roles': [], 'joined_at': '2021-01-01T00:00:00+00:00', 'deaf': False, 'mute': False, 'flags': 0}],
+            'emojis': [],
+            'stickers': [],
+            'features': [],
+        })
+
+    def message(self, message_id, content):
+        self.state.parsers['MESSAGE_CREATE']({
+            'id': str(message_id),
+            'channel_id': str(CHANNEL_ID),
+            'guild_id': str(GUILD_ID),
+            'author': user(USER_ID, 'Steve'),
+            'member': {'roles': [], 'joined_at': '2021-01-01T00:00:00+00:00', 'deaf': False, 'mute': False, 'flags': 0},
+            'content': content,
+            'timestamp': datetime.datetime.now(datetime.timezone.utc).isoformat(),
+            'edited_timestamp': None,
+            'tts': False,
+            'mention_everyone': False,
+            'mentions': [],
+            'mention_roles': [],
+            'attachments': [],
+            'embeds': [],
+            'pinned': False,
+            'type': 0,
+        })
+
+
+class Benchmark:
+    def __init__(self, bot, gateway):
+        self.bot = bot
+        self.gateway = gateway
+        self.waiting = {}
+        self.failures = 0
+        bot.add_listener(self._finished, 'on_command_completion')
+        bot.add_listener(self._failed, 'on_command_error')
+
+    async def _finished(self, ctx):
+        future = self.waiting.pop(ctx.message.id, None)
+        if future is not None:
+            future.set_result(time.perf_counter())
+
+    async def _failed(self, ctx, error):
+        self.failures += 1
+        await self._finished(ctx)
+
+    async def invoke(self, content):
+        started = time.perf_counter()
+        message_id = next(self.gateway.ids)
+        future = self.waiting[message_id] = asyncio.get_running_loop().create_future()
+        self.gateway.message(message_id, content)
+        return await future - started
+
+    async def throughput(self, content, invocations, concurrency):
+        latencies = []
+        semaphore = asyncio.Semaphore(concurrency)
+
+        async def one():
+            async with semaphore:
+                latencies.append(await self.invoke(content))
+
+        started = time.perf_counter()
+        await asyncio.gather(*(one() for _ in range(invocations)))
+        return invocations / (time.perf_counter() - started), latencies
+
+    async def allocations(self, content, invocations):
+        # Tracing restarts for every invocation, which resets the peak the
+        # way ``tracemalloc.reset_peak`` does on Python 3.9 and newer.
+        peaks = []
+        for _ in range(invocations):
+            tracemalloc.start()
+            try:
+                await self.invoke(content)
+                peaks.append(tracemalloc.get_traced_memory()[1])
+            finally:
+                tracemalloc.stop()
+        return sum(peaks) / len(peaks)
+
+
+def load_bot(script, data):
+    """Imports the bot script with settings that keep it offline, writing its files to ``data``."""
+    for name, value in {
+        'BOT_COOLDOWN_USER': 'off',
+        'BOT_COOLDOWN_CHANNEL': 'off',
+        'BOT_COOLDOWN_GUILD': 'off',
+        'BOT_DEDUP_SECONDS': '0',
+        'BOT_RELAY_CHANNEL': '0',
+        'BOT_GUILD_DB_PATH': os.path.join(data, 'guilds.db'),
+        'BOT_TREE_HASH_PATH': os.path.join(data, 'tree_hash.json'),
+    }.items():
+        os.environ.setdefault(name, value)
+    sys.path.insert(0, ROOT)
+    if importlib.util.find_spec('webserver') is None:
+        # The scripts import the web server as `webserver`, the name it is deployed with.
+        sys.modules['webserver'] = importlib.import_module('Webserver_Without_Documentation')
+    sys.argv = [script]
+    return runpy.run_path(os.path.join(ROOT, script), run_name='bench')
+
+
+def commit():
+    try:
+        return subprocess.run(['git', 'describe', '--always', '--dirty'], cwd=ROOT, capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def previous(settings):
+    if not os.path.exists(RESULTS_PATH):
+        return None
+    last = None
+    with open(RESULTS_PATH, encoding='utf-8') as file:
+        for line in file:
+            entry = json.loads(line)
+            if entry['settings'] == settings:
+                last = entry
+    return last
+
+
+def report(results, before):
+    print(f'{"command":<10} {"msg/s":>9} {"p50 ms":>8} {"p99 ms":>8} {"KiB/cmd":>8}')
+    for name, result in results.items():
+        line = f'{name:<10} {result["throughput"]:>9.0f} {result["p50_ms"]:>8.2f} {result["p99_ms"]:>8.2f} {result["alloc_kib"]:>8.1f}'
+        old = before['results'].get(name) if before else None
+        if old:
+            change = result['throughput'] / old['throughput'] - 1
+            line += f'   {change:+.1%} msg/s, p99 {old["p99_ms"]:.2f} -> {result["p99_ms"]:.2f} ms since {before["commit"]}'
+        print(line)
+
+
+async def run(args, namespace):
+    bot = namespace['bot']
+    transport = FakeTransport()
+    transport.install(bot.http)
+    gateway = Gateway(bot)
+    gateway.connect()
+    # The part of Client.login that does not talk to Discord.
+    await bot._async_setup_hook()
+    await bot.setup_hook()
+    await bot.extensions_loaded
+    benchmark = Benchmark(bot, gateway)
+    results = {}
+    profiler = cProfile.Profile() if args.profile else None
+    for name in args.commands:
+        content = namespace['config'].PREFIX + name
+        # Warm up: first use of the command, caches and code paths.
+        await benchmark.throughput(content, min(200, args.invocations), args.concurrency)
+        if profiler:
+            profiler.enable()
+        throughput, latencies = await benchmark.throughput(content, args.invocations, args.concurrency)
+        if profiler:
+            profiler.disable()
+        results[name] = {
+            'throughput': round(throughput, 1),
+            'p50_ms': round(percentile(latencies, 0.50) * 1000, 3),
+            'p99_ms': round(percentile(latencies, 0.99) * 1000, 3),
+            'alloc_kib': round(await benchmark.allocations(content, args.allocations) / 1024, 2),
+        }
+    if benchmark.failures:
+        print(f'{benchmark.failures} invocations failed; see the log above')
+    print(f'{transport.requests} requests sent to the fake transport')
+    namespace['guild_config'].close()
+    return results, profiler
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Benchmarks the command pipeline of the bot without a network.')
+    parser.add_argument('--script', default='Code_Without_Documentation.py', help='bot script to import')
+    parser.add_argument('--commands', default='help,major,ip,a', help='commands to run, separated by commas')
+    parser.add_argument('--invocations', type=int, default=2000, help='timed invocations per command')
+    parser.add_argument('--concurrency', type=int, default=50, help='messages in flight at a time')
+    parser.add_argument('--allocations', type=int, default=200, help='invocations traced to measure memory')
+    parser.add_argument('--profile', action='store_true', help='print the functions where the time goes (the results are not saved)')
+    parser.add_argument('--no-save', action='store_true', help='do not append the results to bench/results.jsonl')
+    args = parser.parse_args(argv)
+    args.commands = [name.strip() for name in args.commands.split(',') if name.strip()]
+
+    with tempfile.TemporaryDirectory(prefix='bench-') as data:
+        namespace = load_bot(args.script, data)
+        results, profiler = asyncio.run(run(args, namespace))
+
+    settings = {'script': args.script, 'invocations': args.invocations, 'concurrency': args.concurrency}
+    before = previous(settings)
+    report(results, before)
+    if profiler:
+        pstats.Stats(profiler).sort_stats('cumulative').print_stats(25)
+    if not args.no_save and not profiler:
+        entry = {
+            'time': datetime.datetime.now(datetime.timezone.utc).isoformat(timespec='seconds'),
+            'commit': commit(),
+            'python': platform.python_version(),
+            'discord.py': discord.__version__,
+            'settings': settings,
+            'results': results,
+        }
+        with open(RESULTS_PATH, 'a', encoding='utf-8') as file:
+            file.write(json.dumps(entry) + '\n')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,245 @@
+import asyncio
+import json
+import logging
+import os
+import time
+
+import discord
+
+from metrics import Counter
+from outbox import REPLY
+
+log = logging.getLogger(__name__)
+
+
+async def announcement_channels(bot):
+    """The channel that receives announcements in each guild of the bot.
+
+    That is the channel set with +settings announcements, or else the
+    guild's system channel when the bot can send messages there. Guilds
+    without either are left out.
+    """
+    channels = []
+    for guild in bot.guilds:
+        settings = await bot.guild_config.get(guild.id)
+        if settings.announcements:
+            channels.append(settings.announcements)
+        elif guild.system_channel is not None and guild.system_channel.permissions_for(guild.me).send_messages:
+            channels.append(guild.system_channel.id)
+    return channels
+
+
+class Broadcast:
+    """One announcement and the channels it still has to reach.
+
+    ``done`` holds the channels already handled, whatever the outcome, so
+    the checkpoint only lists the ones left. The status message is written
+    in ``locale``, the language of the staff member who started it.
+    """
+
+    def __init__(self, content, author, channels, status=None, sent=0, failed=0, skipped=0, started_at=None, locale=None):
+        self.content = content
+        self.author = author
+        self.channels = channels
+        self.status = status
+        self.locale = locale
+        self.sent = sent
+        self.failed = failed
+        self.skipped = skipped
+        self.started_at = started_at or time.time()
+        self.done = set()
+        self.resumed_from = sent + failed + skipped
+        self.resumed_at = time.time()
+        self.total = len(channels) + self.resumed_from
+        self.cancelled = False
+
+    @property
+    def handled(self):
+        return self.sent + self.failed + self.skipped
+
+    def to_dict(self):
+        return {
+            'content': self.content,
+            'author': self.author,
+            'channels': [channel for channel in self.channels if channel not in self.done],
+            'status': self.status,
+            'sent': self.sent,
+            'failed': self.failed,
+            'skipped': self.skipped,
+            'started_at': self.started_at,
+            'locale': self.locale,
+        }
+
+
+class Broadcaster:
+    """Sends an announcement to one channel in every guild of the bot.
+
+    ``concurrency`` workers take channels from a shared queue and send
+    through the background lane of the outbox, which waits out the rate
+    limit of each channel. Sends are also spaced to at most ``rate`` per
+    second, below Discord's global limit, so thousands of guilds take
+    minutes and no request is answered with a 429.
+
+    The channels left are saved to ``path`` every ``interval`` seconds
+    while a broadcast runs. ``resume`` continues a broadcast that was
+    interrupted by a restart; a channel reached after the last checkpoint
+    may get the announcement twice. A status message, edited every
+    ``interval`` seconds, shows the progress, the rate and the failures.
+
+    In cluster mode each worker reaches its own guilds and keeps its own
+    checkpoint.
+    """
+
+    def __init__(self, bot, path, concurrency=16, rate=40.0, interval=5.0, worker=None):
+        if worker is not None:
+            root, extension = os.path.splitext(path)
+            path = f'{root}-{worker}{extension}'
+        self.bot = bot
+        self.path = path
+        self.concurrency = concurrency
+        self.rate = rate
+        self.interval = interval
+        self.current = None
+        self._task = None
+        self._next_send = 0.0
+        self.messages = Counter('bot_broadcast_messages_total', 'Broadcast messages by outcome.', ('outcome',))
+
+    def collectors(self):
+        return [self.messages]
+
+    @property
+    def running(self):
+        return self.current is not None
+
+    def _save(self):
+        temporary = self.path + '.tmp'
+        with open(temporary, 'w', encoding='utf-8') as file:
+            json.dump(self.current.to_dict(), file)
+        os.replace(temporary, self.path)
+
+    def _clear(self):
+        try:
+            os.remove(self.path)
+        except FileNotFoundError:
+            pass
+
+    async def start(self, content, author, channels, status=None, locale=None):
+        """Starts a broadcast in the background and returns it."""
+        if self.running:
+            raise RuntimeError('A broadcast is already running')
+        self.current = Broadcast(content, author, channels, status, locale=locale)
+        self._save()
+        self._task = asyncio.ensure_future(self._run(self.current))
+        return self.current
+
+    def resume(self):
+        """Continues the broadcast saved in the checkpoint, if there is one."""
+        if self.running:
+            return None
+        try:
+            with open(self.path, encoding='utf-8') as file:
+                data = json.load(file)
+        except FileNotFoundError:
+            return None
+        except ValueError as error:
+            log.warning('Ignoring the broadcast checkpoint %s: %s', self.path, error)
+            return None
+        self.current = Broadcast(**data)
+        log.info('Resuming a broadcast with %d channels left', len(self.current.channels))
+        self._task = asyncio.ensure_future(self._run(self.current))
+        return self.current
+
+    def cancel(self):
+        if self.current is not None:
+            self.current.cancelled = True
+
+    async def _pace(self):
+        loop = asyncio.get_running_loop()
+        now = loop.time()
+        slot = max(now, self._next_send)
+        self._next_send = slot + 1 / self.rate
+        if slot > now:
+            await asyncio.sleep(slot - now)
+
+    async def _send(self, broadcast, channel_id):
+        channel = self.bot.get_channel(channel_id) or self.bot.get_partial_messageable(channel_id)
+        await self._pace()
+        try:
+            # Not the background lane: the outbox sheds its old messages while
+            # a channel is rate limited, and an announcement must not be lost.
+            message = await self.bot.outbox.send(channel, REPLY, content=broadcast.content, allowed_mentions=discord.AllowedMentions.none())
+        except discord.HTTPException as error:
+            # Usually a deleted channel or missing permissions.
+            log.debug('Broadcast to channel %s failed: %s', channel_id, error)
+            broadcast.failed += 1
+            self.messages.inc('failed')
+            return
+        except Exception:
+            log.exception('Broadcast to channel %s failed', channel_id)
+            broadcast.failed += 1
+            self.messages.inc('failed')
+            return
+        if message is None:
+            broadcast.skipped += 1
+            self.messages.inc('dropped')
+        else:
+            broadcast.sent += 1
+            self.messages.inc('sent')
+
+    async def _work(self, broadcast, queue):
+        while not broadcast.cancelled:
+            try:
+                channel_id = queue.get_nowait()
+            except asyncio.QueueEmpty:
+                return
+            await self._send(broadcast, channel_id)
+            broadcast.done.add(channel_id)
+
+    async def _run(self, broadcast):
+        queue = asyncio.Queue()
+        for channel_id in broadcast.channels:
+            queue.put_nowait(channel_id)
+        workers = {asyncio.ensure_future(self._work(broadcast, queue)) for _ in range(self.concurrency)}
+        try:
+            while workers:
+                _, workers = await asyncio.wait(workers, timeout=self.interval)
+                self._save()
+                if workers:
+                    await self._report(broadcast)
+        except asyncio.CancelledError:
+            # The bot is shutting down: the checkpoint stays for ``resume``.
+            for worker in workers:
+                worker.cancel()
+            self._save()
+            raise
+        self.current = None
+        self._clear()
+        await self._report(broadcast, finished=True)
+        log.info('Broadcast by %s finished: %d sent, %d failed, %d skipped', broadcast.author, broadcast.sent, broadcast.failed, broadcast.skipped)
+
+    def progress(self, broadcast, registry, finished=False):
+        elapsed = max(time.time() - broadcast.resumed_at, 1e-3)
+        rate = (broadcast.handled - broadcast.resumed_from) / elapsed
+        if finished:
+            state = registry.text('broadcast_cancelled' if broadcast.cancelled else 'broadcast_finished')
+        else:
+            state = registry.text('broadcasting')
+        text = registry.text('broadcast_progress', state=state, handled=broadcast.handled, total=broadcast.total, sent=broadcast.sent, failed=broadcast.failed)
+        if broadcast.skipped:
+            text += registry.text('broadcast_skipped', skipped=broadcast.skipped)
+        text += registry.text('broadcast_rate', rate=rate)
+        left = broadcast.total - broadcast.handled
+        if not finished and rate > 0 and left:
+            minutes = left / rate / 60
+            text += registry.text('broadcast_minutes', minutes=minutes) if minutes >= 1 else registry.text('broadcast_soon')
+        return text + ')'
+
+    async def _report(self, broadcast, finished=False):
+        if broadcast.status is None:
+            return
+        channel_id, message_id = broadcast.status
+        message = self.bot.get_partial_messageable(channel_id).get_partial_message(message_id)
+        try:
+            await message.edit(content=self.progress(broadcast, self.bot.locales.pick(broadcast.locale), finished))
+        except discord.HTTPException as error:
+            log.debug('Could not update the broadcast status: %s', error)
@@ -0,0 +1,237 @@
+import asyncio
+import json
+import logging
+import os
+import signal
+import sys
+import time
+
+import aiohttp
+from discord.ext import commands
+
+log = logging.getLogger(__name__)
+
+GATEWAY_URL = 'https://discord.com/api/v10/gateway/bot'
+IDENTIFY_INTERVAL = 5.0
+
+
+def shard_plan(shard_count, workers):
+    """Splits the shard IDs into one contiguous block per worker."""
+    workers = max(1, min(workers, shard_count))
+    size, extra = divmod(shard_count, workers)
+    plan = []
+    start = 0
+    for worker in range(workers):
+        end = start + size + (1 if worker < extra else 0)
+        plan.append(list(range(start, end)))
+        start = end
+    return plan
+
+
+def launch_options(argv=None):
+    """Reads ``--cluster [--shards N] [--workers M]`` from the command line.
+
+    Returns None when the bot was not started in cluster mode. ``shards``
+    is None when it should be taken from Discord's recommendation.
+    """
+    argv = sys.argv[1:] if argv is None else argv
+    if '--cluster' not in argv:
+        return None
+    options = {'shards': None, 'workers': os.cpu_count() or 1}
+    for name in ('shards', 'workers'):
+        flag = '--' + name
+        if flag in argv:
+            options[name] = int(argv[argv.index(flag) + 1])
+    return options
+
+
+def worker_options():
+    """Returns the sharding options of this process when it is a cluster worker.
+
+    The coordinator passes them through environment variables; outside of a
+    cluster this is an empty dict.
+    """
+    if 'BOT_CLUSTER_WORKER' not in os.environ:
+        return {}
+    return {
+        'shard_ids': [int(shard) for shard in os.environ['BOT_SHARD_IDS'].split(',')],
+        'shard_count': int(os.environ['BOT_SHARD_COUNT']),
+    }
+
+
+class ClusterClient:
+    """Connection from a worker to the coordinator.
+
+    Requests are JSON lines answered in order, so a lock keeps one request in
+    flight at a time and the connection is reopened if it drops.
+    """
+
+    def __init__(self, port, worker):
+        self.port = port
+        self.worker = worker
+        self.totals = {}
+        self._reader = None
+        self._writer = None
+        # Created in ``request``: before Python 3.10 a lock made outside the
+        # running loop is bound to the wrong one.
+        self._lock = None
+
+    @classmethod
+    def from_environment(cls):
+        if 'BOT_CLUSTER_WORKER' not in os.environ:
+            return None
+        return cls(int(os.environ['BOT_CLUSTER_PORT']), int(os.environ['BOT_CLUSTER_WORKER']))
+
+    async def request(self, message):
+        if self._lock is None:
+            self._lock = asyncio.Lock()
+        async with self._lock:
+            for attempt in range(2):
+                try:
+                    if self._writer is None:
+                        self._reader, self._writer = await asyncio.open_connection('127.0.0.1', self.port)
+                    self._writer.write(json.dumps(dict(message, worker=self.worker)).encode() + b'\n')
+                    await self._writer.drain()
+                    line = await self._reader.readline()
+                    if not line:
+                        raise ConnectionResetError('coordinator closed the connection')
+                    return json.loads(line)
+                except OSError:
+                    self._writer = None
+                    if attempt:
+                        raise
+
+    async def report(self, **stats):
+        """Sends this worker's counters and returns the sums over the whole cluster."""
+        reply = await self.request({'op': 'report', 'stats': stats})
+        self.totals = reply['totals']
+        return self.totals
+
+    async def wait_identify(self, shard_id):
+        await self.request({'op': 'identify', 'shard_id': shard_id})
+
+
+class ClusterBot(commands.AutoShardedBot):
+    """AutoShardedBot that runs a subset of the cluster's shards.
+
+    Every IDENTIFY waits for a slot from the coordinator, because the
+    identify rate limit is shared by all the processes of the bot.
+    """
+
+    def __init__(self, *args, cluster, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.cluster = cluster
+
+    async def before_identify_hook(self, shard_id, *, initial=False):
+        await self.cluster.wait_identify(shard_id)
+
+
+class Coordinator:
+    """Starts the workers, restarts them when they die and sums their stats."""
+
+    def __init__(self, token, script, shards=None, workers=1, port=0):
+        self.token = token
+        self.script = os.path.abspath(script)
+        self.shard_count = shards
+        self.workers = workers
+        self.port = port
+        self.max_concurrency = 1
+        self.stats = {}
+        self._identify_next = {}
+        self._processes = {}
+        self._stopping = False
+
+    async def fetch_recommendation(self):
+        headers = {'Authorization': 'Bot ' + self.token}
+        async with aiohttp.ClientSession() as session:
+            async with session.get(GATEWAY_URL, headers=headers) as response:
+                response.raise_for_status()
+                data = await response.json()
+        self.max_concurrency = data['session_start_limit']['max_concurrency']
+        if self.shard_count is None:
+            self.shard_count = data['shards']
+
+    def totals(self):
+        totals = {}
+        for stats in self.stats.values():
+            for name, value in stats.items():
+                totals[name] = totals.get(name, 0) + value
+        return totals
+
+    async def _grant_identify(self, shard_id):
+        # Shards share an identify bucket per shard_id % max_concurrency; each
+        # bucket may start one session every IDENTIFY_INTERVAL seconds.
+        # Nothing awaits between reading and booking the slot, so concurrent
+        # requests cannot get the same one.
+        bucket = shard_id % self.max_concurrency
+        now = time.monotonic()
+        start = max(now, self._identify_next.get(bucket, now))
+        self._identify_next[bucket] = start + IDENTIFY_INTERVAL
+        await asyncio.sleep(start - now)
+
+    async def _serve(self, reader, writer):
+        try:
+            while line := await reader.readline():
+                message = json.loads(line)
+                if message['op'] == 'identify':
+                    await self._grant_identify(message['shard_id'])
+                    reply = {'ok': True}
+                else:
+                    self.stats[message['worker']] = message['stats']
+                    reply = {'totals': self.totals()}
+                writer.write(json.dumps(reply).encode() + b'\n')
+                await writer.drain()
+        except (OSError, ValueError) as error:
+            log.warning('Dropped a worker connection: %s', error)
+        finally:
+            writer.close()
+
+    async def _supervise(self, worker, shard_ids):
+        env = dict(
+            os.environ,
+            BOT_CLUSTER_WORKER=str(worker),
+            BOT_CLUSTER_PORT=str(self.port),
+            BOT_SHARD_IDS=','.join(map(str, shard_ids)),
+            BOT_SHARD_COUNT=str(self.shard_count),
+        )
+        backoff = 1
+        while not self._stopping:
+            started = time.monotonic()
+            process = await asyncio.create_subprocess_exec(sys.executable, self.script, env=env)
+            self._processes[worker] = process
+            log.info('Worker %d started with shards %s (pid %d)', worker, shard_ids, process.pid)
+            code = await process.wait()
+            self.stats.pop(worker, None)
+            if self._stopping:
+                break
+            # A worker that stayed up for a while is restarted right away;
+            # one that keeps crashing on startup backs off up to a minute.
+            backoff = 1 if time.monotonic() - started > 60 else min(backoff * 2, 60)
+            log.warning('Worker %d exited with code %s, restarting in %ds', worker, code, backoff)
+            await asyncio.sleep(backoff)
+
+    def stop(self):
+        self._stopping = True
+        for process in self._processes.values():
+            if process.returncode is None:
+                process.terminate()
+
+    async def run(self):
+        await self.fetch_recommendation()
+        server = await asyncio.start_server(self._serve, '127.0.0.1', self.port)
+        self.port = server.sockets[0].getsockname()[1]
+        loop = asyncio.get_running_loop()
+        for signum in (signal.SIGINT, signal.SIGTERM):
+            try:
+                loop.add_signal_handler(signum, self.stop)
+            except NotImplementedError:
+                pass
+        plan = shard_plan(self.shard_count, self.workers)
+        log.info('Running %d shards on %d workers', self.shard_count, len(plan))
+        async with server:
+            await asyncio.gather(*(self._supervise(worker, shard_ids) for worker, shard_ids in enumerate(plan)))
+
+
+def run_coordinator(token, script, shards=None, workers=1):
+    logging.basicConfig(level=logging.INFO)
+    asyncio.run(Coordinator(token, script, shards, workers).run())
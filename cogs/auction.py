@@ -0,0 +1,98 @@
+import discord
+from discord.ext import commands
+
+import config
+from auction import item_key
+from content import context_catalog
+from economy import money
+
+
+def listing_line(registry, index, listing):
+    line = registry.text('ah_listing', item=index.names[item_key(listing.item)], amount=listing.amount, price=money(listing.price))
+    if listing.amount > 1:
+        line += registry.text('ah_each', price=money(listing.price / listing.amount))
+    line += registry.text('ah_seller', seller=discord.utils.escape_markdown(listing.seller))
+    if listing.expires:
+        line += registry.text('ah_ends', expires=int(listing.expires))
+    return line
+
+
+class Auction(commands.Cog):
+    """Listings of the server's auction house (/ah), read from its export."""
+
+    def __init__(self, bot):
+        self.bot = bot
+
+    async def available(self, ctx, registry):
+        if self.bot.auction is None or self.bot.auction.imported_at is None:
+            await ctx.send(registry.text('auction_unavailable'), ephemeral=True)
+            return False
+        return True
+
+    def updated(self, registry):
+        return registry.text('updated', timestamp=int(self.bot.auction.imported_at))
+
+    async def not_found(self, ctx, registry, item):
+        await ctx.send(registry.text('ah_none', item=discord.utils.escape_markdown(item[:50])), ephemeral=True)
+
+    @commands.hybrid_group(name='ah', description='Browses the listings of the auction house of the server.')
+    async def ah(self, ctx):
+        if ctx.invoked_subcommand is None:
+            registry, overrides = await context_catalog(ctx)
+            await ctx.send(registry.text('ah_usage', overrides), ephemeral=True)
+
+    @ah.command(name='search', description='Shows the cheapest listings of the items that match a name.')
+    async def search(self, ctx, *, item: str):
+        registry, overrides = await context_catalog(ctx)
+        if not await self.available(ctx, registry):
+            return
+        index = self.bot.auction.index
+        keys, listings = index.search(item, config.AUCTION_RESULTS)
+        if not listings:
+            await self.not_found(ctx, registry, item)
+            return
+        embed = discord.Embed(
+            title=registry.text('ah_title', query=item[:200]),
+            description=' \n'.join(listing_line(registry, index, listing) for listing in listings) + ' \n\n' + self.updated(registry),
+            color=discord.Color.purple()
+        )
+        embed.set_footer(text=registry.text('ah_search_footer', overrides, listings=sum(len(index.items[key]) for key in keys), items=len(keys)))
+        await ctx.send(embed=embed)
+
+    @ah.command(name='cheapest', description='Shows the cheapest listings and the price trend of an item.')
+    async def cheapest(self, ctx, *, item: str):
+        registry, overrides = await context_catalog(ctx)
+        if not await self.available(ctx, registry):
+            return
+        index = self.bot.auction.index
+        keys = index.resolve(item)
+        if not keys:
+            await self.not_found(ctx, registry, item)
+            return
+        key = keys[0]
+        listings = index.cheapest(key, config.AUCTION_CHEAPEST)
+        if not listings:
+            # Every listing of the item expired since the last import.
+            await self.not_found(ctx, registry, item)
+            return
+        embed = discord.Embed(
+            title=index.names[key],
+            description=' \n'.join(listing_line(registry, index, listing) for listing in listings) + ' \n\n' + self.updated(registry),
+            color=discord.Color.purple()
+        )
+        history = self.bot.auction.history.get(key)
+        if history is not None and len(history) > 1:
+            low = listings[0].price / listings[0].amount
+            since, then = history.oldest()
+            change = (low - then) / then if then else 0
+            embed.add_field(
+                name=registry.text('ah_trend'),
+                value=registry.text('ah_trend_value', low=money(low), change=change, since=int(since), average=money(history.average()), imports=len(history)),
+                inline=False
+            )
+        embed.set_footer(text=registry.text('ah_cheapest_footer', overrides, listings=len(index.items[key])))
+        await ctx.send(embed=embed)
+
+
+async def setup(bot):
+    await bot.add_cog(Auction(bot))
@@ -0,0 +1,68 @@
+import logging
+
+from discord.ext import commands
+
+import config
+from broadcast import announcement_channels
+from content import context_catalog
+from outbox import MODERATION
+
+log = logging.getLogger(__name__)
+
+# A broadcast reaches every server, so being staff in one of them is not
+# enough: only the users listed in config.OWNER_IDS can send one.
+owner_only = commands.check(lambda ctx: ctx.author.id in config.OWNER_IDS)
+
+
+class Broadcast(commands.Cog):
+    """Staff announcements sent to every server the bot is in.
+
+    Each server gets the message in the channel set with +settings
+    announcements, or else in its system channel. Only the bot owners can
+    use these commands, and every broadcast is logged with its author.
+    """
+
+    def __init__(self, bot):
+        self.bot = bot
+
+    @commands.hybrid_group(name='broadcast', fallback='send', invoke_without_command=True, description='Sends an announcement to every server of the bot.', extras={'lane': MODERATION})
+    @owner_only
+    async def broadcast(self, ctx, *, message: str):
+        registry, _ = await context_catalog(ctx)
+        broadcaster = self.bot.broadcaster
+        if broadcaster.running:
+            await ctx.send(registry.text('broadcast_running', progress=broadcaster.progress(broadcaster.current, registry)), ephemeral=True)
+            return
+        channels = await announcement_channels(self.bot)
+        if not channels:
+            await ctx.send(registry.text('broadcast_no_channels'), ephemeral=True)
+            return
+        log.info('%s (%s) broadcast to %d channels: %s', ctx.author, ctx.author.id, len(channels), message)
+        status = await ctx.send(registry.text('broadcast_starting', servers=len(channels)))
+        await broadcaster.start(message[:2000], str(ctx.author), channels, (status.channel.id, status.id) if status else None, registry.locale)
+
+    @broadcast.command(name='status', description='Shows the progress of the running broadcast.', extras={'lane': MODERATION})
+    @owner_only
+    async def status(self, ctx):
+        registry, _ = await context_catalog(ctx)
+        broadcaster = self.bot.broadcaster
+        if not broadcaster.running:
+            await ctx.send(registry.text('broadcast_none'), ephemeral=True)
+            return
+        await ctx.send(broadcaster.progress(broadcaster.current, registry), ephemeral=True)
+
+    @broadcast.command(name='cancel', description='Stops the running broadcast.', extras={'lane': MODERATION})
+    @owner_only
+    async def cancel(self, ctx):
+        registry, _ = await context_catalog(ctx)
+        broadcaster = self.bot.broadcaster
+        if not broadcaster.running:
+            await ctx.send(registry.text('broadcast_none'), ephemeral=True)
+            return
+        log.info('%s (%s) cancelled the broadcast', ctx.author, ctx.author.id)
+        broadcaster.cancel()
+        await ctx.send(registry.text('broadcast_cancelling'), ephemeral=True)
+
+
+async def setup(bot):
+    await bot.add_cog(Broadcast(bot))
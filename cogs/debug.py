@@ -0,0 +1,44 @@
+from discord.ext import commands
+
+from cogs.staff import staff_only
+from content import context_catalog
+from outbox import MODERATION
+from watchdog import short_path
+
+
+class Debug(commands.Cog):
+    """Staff commands that show what the bot itself is doing."""
+
+    def __init__(self, bot):
+        self.bot = bot
+
+    @commands.hybrid_group(name='debug', description='Shows the internal state of the bot.', extras={'lane': MODERATION})
+    @staff_only
+    async def debug(self, ctx):
+        if ctx.invoked_subcommand is None:
+            registry, overrides = await context_catalog(ctx)
+            await ctx.send(registry.text('debug_usage', overrides), ephemeral=True)
+
+    @debug.command(name='loop', description='Shows the callbacks that blocked the event loop the longest.', extras={'lane': MODERATION})
+    @staff_only
+    async def loop(self, ctx):
+        registry, _ = await context_catalog(ctx)
+        watchdog = self.bot.watchdog
+        lines = [registry.text('loop_summary', lag=watchdog.lag * 1000, threshold=watchdog.threshold * 1000, stalls=watchdog.stalls.values[()])]
+        for number, stall in enumerate(watchdog.offenders(), 1):
+            lines.append(registry.text('loop_stall', number=number, duration=stall.duration * 1000, timestamp=int(stall.timestamp)))
+            if not stall.stack:
+                lines.append(registry.text('loop_no_stack'))
+            for filename, line, name in stall.stack[-4:]:
+                lines.append(registry.text('loop_frame', file=short_path(filename), line=line, function=name))
+        text = ''
+        for line in lines:
+            if len(text) + len(line) > 1900:
+                text += '...'
+                break
+            text += line + '\n'
+        await ctx.send(text, ephemeral=True)
+
+
+async def setup(bot):
+    await bot.add_cog(Debug(bot))
@@ -0,0 +1,59 @@
+import discord
+from discord.ext import commands
+
+import config
+from content import context_catalog
+from economy import money
+
+
+class Economy(commands.Cog):
+    """Leaderboard and balances of the server's economy, read from its export."""
+
+    def __init__(self, bot):
+        self.bot = bot
+
+    async def available(self, ctx, registry):
+        if self.bot.economy is None or self.bot.economy.imported_at is None:
+            await ctx.send(registry.text('economy_unavailable'), ephemeral=True)
+            return False
+        return True
+
+    def updated(self, registry):
+        return registry.text('updated', timestamp=int(self.bot.economy.imported_at))
+
+    @commands.hybrid_command(name='baltop', description='Shows the richest players of the server.')
+    async def baltop(self, ctx):
+        registry, overrides = await context_catalog(ctx)
+        if not await self.available(ctx, registry):
+            return
+        leaderboard = self.bot.economy.leaderboard
+        lines = [f'{rank}) **{discord.utils.escape_markdown(name)}**: {money(balance)}' for rank, name, balance in leaderboard.top(config.ECONOMY_TOP)]
+        embed = discord.Embed(
+            title=registry.text('baltop_title'),
+            description=' \n'.join(lines) + ' \n\n' + self.updated(registry),
+            color=discord.Color.purple()
+        )
+        embed.set_footer(text=registry.text('baltop_footer', overrides, players=len(leaderboard)))
+        await ctx.send(embed=embed)
+
+    @commands.hybrid_command(name='balance', aliases=['money'], description='Shows the balance of a player of the server.')
+    async def balance(self, ctx, player: str):
+        registry, overrides = await context_catalog(ctx)
+        if not await self.available(ctx, registry):
+            return
+        entry = self.bot.economy.leaderboard.lookup(player)
+        if entry is None:
+            await ctx.send(registry.text('balance_none', player=discord.utils.escape_markdown(player[:16])), ephemeral=True)
+            return
+        rank, name, balance = entry
+        embed = discord.Embed(
+            title=name,
+            description=registry.text('balance', balance=money(balance), rank=rank, players=len(self.bot.economy.leaderboard)) + ' \n\n' + self.updated(registry),
+            color=discord.Color.purple()
+        )
+        embed.set_footer(text=registry.text('balance_footer', overrides))
+        await ctx.send(embed=embed)
+
+
+async def setup(bot):
+    await bot.add_cog(Economy(bot))
@@ -0,0 +1,78 @@
+import discord
+from discord.ext import commands
+
+from content import context_catalog
+
+
+class Info(commands.Cog):
+    """Commands that answer from the locale files: prebuilt embeds and texts, and the +rule search."""
+
+    def __init__(self, bot):
+        self.bot = bot
+
+    async def send_static(self, ctx, key):
+        registry, overrides = await context_catalog(ctx)
+        await self.bot.deduper.send(ctx, key, registry.get(key, overrides), registry)
+
+    @commands.hybrid_command(name='help', description='Lists the commands of the bot.')
+    async def help(self, ctx):
+        await self.send_static(ctx, 'help')
+
+    @commands.hybrid_command(name='a', description='Checks that the bot is working.')
+    async def a(self, ctx):
+        await self.send_static(ctx, 'a')
+
+    @commands.hybrid_command(name='store', description='Donations and ranks page.')
+    async def store(self, ctx):
+        await self.send_static(ctx, 'store')
+
+    @commands.hybrid_command(name='ip', description='Displays the IP of the Minecraft server.')
+    async def ip(self, ctx):
+        await self.send_static(ctx, 'ip')
+
+    @commands.hybrid_command(name='rules', description='Classification of Minecraft server rules: major, minor, trial, and staff.')
+    async def rules(self, ctx):
+        await self.send_static(ctx, 'rules')
+
+    @commands.hybrid_command(name='minor', description='Displays minor rules.')
+    async def minor(self, ctx):
+        await self.send_static(ctx, 'minor')
+
+    @commands.hybrid_command(name='major', description='Displays major rules.')
+    async def major(self, ctx):
+        await self.send_static(ctx, 'major')
+
+    @commands.hybrid_command(name='trial', description='Displays rules applicable in trial.')
+    async def trial(self, ctx):
+        await self.send_static(ctx, 'trial')
+
+    @commands.hybrid_command(name='clans', description='Displays clan rules.')
+    async def clans(self, ctx):
+        await self.send_static(ctx, 'clans')
+
+    @commands.hybrid_command(name='staff', description='Displays Minecraft staff rules.')
+    async def staff(self, ctx):
+        await self.send_static(ctx, 'staff')
+
+    @commands.hybrid_command(name='rule', description='Searches the rules and in-game commands.')
+    async def rule(self, ctx, *, query: str):
+        registry, overrides = await context_catalog(ctx)
+        hits = self.bot.rule_indexes[registry.locale].search(query)
+        if not hits:
+            await ctx.send(registry.text('rule_none', overrides, query=discord.utils.escape_markdown(query[:100])), ephemeral=True)
+            return
+        embed = discord.Embed(title=registry.text('rule_title', query=query[:200]), color=discord.Color.purple())
+        for hit in hits:
+            title = registry.section(hit.section)['title']
+            embed.add_field(name=title if hit.number is None else f'{title} {hit.number}', value=hit.text[:1024], inline=False)
+        embed.set_footer(text=registry.text('more_commands', overrides))
+        await ctx.send(embed=embed)
+
+    # Named differently so the method does not hide the `commands` module in the class body.
+    @commands.hybrid_command(name='commands', description='List of commands you can use on the server.')
+    async def in_game_commands(self, ctx):
+        await self.send_static(ctx, 'commands')
+
+
+async def setup(bot):
+    await bot.add_cog(Info(bot))
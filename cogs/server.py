@@ -0,0 +1,24 @@
+from discord.ext import commands
+
+from content import context_catalog
+
+
+class Server(commands.Cog):
+    """Status of the Minecraft servers, answered from the background pings."""
+
+    def __init__(self, bot):
+        self.bot = bot
+
+    @commands.hybrid_command(name='status', description='Shows whether the Minecraft server is online and how many players are on it.')
+    async def status(self, ctx):
+        registry, overrides = await context_catalog(ctx)
+        await self.bot.deduper.send(ctx, 'status', await self.bot.network.primary.payload(registry, overrides), registry)
+
+    @commands.hybrid_command(name='network', description='Shows the status, uptime and peak players of every server of the network.')
+    async def network(self, ctx):
+        registry, overrides = await context_catalog(ctx)
+        await self.bot.deduper.send(ctx, 'network', await self.bot.network.payload(registry, overrides), registry)
+
+
+async def setup(bot):
+    await bot.add_cog(Server(bot))
@@ -0,0 +1,97 @@
+import discord
+from discord.ext import commands
+
+import config
+from content import context_catalog
+
+manage_guild = commands.has_permissions(manage_guild=True)
+
+
+class Settings(commands.Cog):
+    """Per-guild settings: the prefix, the +ip and +store links, the announcements channel and the language.
+
+    Only members with the Manage Server permission can change them. A
+    setting given without a value goes back to the bot's default.
+    """
+
+    def __init__(self, bot):
+        self.bot = bot
+
+    async def change(self, ctx, **changes):
+        settings = await self.bot.guild_config.set(ctx.guild.id, **changes)
+        await self.show(ctx, settings)
+
+    async def show(self, ctx, settings):
+        registry, _ = await context_catalog(ctx)
+        await ctx.send(
+            registry.text(
+                'settings',
+                prefix=settings.prefix or config.PREFIX,
+                ip=settings.ip or config.SERVER_IP,
+                store=settings.store or config.STORE_URL,
+                announcements=f'<#{settings.announcements}>' if settings.announcements else registry.text('system_channel'),
+                language=self.bot.locales.pick(settings.locale).text('language_name') if settings.locale else registry.text('user_language'),
+            ),
+            ephemeral=True,
+        )
+
+    async def refuse(self, ctx, key, **values):
+        registry, _ = await context_catalog(ctx)
+        await ctx.send(registry.text(key, **values), ephemeral=True)
+
+    @commands.hybrid_group(name='settings', description='Shows or changes the settings of the bot in this server.')
+    @commands.guild_only()
+    @manage_guild
+    async def settings(self, ctx):
+        if ctx.invoked_subcommand is None:
+            await self.show(ctx, await self.bot.guild_config.get(ctx.guild.id))
+
+    @settings.command(name='prefix', description='Changes the prefix of the commands in this server.')
+    @manage_guild
+    async def prefix(self, ctx, prefix: str = None):
+        if prefix is not None and (len(prefix) > 5 or '`' in prefix):
+            await self.refuse(ctx, 'invalid_prefix')
+            return
+        await self.change(ctx, prefix=prefix)
+
+    @settings.command(name='ip', description='Changes the address shown by +ip in this server.')
+    @manage_guild
+    async def ip(self, ctx, address: str = None):
+        if address is not None and (len(address) > 100 or '`' in address):
+            await self.refuse(ctx, 'invalid_ip')
+            return
+        await self.change(ctx, ip=address)
+
+    @settings.command(name='store', description='Changes the link shown by +store in this server.')
+    @manage_guild
+    async def store(self, ctx, url: str = None):
+        if url is not None and (len(url) > 200 or '`' in url or not url.startswith(('https://', 'http://'))):
+            await self.refuse(ctx, 'invalid_store')
+            return
+        await self.change(ctx, store=url)
+
+    @settings.command(name='announcements', description='Changes the channel that receives the announcements of the bot.')
+    @manage_guild
+    async def announcements(self, ctx, channel: discord.TextChannel = None):
+        if channel is not None and not channel.permissions_for(ctx.guild.me).send_messages:
+            await self.refuse(ctx, 'cannot_send', channel=channel.mention)
+            return
+        await self.change(ctx, announcements=channel.id if channel else None)
+
+    @settings.command(name='language', description='Changes the language of the bot in this server.')
+    @manage_guild
+    async def language(self, ctx, locale: str = None):
+        if locale is not None and locale not in self.bot.locales:
+            languages = ', '.join(f'`{code}` ({self.bot.locales[code].text("language_name")})' for code in self.bot.locales)
+            await self.refuse(ctx, 'invalid_language', languages=languages)
+            return
+        await self.change(ctx, locale=locale)
+
+    @settings.command(name='reset', description='Restores the default settings in this server.')
+    @manage_guild
+    async def reset(self, ctx):
+        await self.show(ctx, await self.bot.guild_config.reset(ctx.guild.id))
+
+
+async def setup(bot):
+    await bot.add_cog(Settings(bot))
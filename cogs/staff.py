@@ -0,0 +1,66 @@
+import logging
+
+from discord.ext import commands
+
+import config
+from content import context_catalog
+from outbox import MODERATION
+from rcon import PLAYER_NAME, RconError, clean
+
+log = logging.getLogger(__name__)
+
+
+def is_staff(ctx):
+    if ctx.guild is None or ctx.guild.id != config.STAFF_GUILD:
+        return False
+    return any(role.id in config.STAFF_ROLES for role in getattr(ctx.author, 'roles', ()))
+
+
+staff_only = commands.check(is_staff)
+
+
+class Staff(commands.Cog):
+    """Staff commands that run on the Minecraft server through RCON.
+
+    Only members of ``config.STAFF_GUILD`` with one of ``config.STAFF_ROLES``
+    can use them, and every command is logged with its author.
+    Their answers use the moderation lane of the outbox.
+    """
+
+    def __init__(self, bot):
+        self.bot = bot
+
+    async def run_rcon(self, ctx, command):
+        log.info('%s (%s) ran on the server: %s', ctx.author, ctx.author.id, command)
+        registry, _ = await context_catalog(ctx)
+        try:
+            output = await self.bot.rcon.command(command)
+        except RconError as error:
+            await ctx.send(registry.text('rcon_failed', error=error), ephemeral=True)
+            return
+        await ctx.send('`' + command + '`\n' + (output[:1900] or registry.text('done')), ephemeral=True)
+
+    @commands.hybrid_group(name='mc', description='Staff commands that run on the Minecraft server.', extras={'lane': MODERATION})
+    @staff_only
+    async def mc(self, ctx):
+        if ctx.invoked_subcommand is None:
+            registry, overrides = await context_catalog(ctx)
+            await ctx.send(registry.text('mc_usage', overrides), ephemeral=True)
+
+    @mc.command(name='kick', description='Kicks a player from the Minecraft server.', extras={'lane': MODERATION})
+    @staff_only
+    async def kick(self, ctx, player: str, *, reason: str = ''):
+        if not PLAYER_NAME.fullmatch(player):
+            registry, _ = await context_catalog(ctx)
+            await ctx.send(registry.text('invalid_player'), ephemeral=True)
+            return
+        await self.run_rcon(ctx, clean('kick ' + player + ' ' + reason))
+
+    @mc.command(name='say', description='Broadcasts a message to everyone on the Minecraft server.', extras={'lane': MODERATION})
+    @staff_only
+    async def say(self, ctx, *, message: str):
+        await self.run_rcon(ctx, 'say ' + clean(message))
+
+
+async def setup(bot):
+    await bot.add_cog(Staff(bot))
@@ -0,0 +1,152 @@
+import os
+
+
+def rate(value):
+    """Parses a "rate/seconds" limit such as "5/10"; "off" disables it."""
+    if value == 'off':
+        return None
+    count, seconds = value.split('/')
+    return int(count), float(seconds)
+
+
+# Runs the bot with application (slash) commands only. The message content
+# and guild message intents are dropped, so Discord stops delivering the
+# messages of every channel and the `+` prefix only keeps working in DMs.
+SLASH_ONLY = os.environ.get('BOT_SLASH_ONLY', '0') == '1'
+
+# File that remembers the hash of the last command tree uploaded to Discord.
+TREE_HASH_PATH = os.environ.get('BOT_TREE_HASH_PATH', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'tree_hash.json'))
+
+# Gateway and cache profile: "default" or "lean". The lean profile only
+# receives the events the commands use and disables the message and member
+# caches; see profiles.py.
+PROFILE = os.environ.get('BOT_PROFILE', 'default')
+
+# Command cooldowns as "commands/seconds" per user, per channel and per guild.
+COOLDOWN_USER = rate(os.environ.get('BOT_COOLDOWN_USER', '5/10'))
+COOLDOWN_CHANNEL = rate(os.environ.get('BOT_COOLDOWN_CHANNEL', '10/10'))
+COOLDOWN_GUILD = rate(os.environ.get('BOT_COOLDOWN_GUILD', '30/10'))
+
+# Seconds during which a static embed already posted in a channel is answered
+# with a reply pointing at it instead of being sent again. 0 disables it.
+DEDUP_SECONDS = float(os.environ.get('BOT_DEDUP_SECONDS', '20'))
+
+# Minecraft server pinged by +status, and seconds between pings.
+MINECRAFT_HOST = os.environ.get('BOT_MINECRAFT_HOST', 'play.olympusland.xyz')
+MINECRAFT_PORT = int(os.environ.get('BOT_MINECRAFT_PORT', '25565'))
+STATUS_INTERVAL = float(os.environ.get('BOT_STATUS_INTERVAL', '30'))
+
+
+def servers(value):
+    """Parses "Name=host:port,Other=host" into (name, host, port) tuples."""
+    result = []
+    for entry in filter(None, (part.strip() for part in value.split(','))):
+        name, _, address = entry.rpartition('=')
+        host, _, port = address.partition(':')
+        result.append((name or host, host, int(port or 25565)))
+    return result
+
+
+# Servers shown by +network. The main server above always comes first; more
+# backends can be added as "Name=host:port,Other=host:port".
+MINECRAFT_SERVERS = [('OlympusLand', MINECRAFT_HOST, MINECRAFT_PORT)] + servers(os.environ.get('BOT_MINECRAFT_NETWORK', ''))
+
+# Servers pinged at the same time, seconds before a ping is given up, and
+# samples of history kept per server (2880 samples is a day at 30 seconds).
+STATUS_CONCURRENCY = int(os.environ.get('BOT_STATUS_CONCURRENCY', '8'))
+STATUS_TIMEOUT = float(os.environ.get('BOT_STATUS_TIMEOUT', '5'))
+STATUS_HISTORY = int(os.environ.get('BOT_STATUS_HISTORY', '2880'))
+
+# RCON of the main server, used by the +mc staff commands. They are disabled
+# while no password is set. Connections are kept open and shared.
+RCON_HOST = os.environ.get('BOT_RCON_HOST', MINECRAFT_HOST)
+RCON_PORT = int(os.environ.get('BOT_RCON_PORT', '25575'))
+RCON_PASSWORD = os.environ.get('BOT_RCON_PASSWORD', '')
+RCON_POOL_SIZE = int(os.environ.get('BOT_RCON_POOL_SIZE', '2'))
+
+# Staff commands (+mc, +debug) only work in the staff guild, for members with
+# one of the STAFF_ROLES, given as role IDs separated by commas. Role names
+# and the Administrator permission are not enough, since anyone can create a
+# server with a role of that name and invite the bot.
+STAFF_GUILD = int(os.environ.get('BOT_STAFF_GUILD', '0'))
+STAFF_ROLES = [int(role) for role in filter(None, (role.strip() for role in os.environ.get('BOT_STAFF_ROLES', '').split(',')))]
+
+# Chat relay between the Minecraft server and a Discord channel. Set the
+# channel ID and the path of the server's logs/latest.log to enable it.
+# Lines are posted together every RELAY_FLUSH seconds; at most RELAY_QUEUE
+# lines wait at a time, the oldest ones are dropped beyond that.
+RELAY_CHANNEL = int(os.environ.get('BOT_RELAY_CHANNEL', '0'))
+RELAY_LOG = os.environ.get('BOT_RELAY_LOG', '')
+RELAY_FLUSH = float(os.environ.get('BOT_RELAY_FLUSH', '2'))
+RELAY_QUEUE = int(os.environ.get('BOT_RELAY_QUEUE', '500'))
+
+# Defaults of the settings each guild can change with +settings: the command
+# prefix, the address shown by +ip and the link shown by +store. The settings
+# are kept in an SQLite database; those of up to GUILD_CACHE_SIZE guilds are
+# held in memory.
+PREFIX = os.environ.get('BOT_PREFIX', '+')
+SERVER_IP = os.environ.get('BOT_SERVER_IP', 'play.olympusland.xyz')
+STORE_URL = os.environ.get('BOT_STORE_URL', 'https://olympusland.tebex.io')
+GUILD_DB_PATH = os.environ.get('BOT_GUILD_DB_PATH', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'guilds.db'))
+GUILD_CACHE_SIZE = int(os.environ.get('BOT_GUILD_CACHE_SIZE', '10000'))
+
+# Outbox that sends the bot's messages by priority (moderation, replies, then
+# background posts such as the chat relay). While a channel is rate limited,
+# background messages older than OUTBOX_STALE seconds are dropped, and each
+# channel holds at most OUTBOX_QUEUE waiting messages.
+OUTBOX_STALE = float(os.environ.get('BOT_OUTBOX_STALE', '10'))
+OUTBOX_QUEUE = int(os.environ.get('BOT_OUTBOX_QUEUE', '50'))
+
+# Sections of the locale files with more than PAGE_LINES lines (the major
+# rules and the in-game commands) are split into pages with buttons to switch
+# between them.
+PAGE_LINES = int(os.environ.get('BOT_PAGE_LINES', '12'))
+
+# Language of the locales folder used when a guild chose none and the user's
+# or guild's language has no file, and whose texts fill the ones missing from
+# the other languages.
+LOCALE = os.environ.get('BOT_LOCALE', 'en')
+
+# Economy export of the Minecraft server, read every ECONOMY_INTERVAL seconds
+# for +baltop and +balance: an SQLite database (queried with ECONOMY_QUERY,
+# which returns the name and balance of each player), a JSON object of names
+# and balances, or a CSV file. Leave the path empty to disable them.
+ECONOMY_PATH = os.environ.get('BOT_ECONOMY_PATH', '')
+ECONOMY_QUERY = os.environ.get('BOT_ECONOMY_QUERY', 'SELECT name, balance FROM balances')
+ECONOMY_INTERVAL = float(os.environ.get('BOT_ECONOMY_INTERVAL', '60'))
+ECONOMY_TOP = int(os.environ.get('BOT_ECONOMY_TOP', '10'))
+
+# Auction house export of the Minecraft server, read every AUCTION_INTERVAL
+# seconds for +ah: an SQLite database (queried with AUCTION_QUERY, which
+# returns the id, item, seller, price, amount and expiry time of each
+# listing), a CSV file with a header line or a JSON Lines file. The lowest
+# price of each item is kept for the last AUCTION_HISTORY imports. Leave the
+# path empty to disable the commands.
+AUCTION_PATH = os.environ.get('BOT_AUCTION_PATH', '')
+AUCTION_QUERY = os.environ.get('BOT_AUCTION_QUERY', 'SELECT id, item, seller, price, amount, expires FROM listings')
+AUCTION_INTERVAL = float(os.environ.get('BOT_AUCTION_INTERVAL', '300'))
+AUCTION_HISTORY = int(os.environ.get('BOT_AUCTION_HISTORY', '288'))
+AUCTION_RESULTS = int(os.environ.get('BOT_AUCTION_RESULTS', '10'))
+AUCTION_CHEAPEST = int(os.environ.get('BOT_AUCTION_CHEAPEST', '5'))
+
+# Staff announcements sent with +broadcast to every server of the bot. Up to
+# BROADCAST_CONCURRENCY messages are in flight and at most BROADCAST_RATE are
+# sent per second. The servers left are saved to BROADCAST_CHECKPOINT every
+# BROADCAST_INTERVAL seconds, when the status message is also updated, so an
+# interrupted broadcast continues after a restart. Only the Discord users whose
+# IDs are listed in OWNER_IDS, separated by commas, can send a broadcast.
+OWNER_IDS = [int(owner) for owner in filter(None, (owner.strip() for owner in os.environ.get('BOT_OWNER_IDS', '').split(',')))]
+BROADCAST_CHECKPOINT = os.environ.get('BOT_BROADCAST_CHECKPOINT', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'broadcast.json'))
+BROADCAST_CONCURRENCY = int(os.environ.get('BOT_BROADCAST_CONCURRENCY', '16'))
+BROADCAST_RATE = float(os.environ.get('BOT_BROADCAST_RATE', '40'))
+BROADCAST_INTERVAL = float(os.environ.get('BOT_BROADCAST_INTERVAL', '5'))
+
+# Watchdog of the event loop: a callback that holds the loop for longer than
+# WATCHDOG_THRESHOLD seconds is logged with its stack, and the WATCHDOG_WORST
+# longest ones are shown by +debug loop and /health. Set WATCHDOG_PROFILE to
+# a path to also sample the loop every WATCHDOG_PROFILE_INTERVAL seconds and
+# write the stacks there in the collapsed format of flamegraph.pl.
+WATCHDOG_THRESHOLD = float(os.environ.get('BOT_WATCHDOG_THRESHOLD', '0.25'))
+WATCHDOG_WORST = int(os.environ.get('BOT_WATCHDOG_WORST', '10'))
+WATCHDOG_PROFILE = os.environ.get('BOT_WATCHDOG_PROFILE', '')
+WATCHDOG_PROFILE_INTERVAL = float(os.environ.get('BOT_WATCHDOG_PROFILE_INTERVAL', '0.01'))
@@ -0,0 +1,517 @@
+import collections
+import json
+import logging
+import math
+import os
+import string
+import sys
+import types
+
+import discord
+
+log = logging.getLogger(__name__)
+
+LOCALES_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'locales')
+
+# Key of the object of a locale file that holds the messages of the command
+# handlers rather than a section.
+MESSAGES = 'messages'
+
+
+# Discord's limits on the text of an embed: its description, and everything
+# together (title, description, fields and footer).
+DESCRIPTION_LIMIT = 4096
+EMBED_LIMIT = 6000
+
+# Buttons sent before the locales were added have no locale in their ID.
+PAGE_ID = r'page:(?P<key>[\w-]+):(?P<page>\d+)(?::(?P<locale>[\w-]+))?'
+
+
+def section_lines(section):
+    """The lines of a section as shown, numbered if the section asks for it."""
+    lines = section['lines']
+    if section.get('numbered'):
+        lines = [f'{number}) {line}' for number, line in enumerate(lines, start=1)]
+    return lines
+
+
+def paginate(lines, per_page, limit, note=None):
+    """Splits lines into page descriptions of at most ``per_page`` lines and ``limit`` characters.
+
+    The note goes after the last line, or on a page of its own when it
+    does not fit there. The lines are spread evenly, so 16 lines with
+    ``per_page`` 12 make two pages of 8 rather than 12 and 4.
+    """
+    if lines:
+        per_page = math.ceil(len(lines) / math.ceil(len(lines) / per_page))
+    pages = []
+    page = []
+    size = 0
+    for line in lines:
+        line = line[:limit]
+        if page and (len(page) >= per_page or size + 2 + len(line) > limit):
+            pages.append(' \n'.join(page))
+            page, size = [], 0
+        size += len(line) + (2 if page else 0)
+        page.append(line)
+    pages.append(' \n'.join(page))
+    if note:
+        note = note[:limit]
+        if len(pages[-1]) + 3 + len(note) <= limit:
+            pages[-1] += ' \n\n' + note
+        else:
+            pages.append(note)
+    return pages
+
+
+def render_description(section):
+    """Joins the lines of a section into the description text shown in its embed."""
+    if 'lines' not in section:
+        return section.get('description')
+    description = ' \n'.join(section_lines(section))
+    if section.get('note'):
+        description += ' \n\n' + section['note']
+    return description
+
+
+def fill(value, variables):
+    """Replaces the ``{name}`` placeholders in the strings of a section."""
+    if isinstance(value, str):
+        for name, replacement in variables.items():
+            value = value.replace('{' + name + '}', replacement)
+        return value
+    if isinstance(value, list):
+        return [fill(item, variables) for item in value]
+    if isinstance(value, dict):
+        return {key: fill(item, variables) for key, item in value.items()}
+    return value
+
+
+def placeholders(section, names):
+    """The names of ``names`` whose placeholder appears in a section."""
+    text = json.dumps(section, ensure_ascii=False)
+    return frozenset(name for name in names if '{' + name + '}' in text)
+
+
+def render(section):
+    """Builds the keyword arguments for ``send`` from a content section.
+
+    The result is a read-only mapping so a cached payload can be shared
+    between every invocation of a command.
+    """
+    return render_pages(section)[0]
+
+
+def render_pages(section, key=None, per_page=None, locale=None, label='Page {page}/{pages}'):
+    """Builds the payloads of the pages of a content section.
+
+    A section with more than ``per_page`` lines, or with more text than
+    fits in an embed, is split into pages when its ``key`` is given. Each page has the number of
+    the page in its footer, written with ``label``, and the buttons that
+    switch to the previous or the next page of the same ``locale``; a
+    section that fits in one page renders as before.
+    """
+    if 'text' in section:
+        return (types.MappingProxyType({'content': section['text']}),)
+    fields = section.get('fields', ())
+    footer = section.get('footer') or ''
+    descriptions = [render_description(section)]
+    if key is not None and 'lines' in section:
+        # Room left for the description once the rest of the embed and a
+        # "Page n/m · " prefix in the footer are counted.
+        used = len(section['title']) + len(footer) + len(label.format(page=99, pages=99) + ' · ') + sum(len(field['name']) + len(field['value']) for field in fields)
+        limit = min(DESCRIPTION_LIMIT, EMBED_LIMIT - used)
+        if len(descriptions[0]) > limit or (per_page and len(section['lines']) > per_page):
+            descriptions = paginate(section_lines(section), per_page or len(section['lines']), limit, section.get('note'))
+    pages = []
+    for number, description in enumerate(descriptions):
+        embed = discord.Embed(title=section['title'], description=description, color=discord.Color.purple())
+        for field in fields:
+            embed.add_field(name=field['name'], value=field['value'], inline=False)
+        payload = {'embed': embed}
+        if len(descriptions) > 1:
+            embed.set_footer(text=label.format(page=number + 1, pages=len(descriptions)) + (' · ' + footer if footer else ''))
+            payload['view'] = page_buttons(key, number, len(descriptions), locale)
+        elif footer:
+            embed.set_footer(text=footer)
+        pages.append(types.MappingProxyType(payload))
+    return tuple(pages)
+
+
+class PageButton(discord.ui.DynamicItem[discord.ui.Button], template=PAGE_ID):
+    """Button that shows another page of a paginated section.
+
+    The key of the section, the page number and the locale are stored in
+    the custom ID, so the buttons keep no state and still work after a
+    restart. Clicking one edits the message with the prebuilt payload of
+    that page, in the language the message was sent in.
+    """
+
+    def __init__(self, key, page, label='', disabled=False, locale=None):
+        custom_id = f'page:{key}:{page}' + (f':{locale}' if locale else '')
+        super().__init__(discord.ui.Button(label=label, style=discord.ButtonStyle.secondary, custom_id=custom_id, disabled=disabled))
+        self.key = key
+        self.page = page
+        self.locale = locale
+
+    @classmethod
+    async def from_custom_id(cls, interaction, item, match):
+        return cls(match['key'], int(match['page']), item.label, item.disabled, match['locale'])
+
+    async def callback(self, interaction):
+        bot = interaction.client
+        registry = bot.locales.pick(self.locale)
+        if self.key not in registry:
+            await interaction.response.send_message(registry.text('page_gone'), ephemeral=True)
+            return
+        overrides = None
+        if interaction.guild_id is not None:
+            overrides = (await bot.guild_config.get(interaction.guild_id))._asdict()
+        await interaction.response.edit_message(**registry.page(self.key, self.page, overrides))
+
+
+def page_buttons(key, page, count, locale=None):
+    """The view with the previous and next buttons of a page.
+
+    It only holds dynamic items, so discord.py does not keep a copy of it
+    for every message it is sent with.
+    """
+    view = discord.ui.View(timeout=None)
+    view.add_item(PageButton(key, max(page - 1, 0), '◀', disabled=page == 0, locale=locale))
+    view.add_item(PageButton(key, min(page + 1, count - 1), '▶', disabled=page == count - 1, locale=locale))
+    return view
+
+
+class EmbedRegistry:
+    """Cache of the rendered payloads for the static commands.
+
+    Payloads are built once, on first use or by ``warm``, and the same
+    objects are handed out afterwards. Callers must not mutate them; a
+    payload is only rebuilt after its section is replaced with ``update``.
+
+    Sections may contain ``{name}`` placeholders filled from ``variables``.
+    A guild that overrides some of them gets its own payload, built on
+    first use and kept in an LRU cache of ``size`` entries; sections that
+    do not use the overridden placeholders share the default payload.
+
+    Sections with more than ``per_page`` lines are split into pages, all
+    rendered together; ``get`` returns the first one and ``page`` the
+    others.
+
+    A registry holds the sections of one ``locale``, and also its
+    ``messages``: the texts of the command handlers, given by ``text``.
+    """
+
+    def __init__(self, content=(), variables=None, size=1024, per_page=None, locale=None, messages=None):
+        self._content = dict(content)
+        self.locale = locale
+        self.messages = dict(messages or {})
+        self._cache = {}
+        self.variables = dict(variables or {})
+        self.size = size
+        self.per_page = per_page
+        self._uses = {}
+        self._variants = collections.OrderedDict()
+
+    def __contains__(self, key):
+        return key in self._content
+
+    def keys(self):
+        return self._content.keys()
+
+    def section(self, key):
+        return self._content[key]
+
+    def text(self, key, overrides=None, **values):
+        """A message of the handlers, with its ``{name}`` fields filled from ``values``.
+
+        The placeholders of ``variables``, such as ``{prefix}``, are filled
+        like in the sections, from the guild's ``overrides`` first.
+        """
+        message = self.messages[key]
+        for name, value in self.variables.items():
+            if '{' + name + '}' in message and name not in values:
+                values[name] = (overrides or {}).get(name) or value
+        return message.format(**values) if values else message
+
+    def _render(self, key, variables):
+        return render_pages(fill(self._content[key], variables), key, self.per_page, self.locale, self.messages.get('page', 'Page {page}/{pages}'))
+
+    def _uses_of(self, key):
+        uses = self._uses.get(key)
+        if uses is None:
+            uses = self._uses[key] = placeholders(self._content[key], self.variables)
+        return uses
+
+    def get(self, key, overrides=None):
+        return self.pages(key, overrides)[0]
+
+    def page(self, key, number, overrides=None):
+        pages = self.pages(key, overrides)
+        return pages[min(number, len(pages) - 1)]
+
+    def pages(self, key, overrides=None):
+        if overrides:
+            uses = self._uses_of(key)
+            overrides = tuple(sorted((name, value) for name, value in overrides.items() if name in uses and value is not None))
+            if overrides:
+                return self._variant(key, overrides)
+        pages = self._cache.get(key)
+        if pages is None:
+            pages = self._cache[key] = self._render(key, self.variables)
+        return pages
+
+    def _variant(self, key, overrides):
+        pages = self._variants.get((key, overrides))
+        if pages is not None:
+            self._variants.move_to_end((key, overrides))
+            return pages
+        pages = self._variants[key, overrides] = self._render(key, {**self.variables, **dict(overrides)})
+        if len(self._variants) > self.size:
+            self._variants.popitem(last=False)
+        return pages
+
+    def _drop_variants(self, key=None):
+        for variant in [variant for variant in self._variants if key is None or variant[0] == key]:
+            del self._variants[variant]
+
+    def warm(self):
+        for key in self._content:
+            self.pages(key)
+
+    def update_messages(self, messages):
+        """Replaces the messages; the pages are rendered again if their label changed.
+
+        Returns True when the messages were different.
+        """
+        if self.messages == messages:
+            return False
+        if self.messages.get('page') != messages.get('page'):
+            self.invalidate()
+        self.messages = dict(messages)
+        return True
+
+    def update(self, key, section):
+        """Replaces a section, dropping its cached payload only if it changed.
+
+        Returns True when the section was different.
+        """
+        if self._content.get(key) == section:
+            return False
+        self._content[key] = section
+        self._cache.pop(key, None)
+        self._uses.pop(key, None)
+        self._drop_variants(key)
+        return True
+
+    def remove(self, key):
+        self._content.pop(key, None)
+        self._cache.pop(key, None)
+        self._uses.pop(key, None)
+        self._drop_variants(key)
+
+    def invalidate(self, key=None):
+        if key is None:
+            self._cache.clear()
+        else:
+            self._cache.pop(key, None)
+        self._drop_variants(key)
+
+
+class ContentStore:
+    """Keeps a registry in sync with the sections of JSON content files.
+
+    With several ``paths``, the sections and messages of each file replace
+    those of the same key in the files before it. ``poll`` only reads the
+    files when the modification time or size of one of them has changed,
+    and only the sections whose data differs from the loaded version are
+    handed to the registry, so unchanged embeds stay cached.
+    """
+
+    def __init__(self, paths, registry):
+        self.paths = [paths] if isinstance(paths, str) else list(paths)
+        self.registry = registry
+        self._stamp = None
+
+    def _read_stamp(self):
+        stamps = []
+        for path in self.paths:
+            stat = os.stat(path)
+            stamps.append((stat.st_mtime_ns, stat.st_size))
+        return tuple(stamps)
+
+    def load(self):
+        """Reads the files and applies them to the registry.
+
+        Returns the keys of the sections that were added, changed or
+        removed, and ``MESSAGES`` if the messages changed.
+        """
+        stamp = self._read_stamp()
+        sections = {}
+        messages = {}
+        for path in self.paths:
+            with open(path, encoding='utf-8') as file:
+                data = json.load(file)
+            messages.update(data.pop(MESSAGES, {}))
+            sections.update(data)
+        self._stamp = stamp
+        changed = [key for key, section in sections.items() if self.registry.update(key, section)]
+        for key in set(self.registry.keys()) - set(sections):
+            self.registry.remove(key)
+            changed.append(key)
+        if self.registry.update_messages(messages):
+            changed.append(MESSAGES)
+        return changed
+
+    def poll(self):
+        """Reloads the files if one of them changed since the last load.
+
+        A file that cannot be read or parsed (for example while it is being
+        saved) is logged and skipped; the previous content stays in use.
+        """
+        try:
+            if self._read_stamp() == self._stamp:
+                return []
+            return self.load()
+        except (OSError, ValueError) as error:
+            log.warning('Could not reload %s: %s', ', '.join(self.paths), error)
+            return []
+
+
+def fields(message):
+    """The names of the ``{name}`` fields of a message."""
+    return {name for _, name, _, _ in string.Formatter().parse(message) if name is not None}
+
+
+def read_locale(path):
+    with open(path, encoding='utf-8') as file:
+        return json.load(file)
+
+
+class Locales:
+    """The registries of every language the bot answers in.
+
+    Each file of the ``path`` directory is one language, named after its
+    Discord locale: ``es.json`` answers every kind of Spanish and a file
+    such as ``es-ES.json`` one of them. The sections and messages a file
+    lacks are taken from the ``default`` language, so every registry is
+    complete and keeps its own rendered payloads; answering in another
+    language costs a dictionary lookup, not a new rendering.
+    """
+
+    def __init__(self, path, default='en', **options):
+        self.path = path
+        self.default = default
+        self.registries = {}
+        self.stores = {}
+        self._picked = {}
+        for name in sorted(os.listdir(path)):
+            locale, extension = os.path.splitext(name)
+            if extension != '.json':
+                continue
+            paths = [self.file(default)] + ([self.file(locale)] if locale != default else [])
+            self.registries[locale] = EmbedRegistry(locale=locale, **options)
+            self.stores[locale] = ContentStore(paths, self.registries[locale])
+        if default not in self.registries:
+            raise FileNotFoundError(f'No {default}.json in {path}')
+
+    def file(self, locale):
+        return os.path.join(self.path, locale + '.json')
+
+    def __iter__(self):
+        return iter(self.registries)
+
+    def __contains__(self, locale):
+        return locale in self.registries
+
+    def __getitem__(self, locale):
+        return self.registries[locale]
+
+    def load(self):
+        for store in self.stores.values():
+            store.load()
+
+    def warm(self):
+        for registry in self.registries.values():
+            registry.warm()
+
+    def poll(self):
+        """Reloads the changed files; returns the changed keys of each locale."""
+        changed = {}
+        for locale, store in self.stores.items():
+            keys = store.poll()
+            if keys:
+                changed[locale] = keys
+        return changed
+
+    def pick(self, *locales):
+        """The registry of the first of ``locales`` that has one, or of the default language.
+
+        ``es-ES`` uses ``es-ES.json`` if there is one, else ``es.json``.
+        """
+        for locale in locales:
+            if not locale:
+                continue
+            locale = str(locale)
+            registry = self._picked.get(locale)
+            if registry is None:
+                registry = self.registries.get(locale) or self.registries.get(locale.split('-')[0])
+                if registry is None:
+                    continue
+                self._picked[locale] = registry
+            return registry
+        return self.registries[self.default]
+
+    def missing(self):
+        """The keys of the default language each other language does not have.
+
+        A message whose ``{name}`` fields differ from the default one is
+        listed too, since it would show the wrong values or none at all.
+        """
+        base = read_locale(self.file(self.default))
+        base_messages = base.pop(MESSAGES, {})
+        missing = {}
+        for locale in self.registries:
+            if locale == self.default:
+                continue
+            data = read_locale(self.file(locale))
+            messages = data.pop(MESSAGES, {})
+            keys = [key for key in base if key not in data]
+            for key, message in base_messages.items():
+                if key not in messages:
+                    keys.append(f'{MESSAGES}.{key}')
+                elif fields(messages[key]) != fields(message):
+                    keys.append(f'{MESSAGES}.{key} (different fields)')
+            if keys:
+                missing[locale] = keys
+        return missing
+
+
+async def catalog(bot, guild_id, *locales):
+    """The registry of the language to answer in and the guild's overrides of the placeholders.
+
+    The language set with +settings language comes first, then the first
+    of ``locales`` the bot has a catalog for, then the default language.
+    """
+    if guild_id is None:
+        return bot.locales.pick(*locales), None
+    settings = await bot.guild_config.get(guild_id)
+    return bot.locales.pick(settings.locale, *locales), settings._asdict()
+
+
+async def context_catalog(ctx):
+    """``catalog`` for a command: the user's language for slash commands, the guild's for the others."""
+    interaction = ctx.interaction
+    if interaction is not None:
+        return await catalog(ctx.bot, interaction.guild_id, interaction.locale, interaction.guild_locale)
+    if ctx.guild is None:
+        return await catalog(ctx.bot, None)
+    return await catalog(ctx.bot, ctx.guild.id, ctx.guild.preferred_locale)
+
+
+if __name__ == '__main__':
+    # python content.py: lists the keys missing from each language.
+    missing = Locales(LOCALES_PATH).missing()
+    for locale, keys in missing.items():
+        print(locale + ': ' + ', '.join(keys))
+    sys.exit(1 if missing else 0)
@@ -0,0 +1,185 @@
+import asyncio
+import bisect
+import csv
+import json
+import logging
+import math
+import os
+import sqlite3
+import time
+
+from metrics import Counter, Gauge
+
+log = logging.getLogger(__name__)
+
+# Query used when the export is an SQLite database. It must return the
+# player name and the balance, in that order.
+DEFAULT_QUERY = 'SELECT name, balance FROM balances'
+
+
+def money(amount):
+    return f'${amount:,.2f}'
+
+
+def read_balances(path, query=DEFAULT_QUERY):
+    """Reads ``{player: balance}`` from an economy export.
+
+    The export can be an SQLite database (.db, .sqlite or .sqlite3), a JSON
+    object of player names and balances (or a list of pairs), or a CSV file with a name and a
+    balance on each line.
+    """
+    extension = os.path.splitext(path)[1].lower()
+    if extension in ('.db', '.sqlite', '.sqlite3'):
+        db = sqlite3.connect(f'file:{path}?mode=ro', uri=True)
+        try:
+            rows = db.execute(query).fetchall()
+        finally:
+            db.close()
+    elif extension == '.json':
+        with open(path, encoding='utf-8') as file:
+            data = json.load(file)
+        rows = data.items() if isinstance(data, dict) else data
+    else:
+        with open(path, encoding='utf-8', newline='') as file:
+            rows = [row[:2] for row in csv.reader(file) if len(row) >= 2]
+    balances = {}
+    for row in rows:
+        try:
+            name, balance = row
+            balance = float(balance)
+        except (TypeError, ValueError):
+            # Header lines and broken rows.
+            continue
+        # NaN and infinity cannot be ranked by the leaderboard.
+        if math.isfinite(balance):
+            balances[str(name)] = balance
+    return balances
+
+
+class Leaderboard:
+    """Balances of the players, kept sorted from the richest down.
+
+    ``order`` is a sorted list of ``(-balance, name)`` pairs, updated with
+    bisect when a balance changes, so ``top`` is a slice of ``count`` items
+    and ``lookup`` a binary search; no command sorts the players. Names are
+    looked up without case, as in Minecraft.
+    """
+
+    def __init__(self):
+        self.balances = {}
+        self.order = []
+
+    def __len__(self):
+        return len(self.balances)
+
+    def set(self, name, balance):
+        key = name.lower()
+        old = self.balances.get(key)
+        if old is not None:
+            if old == (name, balance):
+                return False
+            del self.order[bisect.bisect_left(self.order, (-old[1], old[0]))]
+        self.balances[key] = (name, balance)
+        bisect.insort(self.order, (-balance, name))
+        return True
+
+    def remove(self, name):
+        old = self.balances.pop(name.lower(), None)
+        if old is not None:
+            del self.order[bisect.bisect_left(self.order, (-old[1], old[0]))]
+
+    def top(self, count):
+        """The ``count`` richest players as ``(rank, name, balance)``."""
+        return [(rank, name, -balance) for rank, (balance, name) in enumerate(self.order[:count], start=1)]
+
+    def lookup(self, name):
+        """Returns ``(rank, name, balance)`` for a player, or None."""
+        entry = self.balances.get(name.lower())
+        if entry is None:
+            return None
+        # Players with the same balance share the rank of the first of them.
+        rank = bisect.bisect_left(self.order, (-entry[1],)) + 1
+        return rank, entry[0], entry[1]
+
+    def apply(self, balances):
+        """Makes the leaderboard match a full snapshot of the balances.
+
+        Only the players whose balance changed, and those missing from the
+        snapshot, touch the sorted list. When they are more than a quarter
+        of the players, as on the first import, the list is sorted again
+        instead, which is cheaper than that many inserts. Returns the
+        number of changes.
+        """
+        changed = {}
+        seen = set()
+        for name, balance in balances.items():
+            key = name.lower()
+            seen.add(key)
+            if self.balances.get(key) != (name, balance):
+                changed[key] = (name, balance)
+        removed = [key for key in self.balances if key not in seen]
+        if len(changed) + len(removed) > len(self.order) // 4:
+            for key in removed:
+                del self.balances[key]
+            self.balances.update(changed)
+            self.order = sorted((-balance, name) for name, balance in self.balances.values())
+        else:
+            for name, balance in changed.values():
+                self.set(name, balance)
+            for key in removed:
+                self.remove(key)
+        return len(changed) + len(removed)
+
+
+class EconomyImport:
+    """Mirrors the server's economy export into a ``Leaderboard``.
+
+    ``poll`` only reads the export when its modification time or size has
+    changed. The file is parsed in an executor so a large export never
+    blocks the event loop, and the balances that differ from the previous
+    snapshot are then applied to the leaderboard.
+    """
+
+    def __init__(self, path, query=DEFAULT_QUERY):
+        self.path = path
+        self.query = query
+        self.leaderboard = Leaderboard()
+        self.imported_at = None
+        self._stamp = None
+        self.imports = Counter('bot_economy_imports_total', 'Economy imports by outcome.', ('outcome',))
+        self.changes = Counter('bot_economy_changes_total', 'Player balances changed by the economy imports.')
+
+    def collectors(self):
+        return [
+            self.imports,
+            self.changes,
+            Gauge('bot_economy_players', 'Players on the economy leaderboard.', lambda: {(): len(self.leaderboard)}),
+        ]
+
+    def _read_stamp(self):
+        stat = os.stat(self.path)
+        return stat.st_mtime_ns, stat.st_size
+
+    async def poll(self):
+        """Imports the export if it changed; returns the number of changed balances.
+
+        An export that cannot be read (for example while the server writes
+        it) is logged and skipped; the previous balances stay in use.
+        """
+        loop = asyncio.get_running_loop()
+        try:
+            stamp = self._read_stamp()
+            if stamp == self._stamp:
+                self.imports.inc('unchanged')
+                return 0
+            balances = await loop.run_in_executor(None, read_balances, self.path, self.query)
+        except (OSError, ValueError, sqlite3.Error) as error:
+            self.imports.inc('failed')
+            log.warning('Could not import %s: %s', self.path, error)
+            return 0
+        self._stamp = stamp
+        changes = self.leaderboard.apply(balances)
+        self.imported_at = time.time()
+        self.imports.inc('imported')
+        self.changes.inc(amount=changes)
+        return changes
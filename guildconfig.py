@@ -0,0 +1,139 @@
+import asyncio
+import collections
+import concurrent.futures
+import logging
+import sqlite3
+
+from metrics import Counter, Gauge
+
+log = logging.getLogger(__name__)
+
+# A setting left as None uses the bot's default.
+GuildSettings = collections.namedtuple('GuildSettings', 'prefix ip store announcements locale', defaults=(None, None, None, None, None))
+
+UNSET = GuildSettings()
+
+SCHEMA = '''
+CREATE TABLE IF NOT EXISTS guild_settings (
+    guild_id INTEGER PRIMARY KEY,
+    prefix TEXT,
+    ip TEXT,
+    store TEXT,
+    announcements INTEGER,
+    locale TEXT
+)
+'''
+
+COLUMNS = ', '.join(GuildSettings._fields)
+
+# Columns added after the first version of the table, created on databases
+# that do not have them yet.
+MIGRATIONS = (
+    ('announcements', 'INTEGER'),
+    ('locale', 'TEXT'),
+)
+
+
+class GuildConfig:
+    """Settings of each guild, stored in SQLite behind an in-memory cache.
+
+    The database is opened in WAL mode and only used from one worker
+    thread, so reads and writes never block the event loop. ``preload``
+    reads every row at startup; afterwards a guild without settings is
+    answered from the set of configured guild IDs and a configured one from
+    the LRU cache, so dispatching a message does not touch the disk unless
+    more than ``size`` guilds have settings.
+    """
+
+    def __init__(self, path, size=10000):
+        self.path = path
+        self.size = size
+        self.configured = set()
+        self._cache = collections.OrderedDict()
+        self._db = None
+        self._executor = concurrent.futures.ThreadPoolExecutor(max_workers=1, thread_name_prefix='guildconfig')
+        self.lookups = Counter('bot_guild_config_lookups_total', 'Guild settings lookups by where they were answered from.', ('source',))
+
+    def collectors(self):
+        return [
+            self.lookups,
+            Gauge('bot_guild_config_cached', 'Guild settings held in memory.', lambda: {(): len(self._cache)}),
+        ]
+
+    async def _run(self, function, *args):
+        return await asyncio.get_running_loop().run_in_executor(self._executor, function, *args)
+
+    def _open(self):
+        db = sqlite3.connect(self.path, check_same_thread=False)
+        db.execute('PRAGMA journal_mode=WAL')
+        db.execute('PRAGMA synchronous=NORMAL')
+        db.execute(SCHEMA)
+        existing = {row[1] for row in db.execute('PRAGMA table_info(guild_settings)')}
+        for column, kind in MIGRATIONS:
+            if column not in existing:
+                db.execute(f'ALTER TABLE guild_settings ADD COLUMN {column} {kind}')
+        db.commit()
+        self._db = db
+        return db.execute(f'SELECT guild_id, {COLUMNS} FROM guild_settings').fetchall()
+
+    async def preload(self):
+        """Opens the database and caches the settings of every guild."""
+        rows = await self._run(self._open)
+        for guild_id, *settings in rows:
+            self.configured.add(guild_id)
+            self._remember(guild_id, GuildSettings(*settings))
+        log.info('Loaded the settings of %d guilds', len(rows))
+
+    def _remember(self, guild_id, settings):
+        self._cache[guild_id] = settings
+        self._cache.move_to_end(guild_id)
+        if len(self._cache) > self.size:
+            self._cache.popitem(last=False)
+
+    def _select(self, guild_id):
+        row = self._db.execute(f'SELECT {COLUMNS} FROM guild_settings WHERE guild_id = ?', (guild_id,)).fetchone()
+        return UNSET if row is None else GuildSettings(*row)
+
+    async def get(self, guild_id):
+        settings = self._cache.get(guild_id)
+        if settings is not None:
+            self._cache.move_to_end(guild_id)
+            self.lookups.inc('cache')
+            return settings
+        if guild_id not in self.configured:
+            self.lookups.inc('default')
+            return UNSET
+        self.lookups.inc('database')
+        settings = await self._run(self._select, guild_id)
+        self._remember(guild_id, settings)
+        return settings
+
+    def _write(self, guild_id, settings):
+        with self._db:
+            if settings == UNSET:
+                self._db.execute('DELETE FROM guild_settings WHERE guild_id = ?', (guild_id,))
+            else:
+                self._db.execute(
+                    f'INSERT INTO guild_settings (guild_id, {COLUMNS}) VALUES (?{", ?" * len(settings)}) '
+                    'ON CONFLICT (guild_id) DO UPDATE SET ' + ', '.join(f'{column} = excluded.{column}' for column in GuildSettings._fields),
+                    (guild_id, *settings),
+                )
+
+    async def set(self, guild_id, **changes):
+        """Changes some settings of a guild; a value of None restores the default."""
+        settings = (await self.get(guild_id))._replace(**changes)
+        await self._run(self._write, guild_id, settings)
+        if settings == UNSET:
+            self.configured.discard(guild_id)
+        else:
+            self.configured.add(guild_id)
+        self._remember(guild_id, settings)
+        return settings
+
+    async def reset(self, guild_id):
+        return await self.set(guild_id, **UNSET._asdict())
+
+    def close(self):
+        if self._db is not None:
+            self._executor.submit(self._db.close)
+        self._executor.shutdown(wait=True)
@@ -0,0 +1,200 @@
+import asyncio
+import logging
+import math
+import time
+
+from aiohttp import web
+
+DURATION_BUCKETS = (0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+LAG_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0)
+
+
+def format_labels(names, values):
+    if not names:
+        return ''
+    pairs = ','.join('{}="{}"'.format(name, str(value).replace('\\', '\\\\').replace('"', '\\"')) for name, value in zip(names, values))
+    return '{' + pairs + '}'
+
+
+class Counter:
+    def __init__(self, name, help, labels=()):
+        self.name = name
+        self.help = help
+        self.labels = labels
+        self.values = {} if labels else {(): 0}
+
+    def inc(self, *labels, amount=1):
+        self.values[labels] = self.values.get(labels, 0) + amount
+
+    def expose(self):
+        yield f'# HELP {self.name} {self.help}'
+        yield f'# TYPE {self.name} counter'
+        for labels, value in self.values.items():
+            yield f'{self.name}{format_labels(self.labels, labels)} {value}'
+
+
+class Gauge:
+    """Gauge whose samples are read from a callback at scrape time.
+
+    The callback returns a dict of label tuples to values.
+    """
+
+    def __init__(self, name, help, read, labels=()):
+        self.name = name
+        self.help = help
+        self.read = read
+        self.labels = labels
+
+    def expose(self):
+        yield f'# HELP {self.name} {self.help}'
+        yield f'# TYPE {self.name} gauge'
+        for labels, value in self.read().items():
+            if value is not None and not math.isnan(value) and not math.isinf(value):
+                yield f'{self.name}{format_labels(self.labels, labels)} {value}'
+
+
+class Histogram:
+    def __init__(self, name, help, buckets, labels=()):
+        self.name = name
+        self.help = help
+        self.buckets = buckets
+        self.labels = labels
+        self.series = {} if labels else {(): [[0] * len(buckets), 0.0, 0]}
+
+    def observe(self, value, *labels):
+        series = self.series.get(labels)
+        if series is None:
+            series = self.series[labels] = [[0] * len(self.buckets), 0.0, 0]
+        counts = series[0]
+        for index, bound in enumerate(self.buckets):
+            if value <= bound:
+                counts[index] += 1
+                break
+        series[1] += value
+        series[2] += 1
+
+    def expose(self):
+        yield f'# HELP {self.name} {self.help}'
+        yield f'# TYPE {self.name} histogram'
+        names = self.labels + ('le',)
+        for labels, (counts, total, count) in self.series.items():
+            cumulative = 0
+            for bound, bucket in zip(self.buckets, counts):
+                cumulative += bucket
+                yield f'{self.name}_bucket{format_labels(names, labels + (bound,))} {cumulative}'
+            yield f'{self.name}_bucket{format_labels(names, labels + ("+Inf",))} {count}'
+            yield f'{self.name}_sum{format_labels(self.labels, labels)} {total}'
+            yield f'{self.name}_count{format_labels(self.labels, labels)} {count}'
+
+
+class RateLimitCounter(logging.Handler):
+    """Counts the 429 warnings that discord.py's HTTP client logs."""
+
+    def __init__(self, counter):
+        super().__init__(logging.WARNING)
+        self.counter = counter
+
+    def emit(self, record):
+        if 'rate limited' in record.getMessage():
+            self.counter.inc()
+
+
+class Metrics:
+    """Command, gateway and event loop metrics in the Prometheus text format.
+
+    ``install`` hooks the bot events; command errors are recorded by calling
+    ``command_failed`` from the bot's ``on_command_error``, because a
+    listener for that event would silence discord.py's default error log.
+    Messages that start with the prefix but name no command are not counted.
+    """
+
+    def __init__(self, bot, lag_interval=0.5):
+        self.bot = bot
+        self.lag_interval = lag_interval
+        self.lag = 0.0
+        self._lag_task = None
+        self.commands = Counter('bot_commands_total', 'Commands invoked.', ('command',))
+        self.command_errors = Counter('bot_command_errors_total', 'Commands that raised an error.', ('command', 'error'))
+        self.command_duration = Histogram('bot_command_duration_seconds', 'Time from invocation to completion, including the reply.', DURATION_BUCKETS, ('command',))
+        self.connects = Counter('bot_gateway_connects_total', 'Gateway connections opened.')
+        self.disconnects = Counter('bot_gateway_disconnects_total', 'Gateway disconnections.')
+        self.resumes = Counter('bot_gateway_resumes_total', 'Gateway sessions resumed.')
+        self.rate_limits = Counter('bot_ratelimit_hits_total', 'HTTP 429 responses received from Discord.')
+        self.loop_lag = Histogram('bot_event_loop_lag_seconds', 'Delay of the event loop in waking up a sleeping task.', LAG_BUCKETS)
+        self.collectors = [
+            self.commands,
+            self.command_errors,
+            self.command_duration,
+            Gauge('bot_gateway_latency_seconds', 'Heartbeat latency per shard.', self._latencies, ('shard',)),
+            Gauge('bot_guilds', 'Guilds the process is in.', lambda: {(): len(self.bot.guilds)}),
+            self.connects,
+            self.disconnects,
+            self.resumes,
+            self.rate_limits,
+            self.loop_lag,
+            Gauge('bot_event_loop_lag_last_seconds', 'Last event loop lag measured.', lambda: {(): self.lag}),
+        ]
+
+    def install(self):
+        self.bot.add_listener(self.command_started, 'on_command')
+        self.bot.add_listener(self.command_completed, 'on_command_completion')
+        self.bot.add_listener(self._on_connect, 'on_connect')
+        self.bot.add_listener(self._on_disconnect, 'on_disconnect')
+        self.bot.add_listener(self._on_resumed, 'on_resumed')
+        self.bot.add_listener(self._on_ready, 'on_ready')
+        logging.getLogger('discord.http').addHandler(RateLimitCounter(self.rate_limits))
+
+    def _latencies(self):
+        if hasattr(self.bot, 'latencies'):
+            return {(shard_id,): latency for shard_id, latency in self.bot.latencies}
+        return {('0',): self.bot.latency}
+
+    async def command_started(self, ctx):
+        ctx.metrics_started = time.perf_counter()
+
+    def _finish(self, ctx):
+        name = ctx.command.qualified_name
+        self.commands.inc(name)
+        started = getattr(ctx, 'metrics_started', None)
+        if started is not None:
+            self.command_duration.observe(time.perf_counter() - started, name)
+        return name
+
+    async def command_completed(self, ctx):
+        self._finish(ctx)
+
+    def command_failed(self, ctx, error):
+        if ctx.command is None:
+            # Not a command: a message that only starts with the prefix, like "+1".
+            return
+        name = self._finish(ctx)
+        self.command_errors.inc(name, type(error).__name__)
+
+    async def _on_connect(self):
+        self.connects.inc()
+
+    async def _on_disconnect(self):
+        self.disconnects.inc()
+
+    async def _on_resumed(self):
+        self.resumes.inc()
+
+    async def _on_ready(self):
+        if self._lag_task is None:
+            self._lag_task = asyncio.create_task(self._measure_lag())
+
+    async def _measure_lag(self):
+        while True:
+            expected = time.perf_counter() + self.lag_interval
+            await asyncio.sleep(self.lag_interval)
+            self.lag = max(time.perf_counter() - expected, 0.0)
+            self.loop_lag.observe(self.lag)
+
+    def expose(self):
+        lines = []
+        for collector in self.collectors:
+            lines.extend(collector.expose())
+        return '\n'.join(lines) + '\n'
+
+    async def handle(self, request):
+        return web.Response(text=self.expose(), content_type='text/plain', charset='utf-8')
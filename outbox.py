@@ -0,0 +1,152 @@
+import asyncio
+import heapq
+import itertools
+import time
+
+import discord
+from discord.ext import commands
+
+from metrics import Counter, Gauge, Histogram
+
+# Priority lanes, most urgent first. A command picks its lane with
+# ``extras={'lane': MODERATION}``; replies are the default.
+MODERATION = 0
+REPLY = 1
+BACKGROUND = 2
+LANES = ('moderation', 'reply', 'background')
+
+WAIT_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+MESSAGES_ROUTE = '/channels/{channel_id}/messages'
+
+
+def bucket_wait(http, channel_id):
+    """Seconds until the message bucket of a channel has room again, or 0.
+
+    Reads the rate limit that discord.py learned from the headers of the
+    previous responses for that channel. discord.py has no public API for
+    it, so this uses the internals of discord.py 2.4 to 2.7 (the versions
+    pinned in the README); if they change, it returns 0 and the messages
+    are sent right away, leaving the waiting to discord.py.
+    """
+    route = discord.http.Route('POST', MESSAGES_ROUTE, channel_id=channel_id)
+    try:
+        bucket_hash = http._bucket_hashes.get(route.key)
+        ratelimit = http._buckets.get(f'{bucket_hash or route.key}:{route.major_parameters}')
+        if ratelimit is None or not ratelimit.dirty or ratelimit.remaining > 0 or ratelimit.expires is None:
+            return 0.0
+        return max(0.0, ratelimit.expires - asyncio.get_running_loop().time())
+    except AttributeError:
+        return 0.0
+
+
+class Outbox:
+    """Sends the bot's messages through one priority queue per channel.
+
+    Each channel has a worker that sends its queued messages one at a time,
+    moderation first, then command replies, then background posts such as
+    the chat relay. When Discord's headers say the channel's bucket is
+    used up, the worker waits for the reset instead of sending requests
+    that would only queue up inside discord.py, and then drops the
+    background messages queued more than ``stale`` seconds ago. A channel
+    holds at most ``size`` messages; beyond that the newest message of the
+    lowest lane is dropped.
+
+    ``send`` returns the sent message, or None when it was dropped.
+    """
+
+    def __init__(self, bot, stale=10.0, size=50):
+        self.bot = bot
+        self.stale = stale
+        self.size = size
+        self._queues = {}
+        self._workers = {}
+        self._order = itertools.count()
+        self.sends = Counter('bot_outbox_messages_total', 'Messages handed to the outbox by lane and outcome.', ('lane', 'outcome'))
+        self.wait = Histogram('bot_outbox_wait_seconds', 'Time messages waited in the outbox before being sent.', WAIT_BUCKETS, ('lane',))
+
+    def collectors(self):
+        return [
+            self.sends,
+            self.wait,
+            Gauge('bot_outbox_queue_depth', 'Messages waiting in the outbox.', self._depth, ('lane',)),
+        ]
+
+    def _depth(self):
+        depth = {(lane,): 0 for lane in LANES}
+        for queue in self._queues.values():
+            for item in queue:
+                depth[(LANES[item[0]],)] += 1
+        return depth
+
+    async def send(self, channel, lane=REPLY, **kwargs):
+        future = asyncio.get_running_loop().create_future()
+        queue = self._queues.setdefault(channel.id, [])
+        item = [lane, next(self._order), time.monotonic(), kwargs, future]
+        if len(queue) >= self.size:
+            victim = max(queue)
+            if victim[:2] < item[:2]:
+                self._drop(item)
+                return await future
+            queue.remove(victim)
+            heapq.heapify(queue)
+            self._drop(victim)
+        heapq.heappush(queue, item)
+        if channel.id not in self._workers:
+            self._workers[channel.id] = asyncio.ensure_future(self._work(channel))
+        return await future
+
+    def _drop(self, item):
+        self.sends.inc(LANES[item[0]], 'dropped')
+        if not item[4].done():
+            item[4].set_result(None)
+
+    def _shed(self, queue):
+        now = time.monotonic()
+        stale = [item for item in queue if item[0] == BACKGROUND and now - item[2] > self.stale]
+        if stale:
+            queue[:] = [item for item in queue if item not in stale]
+            heapq.heapify(queue)
+            for item in stale:
+                self._drop(item)
+
+    async def _work(self, channel):
+        queue = self._queues[channel.id]
+        try:
+            while queue:
+                wait = bucket_wait(self.bot.http, channel.id)
+                if wait:
+                    await asyncio.sleep(wait)
+                    self._shed(queue)
+                    continue
+                lane, _, queued_at, kwargs, future = heapq.heappop(queue)
+                self.wait.observe(time.monotonic() - queued_at, LANES[lane])
+                try:
+                    message = await channel.send(**kwargs)
+                except Exception as error:
+                    self.sends.inc(LANES[lane], 'failed')
+                    if not future.done():
+                        future.set_exception(error)
+                    continue
+                self.sends.inc(LANES[lane], 'sent')
+                if not future.done():
+                    future.set_result(message)
+        finally:
+            del self._workers[channel.id]
+            if not queue:
+                del self._queues[channel.id]
+
+
+class OutboxContext(commands.Context):
+    """Command context whose ``send`` goes through ``bot.outbox``.
+
+    Slash commands answer their interaction directly, since Discord expects
+    that answer within 3 seconds and it does not use the channel's bucket.
+    """
+
+    async def send(self, content=None, **kwargs):
+        if self.interaction is not None:
+            return await super().send(content, **kwargs)
+        lane = self.command.extras.get('lane', REPLY) if self.command else REPLY
+        kwargs.pop('ephemeral', None)
+        return await self.bot.outbox.send(self.channel, lane, content=content, **kwargs)
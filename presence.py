@@ -0,0 +1,92 @@
+import asyncio
+import time
+
+import discord
+
+
+class PresenceUpdater:
+    """Updates the bot's "playing" status only when its text changes.
+
+    ``schedule`` is called from the events that can change the text (guild
+    join/leave, ready). Calls arriving within ``debounce`` seconds of each
+    other are coalesced into a single update. Every shard keeps the last text
+    it sent and is skipped when the new text is identical, and it never sends
+    more than one update per ``min_interval`` seconds, which keeps presence
+    far away from the gateway limit of 120 sends per minute per shard. On an
+    ``AutoShardedBot`` the shards are updated one after another, ``stagger``
+    seconds apart, instead of all at once. A ``schedule`` that arrives while
+    an update is being sent marks the text as stale, and the update runs
+    again until nothing changed during it.
+    """
+
+    def __init__(self, bot, render, *, debounce=5.0, min_interval=15.0, stagger=1.0):
+        self.bot = bot
+        self.render = render
+        self.debounce = debounce
+        self.min_interval = min_interval
+        self.stagger = stagger
+        self._last_text = {}
+        self._last_sent = {}
+        self._task = None
+        self._dirty = False
+
+    def schedule(self):
+        """Requests an update; it is sent after the debounce window."""
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+        else:
+            self._dirty = True
+
+    def reset(self, shard_id=None):
+        """Forgets what a shard (or every shard) is showing.
+
+        Discord clears the presence on a new session, so this is called on
+        ready before scheduling, otherwise the update would be skipped.
+        """
+        if shard_id is None:
+            self._last_text.clear()
+        else:
+            self._last_text.pop(shard_id, None)
+
+    def _shard_ids(self):
+        if isinstance(self.bot, discord.AutoShardedClient):
+            return sorted(self.bot.shards)
+        return [None]
+
+    async def _run(self):
+        await asyncio.sleep(self.debounce)
+        while True:
+            self._dirty = False
+            retry_in = await self._update()
+            if retry_in is not None:
+                # A shard was still inside its interval: try again once it has passed.
+                await asyncio.sleep(retry_in)
+            elif not self._dirty:
+                return
+
+    async def _update(self):
+        """Sends the current text to the shards that need it; returns the seconds until a skipped shard can be sent to."""
+        retry_in = None
+        first = True
+        for shard_id in self._shard_ids():
+            text = self.render()
+            if self._last_text.get(shard_id) == text:
+                continue
+            wait = self._last_sent.get(shard_id, float('-inf')) + self.min_interval - time.monotonic()
+            if wait > 0:
+                retry_in = wait if retry_in is None else min(retry_in, wait)
+                continue
+            if not first:
+                await asyncio.sleep(self.stagger)
+            first = False
+            await self._send(shard_id, text)
+        return retry_in
+
+    async def _send(self, shard_id, text):
+        activity = discord.Game(name=text)
+        if shard_id is None:
+            await self.bot.change_presence(activity=activity)
+        else:
+            await self.bot.change_presence(activity=activity, shard_id=shard_id)
+        self._last_text[shard_id] = text
+        self._last_sent[shard_id] = time.monotonic()
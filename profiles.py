@@ -0,0 +1,63 @@
+import os
+import resource
+
+import discord
+
+
+def client_options(profile='default', slash_only=False):
+    """Returns the intents and cache settings passed to the bot constructor.
+
+    ``default`` keeps discord.py's defaults plus the intents the prefix
+    commands need. ``lean`` only subscribes to the events the commands use
+    and turns off the caches nothing reads: no message cache, no member
+    cache and no member chunking, which is most of the memory of a bot in
+    thousands of guilds.
+    """
+    if profile == 'lean':
+        intents = discord.Intents.none()
+        intents.guilds = True
+        intents.dm_messages = True
+        options = {
+            'max_messages': None,
+            'member_cache_flags': discord.MemberCacheFlags.none(),
+            'chunk_guilds_at_startup': False,
+        }
+    elif profile == 'default':
+        intents = discord.Intents.default()
+        options = {}
+    else:
+        raise ValueError('Unknown profile: ' + profile)
+    if slash_only:
+        intents.guild_messages = False
+    else:
+        intents.guild_messages = True
+        intents.message_content = True
+    options['intents'] = intents
+    return options
+
+
+def resident_memory():
+    """Current resident set size in bytes (peak size where /proc is not available)."""
+    try:
+        with open('/proc/self/statm') as file:
+            return int(file.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError):
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+def cache_report(bot):
+    """Summarizes what the client cached after connecting."""
+    guilds = bot.guilds
+    counts = {
+        'guilds': len(guilds),
+        'channels': sum(len(guild.channels) for guild in guilds),
+        'members': sum(len(guild.members) for guild in guilds),
+        'users': len(bot.users),
+        'messages': len(bot.cached_messages),
+        'emojis': len(bot.emojis),
+    }
+    intents = ', '.join(name for name, enabled in bot.intents if enabled)
+    return (
+        'Cache: ' + ', '.join(f'{count} {name}' for name, count in counts.items())
+        + f'. RSS: {resident_memory() / 1048576:.1f} MB. Intents: {intents}'
+    )
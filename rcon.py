@@ -0,0 +1,215 @@
+import asyncio
+import itertools
+import logging
+import re
+import struct
+
+log = logging.getLogger(__name__)
+
+# Packet types of the Source RCON protocol used by Minecraft.
+SERVERDATA_AUTH = 3
+SERVERDATA_EXECCOMMAND = 2
+SERVERDATA_RESPONSE_VALUE = 0
+
+# Minecraft splits long responses into packets with a body of at most this
+# many bytes; a shorter body ends the response.
+MAX_FRAGMENT = 4096
+
+# Player names Minecraft accepts, so user input cannot add extra arguments.
+PLAYER_NAME = re.compile(r'[A-Za-z0-9_]{1,16}')
+
+
+class RconError(Exception):
+    """The RCON server could not be reached or rejected the request."""
+
+
+class RconAuthError(RconError):
+    """The RCON password was rejected."""
+
+
+def pack_packet(request_id, packet_type, body):
+    payload = struct.pack('<ii', request_id, packet_type) + body.encode('utf-8') + b'\x00\x00'
+    return struct.pack('<i', len(payload)) + payload
+
+
+async def read_packet(reader):
+    length, = struct.unpack('<i', await reader.readexactly(4))
+    if not 10 <= length <= MAX_FRAGMENT + 10:
+        raise RconError(f'Invalid packet length {length}')
+    data = await reader.readexactly(length)
+    request_id, packet_type = struct.unpack('<ii', data[:8])
+    return request_id, packet_type, data[8:-2].decode('utf-8', 'replace')
+
+
+def clean(text):
+    """Keeps user text on a single line so it stays inside one command."""
+    return ' '.join(text.split())
+
+
+class RconConnection:
+    """One authenticated RCON connection.
+
+    Requests are written as soon as they are made and a reader task matches
+    each response to its request ID, so several commands can be in flight on
+    the same connection without waiting for each other.
+    """
+
+    def __init__(self, host, port, password, timeout=5.0):
+        self.host = host
+        self.port = port
+        self.password = password
+        self.timeout = timeout
+        self.pending = {}
+        self._ids = itertools.count(1)
+        self._reader = None
+        self._writer = None
+        self._task = None
+
+    @property
+    def closed(self):
+        return self._task is None or self._task.done()
+
+    async def connect(self):
+        self._reader, self._writer = await asyncio.wait_for(asyncio.open_connection(self.host, self.port), self.timeout)
+        self._task = asyncio.ensure_future(self._read_responses())
+        try:
+            await self._request(SERVERDATA_AUTH, self.password)
+        except BaseException:
+            self.close()
+            raise
+
+    def close(self, error=None):
+        if self._writer is not None:
+            self._writer.close()
+        if self._task is not None and not self._task.done() and self._task is not asyncio.current_task():
+            self._task.cancel()
+        error = error or RconError('Connection closed')
+        for future, _ in self.pending.values():
+            if not future.done():
+                future.set_exception(error)
+        self.pending.clear()
+
+    async def command(self, text):
+        return await self._request(SERVERDATA_EXECCOMMAND, text)
+
+    async def _request(self, packet_type, body):
+        if self.closed:
+            raise RconError('Connection closed')
+        request_id = next(self._ids) & 0x7FFFFFFF
+        future = asyncio.get_running_loop().create_future()
+        self.pending[request_id] = (future, [])
+        try:
+            self._writer.write(pack_packet(request_id, packet_type, body))
+            await self._writer.drain()
+            return await asyncio.wait_for(asyncio.shield(future), self.timeout)
+        except (OSError, asyncio.TimeoutError) as error:
+            # A connection that stopped answering is dropped; the pool opens a new one.
+            self.close(RconError(f'{self.host}:{self.port} did not answer'))
+            raise RconError(f'{self.host}:{self.port} did not answer') from error
+        finally:
+            self.pending.pop(request_id, None)
+
+    async def _read_responses(self):
+        try:
+            while True:
+                request_id, packet_type, body = await read_packet(self._reader)
+                if request_id == -1:
+                    # A rejected login answers with ID -1 instead of the request's ID.
+                    self.close(RconAuthError('RCON password rejected'))
+                    return
+                entry = self.pending.get(request_id)
+                if entry is None:
+                    continue
+                future, parts = entry
+                parts.append(body)
+                if packet_type == SERVERDATA_EXECCOMMAND or len(body.encode('utf-8')) < MAX_FRAGMENT:
+                    if not future.done():
+                        future.set_result(''.join(parts))
+        except (OSError, asyncio.IncompleteReadError, RconError) as error:
+            log.warning('RCON connection to %s:%s lost: %r', self.host, self.port, error)
+            self.close(RconError(f'Connection to {self.host}:{self.port} lost'))
+
+
+class RconPool:
+    """Persistent RCON connections shared by every staff command.
+
+    Connections are opened on first use and reopened after they drop, at
+    most once every ``retry`` seconds, so a command only pays for the TCP
+    and login handshake when there is no live connection. A command goes to
+    an idle connection, opens another one while all are busy and otherwise
+    joins the connection with the fewest requests in flight.
+    """
+
+    def __init__(self, host, port=25575, password='', size=2, timeout=5.0, retry=5.0):
+        self.host = host
+        self.port = port
+        self.password = password
+        self.size = size
+        self.timeout = timeout
+        self.retry = retry
+        self.connections = [None] * size
+        self._connecting = [None] * size
+        self._failed_at = [None] * size
+        self._turns = itertools.count()
+
+    @property
+    def enabled(self):
+        return bool(self.password)
+
+    async def _open(self, slot):
+        connection = RconConnection(self.host, self.port, self.password, self.timeout)
+        try:
+            await connection.connect()
+        except (OSError, asyncio.TimeoutError) as error:
+            self._failed_at[slot] = asyncio.get_running_loop().time()
+            raise RconError(f'Cannot connect to {self.host}:{self.port}') from error
+        except RconError:
+            self._failed_at[slot] = asyncio.get_running_loop().time()
+            raise
+        self._failed_at[slot] = None
+        self.connections[slot] = connection
+        return connection
+
+    async def _connection_for(self, slot):
+        # Commands that arrive while a slot is connecting share that handshake.
+        if self._connecting[slot] is None:
+            self._connecting[slot] = asyncio.ensure_future(self._open(slot))
+        try:
+            return await asyncio.shield(self._connecting[slot])
+        finally:
+            if self._connecting[slot] is not None and self._connecting[slot].done():
+                self._connecting[slot] = None
+
+    async def acquire(self):
+        live = [connection for connection in self.connections if connection is not None and not connection.closed]
+        for connection in live:
+            if not connection.pending:
+                return connection
+        now = asyncio.get_running_loop().time()
+        missing = [
+            slot for slot, connection in enumerate(self.connections)
+            if (connection is None or connection.closed)
+            and (self._failed_at[slot] is None or now - self._failed_at[slot] >= self.retry)
+        ]
+        if missing:
+            try:
+                return await self._connection_for(missing[next(self._turns) % len(missing)])
+            except RconError:
+                if not live:
+                    raise
+        if live:
+            return min(live, key=lambda connection: len(connection.pending))
+        raise RconError(f'{self.host}:{self.port} is unreachable, retrying in a few seconds')
+
+    async def command(self, text):
+        """Runs a console command on the server and returns its output."""
+        if not self.enabled:
+            raise RconError('RCON is not configured')
+        connection = await self.acquire()
+        return await connection.command(text)
+
+    def close(self):
+        for connection in self.connections:
+            if connection is not None:
+                connection.close()
+        self.connections = [None] * self.size
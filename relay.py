@@ -0,0 +1,248 @@
+import asyncio
+import collections
+import json
+import logging
+import os
+import re
+import time
+
+import discord
+
+from content import catalog
+from metrics import Counter, Gauge, Histogram
+from outbox import BACKGROUND
+from rcon import RconError, clean
+
+log = logging.getLogger(__name__)
+
+LAG_BUCKETS = (0.5, 1.0, 2.0, 5.0, 10.0, 30.0, 60.0, 300.0)
+
+# Console lines look like "[12:00:00] [Server thread/INFO]: <Steve> hi" on
+# vanilla and "[12:00:00 INFO]: <Steve> hi" on Paper.
+CONSOLE_LINE = re.compile(r'INFO\]: (.*)$')
+CHAT = re.compile(r'<([A-Za-z0-9_]{1,16})> (.*)')
+JOIN_LEAVE = re.compile(r'([A-Za-z0-9_]{1,16}) (joined|left) the game')
+
+
+def chat_line(line):
+    """Turns a console line into the text relayed to Discord, or None."""
+    match = CONSOLE_LINE.search(line)
+    if not match:
+        return None
+    message = match.group(1)
+    chat = CHAT.fullmatch(message)
+    if chat:
+        return '**' + discord.utils.escape_markdown(chat.group(1)) + '**: ' + discord.utils.escape_markdown(chat.group(2))
+    event = JOIN_LEAVE.fullmatch(message)
+    if event:
+        return '*' + discord.utils.escape_markdown(event.group(1)) + ' ' + event.group(2) + ' the game*'
+    return None
+
+
+class LogTail:
+    """Follows a growing log file, such as the server's logs/latest.log.
+
+    Only lines written after the tail starts are returned. The file is read
+    in an executor so a slow disk never blocks the event loop, and it is
+    reopened when it is rotated or truncated.
+    """
+
+    def __init__(self, path, interval=0.5):
+        self.path = path
+        self.interval = interval
+        self._file = None
+        self._inode = None
+        self._partial = ''
+
+    def _open(self, at_end):
+        if self._file is not None:
+            self._file.close()
+        self._file = open(self.path, encoding='utf-8', errors='replace')
+        self._inode = os.fstat(self._file.fileno()).st_ino
+        self._partial = ''
+        if at_end:
+            self._file.seek(0, os.SEEK_END)
+
+    def _read(self):
+        try:
+            if self._file is None:
+                self._open(at_end=True)
+                return []
+            stat = os.stat(self.path)
+            if stat.st_ino != self._inode or stat.st_size < self._file.tell():
+                self._open(at_end=False)
+        except OSError:
+            return []
+        data = self._partial + self._file.read()
+        lines = data.split('\n')
+        self._partial = lines.pop()
+        return lines
+
+    async def __aiter__(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            lines = await loop.run_in_executor(None, self._read)
+            for line in lines:
+                yield line
+            if not lines:
+                await asyncio.sleep(self.interval)
+
+
+class RelayQueue:
+    """Bounded queue of chat lines waiting to be posted.
+
+    A line equal to the previous one is merged into it with a repeat count.
+    When the queue is full the oldest line is dropped, and the number of
+    dropped lines is reported in the next message instead.
+    """
+
+    def __init__(self, size):
+        self.lines = collections.deque()
+        self.size = size
+        self.dropped = 0
+
+    def __len__(self):
+        return len(self.lines)
+
+    def push(self, text, now):
+        """Queues a line and returns 'merged', 'dropped' or None."""
+        if self.lines and self.lines[-1][1] == text:
+            self.lines[-1][2] += 1
+            return 'merged'
+        outcome = None
+        if len(self.lines) >= self.size:
+            self.lines.popleft()
+            self.dropped += 1
+            outcome = 'dropped'
+        self.lines.append([now, text, 1])
+        return outcome
+
+    def oldest(self):
+        return self.lines[0][0] if self.lines else None
+
+    def drain(self, limit, notice=None):
+        """Removes the queued lines and joins them into messages of at most ``limit`` characters.
+
+        ``notice``, the text telling how many lines were dropped, goes first.
+        """
+        texts = [text if count == 1 else f'{text} (x{count})' for _, text, count in self.lines]
+        self.lines.clear()
+        if self.dropped:
+            if notice:
+                texts.insert(0, notice)
+            self.dropped = 0
+        messages = []
+        current = ''
+        for text in texts:
+            text = text[:limit]
+            if current and len(current) + 1 + len(text) > limit:
+                messages.append(current)
+                current = text
+            else:
+                current = current + '\n' + text if current else text
+        if current:
+            messages.append(current)
+        return messages
+
+
+class ChatRelay:
+    """Mirrors the Minecraft chat to a Discord channel and back.
+
+    Lines read from ``source`` are queued and posted together every
+    ``flush`` seconds, so a busy chat costs one Discord message per flush
+    instead of one per line. Messages sent in the channel are shown in game
+    with ``tellraw`` through the RCON pool.
+
+    With an ``outbox``, the batches are posted in its background lane, so
+    they wait behind command replies and are dropped if the channel stays
+    rate limited for too long.
+    """
+
+    def __init__(self, bot, channel_id, source, rcon=None, flush=2.0, size=500, limit=2000, outbox=None):
+        self.bot = bot
+        self.outbox = outbox
+        self.channel_id = channel_id
+        self.source = source
+        self.rcon = rcon
+        self.flush = flush
+        self.limit = limit
+        self.queue = RelayQueue(size)
+        self.lines = Counter('bot_relay_lines_total', 'Chat lines relayed.', ('direction',))
+        self.messages = Counter('bot_relay_messages_total', 'Discord messages posted by the relay.')
+        self.overflow = Counter('bot_relay_overflow_total', 'Chat lines merged into the previous one, dropped because the queue was full or dropped as stale by the outbox.', ('outcome',))
+        self.lag = Histogram('bot_relay_lag_seconds', 'Time the oldest line of a batch waited before it was posted.', LAG_BUCKETS)
+        self._tasks = []
+
+    def collectors(self):
+        return [
+            self.lines,
+            self.messages,
+            self.overflow,
+            self.lag,
+            Gauge('bot_relay_queue_depth', 'Chat lines waiting to be posted.', lambda: {(): len(self.queue)}),
+            Gauge('bot_relay_queue_age_seconds', 'Age of the oldest chat line waiting to be posted.', self._age),
+        ]
+
+    def _age(self):
+        oldest = self.queue.oldest()
+        return {(): 0.0 if oldest is None else time.monotonic() - oldest}
+
+    def start(self):
+        if not self._tasks:
+            self.bot.add_listener(self.on_message, 'on_message')
+            self._tasks = [asyncio.ensure_future(self._read()), asyncio.ensure_future(self._post())]
+
+    async def _read(self):
+        async for line in self.source:
+            text = chat_line(line)
+            if text is not None:
+                self.lines.inc('minecraft')
+                outcome = self.queue.push(text, time.monotonic())
+                if outcome:
+                    self.overflow.inc(outcome)
+
+    async def _post(self):
+        while True:
+            await asyncio.sleep(self.flush)
+            oldest = self.queue.oldest()
+            if oldest is None and not self.queue.dropped:
+                continue
+            # The channel may not be cached, for example while the guilds are still arriving.
+            channel = self.bot.get_channel(self.channel_id) or self.bot.get_partial_messageable(self.channel_id)
+            if oldest is not None:
+                self.lag.observe(time.monotonic() - oldest)
+            notice = None
+            if self.queue.dropped:
+                guild = getattr(channel, 'guild', None)
+                registry, _ = await catalog(self.bot, guild.id, guild.preferred_locale) if guild else await catalog(self.bot, None)
+                notice = registry.text('relay_skipped', lines=self.queue.dropped)
+            # While a message is being sent, new lines keep queueing up; a
+            # slow or rate limited channel makes the batches bigger, not more.
+            for content in self.queue.drain(self.limit, notice):
+                try:
+                    if self.outbox is None:
+                        await channel.send(content, allowed_mentions=discord.AllowedMentions.none())
+                    elif await self.outbox.send(channel, BACKGROUND, content=content, allowed_mentions=discord.AllowedMentions.none()) is None:
+                        self.overflow.inc('stale')
+                        continue
+                    self.messages.inc()
+                except discord.HTTPException as error:
+                    log.warning('Could not post the Minecraft chat: %s', error)
+
+    async def on_message(self, message):
+        if message.channel.id != self.channel_id or message.author.bot or not message.content:
+            return
+        if self.rcon is None or not self.rcon.enabled:
+            return
+        text = clean(message.clean_content)[:256]
+        component = [{'text': '[Discord] ', 'color': 'blue'}, {'text': message.author.display_name + ': ' + text}]
+        try:
+            await self.rcon.command('tellraw @a ' + json.dumps(component))
+            self.lines.inc('discord')
+        except RconError as error:
+            log.warning('Could not relay a Discord message to Minecraft: %s', error)
+
+    def stop(self):
+        for task in self._tasks:
+            task.cancel()
+        self._tasks = []
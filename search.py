@@ -0,0 +1,224 @@
+import collections
+import math
+import re
+
+# Sections of the locale files searched by +rule.
+RULE_SECTIONS = ('minor', 'major', 'trial', 'staff', 'clans', 'commands')
+
+WORD = re.compile(r'[a-z0-9]+')
+
+STOPWORDS = frozenset('a about an and are as at be by can do does for from how i if in is it its me my no not of on or the to rule rules what whats when where which who why with you your'.split())
+
+
+def stem(word):
+    """Strips the plural "s" so "clocks" finds "clock"."""
+    if len(word) > 3 and word.endswith('s') and not word.endswith('ss'):
+        return word[:-1]
+    return word
+
+
+def terms(text):
+    return [stem(word) for word in WORD.findall(text.lower()) if word not in STOPWORDS]
+
+
+def distance(first, second, limit=None):
+    """Levenshtein distance; stops early once every path exceeds ``limit``."""
+    if len(first) < len(second):
+        first, second = second, first
+    previous = list(range(len(second) + 1))
+    for row, char in enumerate(first, start=1):
+        current = [row]
+        for column, other in enumerate(second, start=1):
+            current.append(min(previous[column] + 1, current[column - 1] + 1, previous[column - 1] + (char != other)))
+        if limit is not None and min(current) > limit:
+            return limit + 1
+        previous = current
+    return previous[-1]
+
+
+class BKTree:
+    """Burkhard-Keller tree of words for lookups within an edit distance.
+
+    The triangle inequality lets ``search`` skip every subtree whose edge
+    distance is outside ``distance(query, node) ± limit``, so a lookup only
+    compares the query with a small part of the words.
+    """
+
+    def __init__(self, words=()):
+        self.root = None
+        for word in words:
+            self.add(word)
+
+    def add(self, word):
+        if self.root is None:
+            self.root = (word, {})
+            return
+        node = self.root
+        while True:
+            edge = distance(word, node[0])
+            if edge == 0:
+                return
+            child = node[1].get(edge)
+            if child is None:
+                node[1][edge] = (word, {})
+                return
+            node = child
+
+    def search(self, word, limit):
+        """Returns ``(distance, word)`` pairs within ``limit`` edits, closest first."""
+        found = []
+        pending = [self.root] if self.root is not None else []
+        while pending:
+            node = pending.pop()
+            edge = distance(word, node[0])
+            if edge <= limit:
+                found.append((edge, node[0]))
+            for child_edge, child in node[1].items():
+                if edge - limit <= child_edge <= edge + limit:
+                    pending.append(child)
+        return sorted(found)
+
+
+def trigrams(word):
+    padded = '  ' + word + ' '
+    return {padded[index:index + 3] for index in range(len(padded) - 2)}
+
+
+class TrigramIndex:
+    """Maps each trigram to the words that contain it, for similarity lookups.
+
+    Catches the typos an edit distance scores badly, such as swapped or
+    doubled letters in long names.
+    """
+
+    def __init__(self, words=()):
+        self.grams = {}
+        self.postings = collections.defaultdict(set)
+        for word in words:
+            grams = self.grams[word] = trigrams(word)
+            for gram in grams:
+                self.postings[gram].add(word)
+
+    def candidates(self, word):
+        """The words that share at least one trigram with ``word``."""
+        return set().union(*(self.postings.get(gram, ()) for gram in trigrams(word)))
+
+    def search(self, word, threshold=0.4):
+        """Returns ``(similarity, word)`` pairs above ``threshold``, most similar first."""
+        grams = trigrams(word)
+        shared = collections.Counter(match for gram in grams for match in self.postings.get(gram, ()))
+        found = []
+        for match, count in shared.items():
+            similarity = count / len(grams | self.grams[match])
+            if similarity >= threshold:
+                found.append((similarity, match))
+        return sorted(found, reverse=True)
+
+
+class Suggester:
+    """Suggests the closest command names for a mistyped command."""
+
+    def __init__(self, names):
+        self.names = set(names)
+        self.tree = BKTree(sorted(self.names))
+        self.trigrams = TrigramIndex(self.names)
+
+    @classmethod
+    def from_bot(cls, bot):
+        """Indexes the names and aliases of the bot's visible top-level commands."""
+        names = set()
+        for command in bot.commands:
+            if not command.hidden:
+                names.add(command.name)
+                names.update(command.aliases)
+        return cls(names)
+
+    def suggest(self, name, count=3):
+        name = name.lower()
+        if len(name) < 3:
+            # Too short to tell a typo from a message that starts with the prefix.
+            return []
+        limit = 1 if len(name) == 3 else 2
+        found = []
+        for edits, match in self.tree.search(name, limit):
+            # Two edits in a short word are usually a different word ("hello"
+            # is not "help"), unless they swap two letters ("sotre").
+            if edits < 2 or len(name) > 5 or sorted(name) == sorted(match):
+                found.append(match)
+        for _, match in self.trigrams.search(name):
+            if match not in found:
+                found.append(match)
+        return found[:count]
+
+
+Hit = collections.namedtuple('Hit', 'score section number text')
+
+
+class RuleIndex:
+    """Inverted index over the lines of the rule sections, ranked with BM25.
+
+    Each line is a document. A query word that is not in any rule is
+    replaced by the closest indexed words, at most 1 or 2 edits away, so
+    typos still match. Only the words that share a trigram with it are
+    compared, found through a trigram index of the vocabulary.
+    """
+
+    K1 = 1.2
+    B = 0.75
+
+    def __init__(self):
+        self.documents = []
+        self.postings = {}
+        self.lengths = []
+        self.average = 0.0
+        self.vocabulary = TrigramIndex()
+
+    def build(self, registry, keys=RULE_SECTIONS):
+        documents = []
+        postings = collections.defaultdict(list)
+        lengths = []
+        for key in keys:
+            if key not in registry:
+                continue
+            section = registry.section(key)
+            numbered = section.get('numbered')
+            for number, line in enumerate(section.get('lines', ()), start=1):
+                words = terms(line)
+                document = len(documents)
+                documents.append((key, number if numbered else None, line))
+                lengths.append(len(words))
+                for word, frequency in collections.Counter(words).items():
+                    postings[word].append((document, frequency))
+        self.documents = documents
+        self.postings = dict(postings)
+        self.lengths = lengths
+        self.average = sum(lengths) / len(lengths) if lengths else 0.0
+        self.vocabulary = TrigramIndex(self.postings)
+
+    def _expand(self, word):
+        if word in self.postings:
+            return [word]
+        best = 1 if len(word) <= 3 else 2
+        matches = []
+        for candidate in self.vocabulary.candidates(word):
+            if abs(len(candidate) - len(word)) > best:
+                continue
+            edits = distance(word, candidate, best)
+            if edits < best:
+                best, matches = edits, [candidate]
+            elif edits == best:
+                matches.append(candidate)
+        return matches
+
+    def search(self, query, count=5):
+        scores = collections.defaultdict(float)
+        total = len(self.documents)
+        for word in set(terms(query)):
+            for match in self._expand(word):
+                postings = self.postings[match]
+                idf = math.log(1 + (total - len(postings) + 0.5) / (len(postings) + 0.5))
+                for document, frequency in postings:
+                    norm = self.K1 * (1 - self.B + self.B * self.lengths[document] / self.average)
+                    scores[document] += idf * frequency * (self.K1 + 1) / (frequency + norm)
+        best = sorted(scores.items(), key=lambda item: item[1], reverse=True)[:count]
+        return [Hit(score, *self.documents[document]) for document, score in best]
@@ -0,0 +1,50 @@
+import logging
+import signal
+import time
+
+from metrics import Gauge
+
+log = logging.getLogger(__name__)
+
+
+class SessionMonitor:
+    """Follows the gateway session of the process.
+
+    The time from process start to the first READY is logged and exposed as
+    a metric. ``handle_signals`` makes SIGTERM close the bot like Ctrl+C
+    does, so the gateway is closed properly and Discord shows the bot as
+    offline right away instead of waiting for the heartbeat to time out.
+    """
+
+    def __init__(self, bot):
+        self.bot = bot
+        self.started = time.monotonic()
+        self.connect_time = None
+        self._closing = False
+        bot.add_listener(self._on_ready, 'on_ready')
+
+    async def _on_ready(self):
+        if self.connect_time is None:
+            self.connect_time = time.monotonic() - self.started
+            log.info('Connected to the gateway in %.2f seconds', self.connect_time)
+
+    def collectors(self):
+        return [
+            Gauge('bot_gateway_connect_seconds', 'Time from creating the bot until the gateway was ready.',
+                  lambda: {} if self.connect_time is None else {(): self.connect_time}),
+        ]
+
+    async def shutdown(self):
+        if self._closing:
+            return
+        self._closing = True
+        await self.bot.close()
+
+    def handle_signals(self, loop):
+        """Closes the bot through ``shutdown`` on SIGTERM and SIGINT (Ctrl+C)."""
+        for signum in (signal.SIGTERM, signal.SIGINT):
+            try:
+                loop.add_signal_handler(signum, lambda: loop.create_task(self.shutdown()))
+            except (NotImplementedError, RuntimeError):
+                # Windows event loops do not support signal handlers.
+                pass
@@ -0,0 +1,36 @@
+import hashlib
+import json
+import logging
+import os
+
+log = logging.getLogger(__name__)
+
+
+def tree_hash(bot):
+    """Hashes the payload that ``tree.sync`` would upload for the global commands."""
+    payload = sorted((command.to_dict(bot.tree) for command in bot.tree.get_commands()), key=lambda command: command['name'])
+    return hashlib.sha256(json.dumps(payload, sort_keys=True).encode()).hexdigest()
+
+
+async def sync_tree(bot, path):
+    """Bulk uploads the application commands unless they are already registered.
+
+    The hash of the last uploaded tree is stored in ``path`` per application,
+    so restarts with unchanged commands skip the request entirely. Delete the
+    file to force a new upload.
+    """
+    digest = tree_hash(bot)
+    application = str(bot.application_id)
+    stored = {}
+    if os.path.exists(path):
+        with open(path, encoding='utf-8') as file:
+            stored = json.load(file)
+    if stored.get(application) == digest:
+        log.info('Application commands are up to date, skipping sync')
+        return False
+    commands = await bot.tree.sync()
+    stored[application] = digest
+    with open(path, 'w', encoding='utf-8') as file:
+        json.dump(stored, file)
+    log.info('Synced %d application commands', len(commands))
+    return True
@@ -0,0 +1,136 @@
+import asyncio
+import json
+import struct
+import time
+
+# Protocol version sent in the handshake. -1 asks the server to answer with
+# its own version, which is what status checkers conventionally send.
+PROTOCOL_VERSION = -1
+
+
+class PingError(Exception):
+    """The server did not answer the Server List Ping as expected."""
+
+
+def pack_varint(value):
+    value &= 0xFFFFFFFF
+    data = bytearray()
+    while True:
+        byte = value & 0x7F
+        value >>= 7
+        if value:
+            data.append(byte | 0x80)
+        else:
+            data.append(byte)
+            return bytes(data)
+
+
+def pack_string(value):
+    data = value.encode('utf-8')
+    return pack_varint(len(data)) + data
+
+
+def pack_packet(packet_id, payload=b''):
+    body = pack_varint(packet_id) + payload
+    return pack_varint(len(body)) + body
+
+
+async def read_varint(reader):
+    value = 0
+    for position in range(5):
+        byte = (await reader.readexactly(1))[0]
+        value |= (byte & 0x7F) << (7 * position)
+        if not byte & 0x80:
+            if value & 0x80000000:
+                value -= 1 << 32
+            return value
+    raise PingError('VarInt is too long')
+
+
+def unpack_varint(data, offset=0):
+    value = 0
+    for position in range(5):
+        if offset >= len(data):
+            raise PingError('Truncated VarInt')
+        byte = data[offset]
+        offset += 1
+        value |= (byte & 0x7F) << (7 * position)
+        if not byte & 0x80:
+            return value, offset
+    raise PingError('VarInt is too long')
+
+
+async def read_packet(reader, max_length=1 << 21):
+    length = await read_varint(reader)
+    if not 0 < length <= max_length:
+        raise PingError(f'Invalid packet length {length}')
+    data = await reader.readexactly(length)
+    packet_id, offset = unpack_varint(data)
+    return packet_id, data[offset:]
+
+
+def motd_text(description):
+    """Flattens the MOTD chat component into plain text."""
+    if isinstance(description, str):
+        return description
+    if not isinstance(description, dict):
+        return ''
+    text = description.get('text', '')
+    if not isinstance(text, str):
+        text = ''
+    extra = description.get('extra', ())
+    for part in extra if isinstance(extra, list) else ():
+        text += motd_text(part)
+    return text
+
+
+async def ping(host, port=25565, timeout=5.0):
+    """Runs a Server List Ping against a Minecraft Java server.
+
+    Returns the decoded status JSON with an extra ``latency`` key, the round
+    trip of the ping/pong exchange in seconds. Raises ``PingError``,
+    ``OSError`` or ``asyncio.TimeoutError`` when the server cannot be reached
+    or answers something that is not a status response.
+    """
+    try:
+        return await asyncio.wait_for(_ping(host, port), timeout)
+    except asyncio.IncompleteReadError as error:
+        raise PingError('Connection closed before the status response') from error
+
+
+async def _ping(host, port):
+    reader, writer = await asyncio.open_connection(host, port)
+    try:
+        handshake = pack_varint(PROTOCOL_VERSION) + pack_string(host) + struct.pack('>H', port) + pack_varint(1)
+        started = time.perf_counter()
+        writer.write(pack_packet(0x00, handshake) + pack_packet(0x00))
+        await writer.drain()
+        packet_id, payload = await read_packet(reader)
+        status_latency = time.perf_counter() - started
+        if packet_id != 0x00:
+            raise PingError(f'Unexpected packet {packet_id:#x} instead of a status response')
+        length, offset = unpack_varint(payload)
+        try:
+            status = json.loads(payload[offset:offset + length].decode('utf-8'))
+        except (ValueError, RecursionError) as error:
+            raise PingError('Invalid status JSON') from error
+        if not isinstance(status, dict):
+            raise PingError('Status JSON is not an object')
+
+        token = time.monotonic_ns() & 0x7FFFFFFFFFFFFFFF
+        sent = time.perf_counter()
+        writer.write(pack_packet(0x01, struct.pack('>q', token)))
+        await writer.drain()
+        try:
+            packet_id, payload = await read_packet(reader)
+        except (asyncio.IncompleteReadError, ConnectionError):
+            # Some proxies close the connection instead of answering the
+            # ping; the status exchange is then the best latency estimate.
+            status['latency'] = status_latency
+            return status
+        if packet_id != 0x01 or len(payload) < 8 or struct.unpack('>q', payload[:8])[0] != token:
+            raise PingError('Invalid pong')
+        status['latency'] = time.perf_counter() - sent
+        return status
+    finally:
+        writer.close()
@@ -0,0 +1,104 @@
+import contextlib
+import sys
+import time
+
+
+class _TimedLoader:
+    """Wraps a module loader to measure how long the module takes to run."""
+
+    def __init__(self, loader, profile):
+        self._loader = loader
+        self._profile = profile
+
+    def __getattr__(self, name):
+        return getattr(self._loader, name)
+
+    def create_module(self, spec):
+        return self._loader.create_module(spec)
+
+    def exec_module(self, module):
+        profile = self._profile
+        profile._stack.append(0.0)
+        started = time.perf_counter()
+        try:
+            self._loader.exec_module(module)
+        finally:
+            total = time.perf_counter() - started
+            children = profile._stack.pop()
+            if profile._stack:
+                profile._stack[-1] += total
+            profile.imports[module.__name__] = (total, total - children)
+
+
+class _ImportTimer:
+    """Meta path finder that times every module imported after it is installed."""
+
+    def __init__(self, profile):
+        self.profile = profile
+
+    def find_spec(self, name, path=None, target=None):
+        for finder in sys.meta_path[sys.meta_path.index(self) + 1:]:
+            find_spec = getattr(finder, 'find_spec', None)
+            if find_spec is None:
+                continue
+            spec = find_spec(name, path, target)
+            if spec is not None:
+                if spec.loader is not None and hasattr(spec.loader, 'exec_module'):
+                    spec.loader = _TimedLoader(spec.loader, self.profile)
+                return spec
+        return None
+
+
+class StartupProfile:
+    """Timings of the startup, printed with ``--profile-startup``.
+
+    ``mark`` closes a phase that follows the previous one (imports, building
+    the bot, logging in, connecting to the gateway) and ``step`` times work
+    that overlaps them, such as loading an extension. When enabled, every import is timed
+    too, with its total time and the time spent in the module itself,
+    excluding the modules it imported.
+    """
+
+    def __init__(self, enabled=False):
+        self.enabled = enabled
+        self.started = time.perf_counter()
+        self.steps = []
+        self._last = self.started
+        self.imports = {}
+        self._stack = []
+        self._timer = None
+        if enabled:
+            self._timer = _ImportTimer(self)
+            sys.meta_path.insert(0, self._timer)
+
+    @classmethod
+    def from_argv(cls, argv=None):
+        argv = sys.argv[1:] if argv is None else argv
+        return cls('--profile-startup' in argv)
+
+    @contextlib.contextmanager
+    def step(self, name):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.steps.append((name, started - self.started, time.perf_counter() - started))
+
+    def mark(self, name):
+        """Records ``name`` as the phase that ran since the previous mark."""
+        now = time.perf_counter()
+        self.steps.append((name, self._last - self.started, now - self._last))
+        self._last = now
+
+    def report(self, top=15):
+        if self._timer in sys.meta_path:
+            sys.meta_path.remove(self._timer)
+        lines = ['Startup profile (ms)', '  step                               at   duration']
+        for name, at, duration in self.steps:
+            lines.append(f'  {name:<30} {at * 1000:>7.1f} {duration * 1000:>10.1f}')
+        if self.imports:
+            lines.append(f'  slowest imports of {len(self.imports)}          total       self')
+            slowest = sorted(self.imports.items(), key=lambda item: item[1][1], reverse=True)[:top]
+            for name, (total, own) in slowest:
+                lines.append(f'  {name:<30} {total * 1000:>7.1f} {own * 1000:>10.1f}')
+        return '\n'.join(lines)
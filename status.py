@@ -0,0 +1,262 @@
+import array
+import asyncio
+import collections
+import functools
+import math
+import logging
+import time
+import types
+
+import discord
+
+import slp
+
+log = logging.getLogger(__name__)
+
+Snapshot = collections.namedtuple('Snapshot', 'online players max_players version motd latency checked_at timestamp error')
+
+
+def snapshot_from_status(status, checked_at):
+    players = status.get('players') or {}
+    version = status.get('version') or {}
+    if not isinstance(players, dict) or not isinstance(version, dict):
+        raise slp.PingError('Invalid status JSON')
+    online, max_players = players.get('online', 0), players.get('max', 0)
+    if not all(isinstance(count, int) and 0 <= count < 1 << 31 for count in (online, max_players)):
+        raise slp.PingError('Invalid player count')
+    name = version.get('name', '')
+    return Snapshot(
+        online=True,
+        players=online,
+        max_players=max_players,
+        version=name if isinstance(name, str) else '',
+        motd=slp.motd_text(status.get('description', '')).strip(),
+        latency=status['latency'],
+        checked_at=checked_at,
+        timestamp=time.time(),
+        error=None,
+    )
+
+
+def offline_snapshot(error, checked_at):
+    return Snapshot(False, 0, 0, '', '', None, checked_at, time.time(), str(error) or type(error).__name__)
+
+
+class History:
+    """Fixed-size ring buffer of ping samples backed by ``array`` columns.
+
+    Uptime and average latency are kept as running sums that are adjusted
+    when a sample is overwritten, so summaries never walk an unbounded list;
+    the peak is a scan of at most ``size`` integers.
+    """
+
+    def __init__(self, size):
+        self.size = size
+        self.timestamps = array.array('d', bytes(8 * size))
+        self.players = array.array('l', bytes(array.array('l').itemsize * size))
+        self.latencies = array.array('d', [math.nan]) * size
+        self.count = 0
+        self._next = 0
+        self._online = 0
+        self._latency_total = 0.0
+
+    def __len__(self):
+        return self.count
+
+    def _add(self, index, sign):
+        latency = self.latencies[index]
+        if not math.isnan(latency):
+            self._online += sign
+            self._latency_total += sign * latency
+
+    def append(self, snapshot):
+        index = self._next
+        if self.count == self.size:
+            self._add(index, -1)
+        else:
+            self.count += 1
+        self.timestamps[index] = snapshot.timestamp
+        self.players[index] = snapshot.players
+        self.latencies[index] = snapshot.latency if snapshot.online else math.nan
+        self._add(index, 1)
+        self._next = (index + 1) % self.size
+
+    def uptime(self):
+        return self._online / self.count if self.count else None
+
+    def average_latency(self):
+        return self._latency_total / self._online if self._online else None
+
+    def peak_players(self):
+        return max(self.players[:self.count]) if self.count else 0
+
+    def since(self):
+        """Timestamp of the oldest sample kept."""
+        if not self.count:
+            return None
+        return self.timestamps[self._next if self.count == self.size else 0]
+
+
+class StatusCache:
+    """Cached Server List Ping result for one Minecraft server.
+
+    A background task calls ``refresh`` periodically; commands call ``get``,
+    which returns the cached snapshot while it is younger than ``ttl`` and
+    otherwise waits for a refresh. Concurrent refreshes share a single ping.
+    """
+
+    def __init__(self, host, port=25565, ttl=60.0, timeout=5.0, name=None, history=2880):
+        self.host = host
+        self.port = port
+        self.ttl = ttl
+        self.timeout = timeout
+        self.name = name or host
+        self.history = History(history)
+        self.snapshot = None
+        self._refreshing = None
+        self._payload = None
+
+    def is_fresh(self):
+        return self.snapshot is not None and time.monotonic() - self.snapshot.checked_at < self.ttl
+
+    async def get(self):
+        if self.is_fresh():
+            return self.snapshot
+        return await self.refresh()
+
+    async def refresh(self):
+        if self._refreshing is None:
+            self._refreshing = asyncio.ensure_future(self._ping())
+        try:
+            return await asyncio.shield(self._refreshing)
+        finally:
+            if self._refreshing is not None and self._refreshing.done():
+                self._refreshing = None
+
+    async def _ping(self):
+        try:
+            status = await slp.ping(self.host, self.port, self.timeout)
+            snapshot = snapshot_from_status(status, time.monotonic())
+        except (OSError, asyncio.TimeoutError, slp.PingError) as error:
+            log.debug('Ping to %s:%s failed: %r', self.host, self.port, error)
+            snapshot = offline_snapshot(error, time.monotonic())
+        return self.record(snapshot)
+
+    def record(self, snapshot):
+        self.snapshot = snapshot
+        self.history.append(snapshot)
+        self._payload = None
+        return snapshot
+
+    async def payload(self, registry, overrides=None):
+        """The embed for the current snapshot in the language of ``registry`` and the guild's prefix, rendered once per refresh."""
+        snapshot = await self.get()
+        if self._payload is None or self._payload[0] is not snapshot:
+            self._payload = (snapshot, {})
+        payloads = self._payload[1]
+        variant = (registry.locale, (overrides or {}).get('prefix'))
+        payload = payloads.get(variant)
+        if payload is None:
+            payload = payloads[variant] = types.MappingProxyType({'embed': render_status(self.host, snapshot, functools.partial(registry.text, overrides=overrides))})
+        return payload
+
+
+def render_status(address, snapshot, text):
+    if snapshot.online:
+        embed = discord.Embed(
+            title=text('status_title'),
+            description=text('status_online', address=address, timestamp=int(snapshot.timestamp)),
+            color=discord.Color.purple()
+        )
+        embed.add_field(name=text('players'), value=f'{snapshot.players}/{snapshot.max_players}')
+        embed.add_field(name=text('version'), value=snapshot.version or '?')
+        embed.add_field(name=text('latency'), value=f'{snapshot.latency * 1000:.0f} ms')
+        if snapshot.motd:
+            embed.add_field(name=text('motd'), value=snapshot.motd[:1024], inline=False)
+    else:
+        embed = discord.Embed(
+            title=text('status_title'),
+            description=text('status_offline', address=address, timestamp=int(snapshot.timestamp)),
+            color=discord.Color.purple()
+        )
+    embed.set_footer(text=text('more_commands'))
+    return embed
+
+
+class Network:
+    """The Minecraft servers of the network, pinged together.
+
+    ``refresh`` pings every server concurrently, at most ``concurrency`` at
+    a time, each one bounded by its own timeout. A server whose refresh
+    fails unexpectedly is recorded as offline without affecting the others.
+    The first server is the main one, shown by ``+status``.
+    """
+
+    def __init__(self, servers, concurrency=8):
+        self.servers = servers
+        self.concurrency = concurrency
+        # Created in ``refresh``: before Python 3.10 a semaphore made outside
+        # the running loop is bound to the wrong one.
+        self._semaphore = None
+        self._payload = None
+
+    @property
+    def primary(self):
+        return self.servers[0]
+
+    async def _refresh_one(self, server):
+        async with self._semaphore:
+            try:
+                return await server.refresh()
+            except Exception as error:
+                log.exception('Refreshing the status of %s failed', server.name)
+                return server.record(offline_snapshot(error, time.monotonic()))
+
+    async def refresh(self):
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.concurrency)
+        return await asyncio.gather(*(self._refresh_one(server) for server in self.servers))
+
+    async def payload(self, registry, overrides=None):
+        """The +network embed in the language of ``registry`` and the guild's prefix, rendered again only after new samples arrive."""
+        for server in self.servers:
+            if not server.is_fresh():
+                await self.refresh()
+                break
+        key = tuple(server.snapshot for server in self.servers)
+        if self._payload is None or self._payload[0] != key:
+            self._payload = (key, {})
+        payloads = self._payload[1]
+        variant = (registry.locale, (overrides or {}).get('prefix'))
+        payload = payloads.get(variant)
+        if payload is None:
+            payload = payloads[variant] = types.MappingProxyType({'embed': render_network(self.servers, functools.partial(registry.text, overrides=overrides))})
+        return payload
+
+
+def render_network(servers, text):
+    online = sum(1 for server in servers if server.snapshot.online)
+    players = sum(server.snapshot.players for server in servers)
+    embed = discord.Embed(
+        title=text('network_title'),
+        description=text('network_summary', online=online, servers=len(servers), players=players),
+        color=discord.Color.purple()
+    )
+    for server in servers:
+        snapshot = server.snapshot
+        history = server.history
+        lines = []
+        if snapshot.online:
+            lines.append(text('network_online', players=snapshot.players, max_players=snapshot.max_players, latency=snapshot.latency * 1000))
+        else:
+            lines.append(text('network_offline'))
+        uptime = history.uptime()
+        if uptime is not None:
+            lines.append(text('uptime', uptime=uptime, since=int(history.since())))
+            lines.append(text('peak', players=history.peak_players()))
+        average = history.average_latency()
+        if average is not None:
+            lines.append(text('average_latency', latency=average * 1000))
+        embed.add_field(name=server.name, value='\n'.join(lines), inline=False)
+    embed.set_footer(text=text('more_commands'))
+    return embed
@@ -0,0 +1,139 @@
+import asyncio
+import os
+import struct
+import sys
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import rcon  # noqa: E402
+
+PASSWORD = 'secret'
+
+
+class FakeServer:
+    """Minecraft RCON server on localhost.
+
+    ``echo <text>`` answers ``<text>``, ``wait`` is only answered after the
+    next command of the same connection, ``drop`` closes the connection
+    and ``long`` answers with a response split over two packets.
+    """
+
+    def __init__(self):
+        self.server = None
+        self.port = None
+        self.logins = 0
+        self.writers = []
+
+    async def __aenter__(self):
+        self.server = await asyncio.start_server(self.handle, '127.0.0.1', 0)
+        self.port = self.server.sockets[0].getsockname()[1]
+        return self
+
+    async def __aexit__(self, *exc_info):
+        for writer in self.writers:
+            writer.close()
+        self.server.close()
+        await self.server.wait_closed()
+
+    def answer(self, writer, request_id, body):
+        payload = struct.pack('<ii', request_id, rcon.SERVERDATA_RESPONSE_VALUE) + body.encode('utf-8') + b'\x00\x00'
+        writer.write(struct.pack('<i', len(payload)) + payload)
+
+    async def handle(self, reader, writer):
+        self.writers.append(writer)
+        waiting = None
+        try:
+            while True:
+                request_id, packet_type, body = await rcon.read_packet(reader)
+                if packet_type == rcon.SERVERDATA_AUTH:
+                    if body != PASSWORD:
+                        self.answer(writer, -1, '')
+                        await writer.drain()
+                        return
+                    self.logins += 1
+                    self.answer(writer, request_id, '')
+                elif body == 'wait':
+                    waiting = request_id
+                    continue
+                elif body == 'drop':
+                    return
+                elif body == 'long':
+                    self.answer(writer, request_id, 'x' * rcon.MAX_FRAGMENT)
+                    self.answer(writer, request_id, 'y')
+                else:
+                    self.answer(writer, request_id, body[len('echo '):] if body.startswith('echo ') else body)
+                    if waiting is not None:
+                        self.answer(writer, waiting, 'waited')
+                        waiting = None
+                await writer.drain()
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            writer.close()
+
+
+class RconTest(unittest.IsolatedAsyncioTestCase):
+
+    async def test_command(self):
+        async with FakeServer() as server:
+            pool = rcon.RconPool('127.0.0.1', server.port, PASSWORD)
+            self.assertEqual(await pool.command('echo hello'), 'hello')
+            self.assertEqual(await pool.command('long'), 'x' * rcon.MAX_FRAGMENT + 'y')
+            pool.close()
+
+    async def test_pipelining(self):
+        async with FakeServer() as server:
+            connection = rcon.RconConnection('127.0.0.1', server.port, PASSWORD)
+            await connection.connect()
+            # The first command is only answered after the second one was
+            # sent on the same connection, and each gets its own output.
+            first = asyncio.ensure_future(connection.command('wait'))
+            await asyncio.sleep(0.05)
+            self.assertFalse(first.done())
+            self.assertEqual(await connection.command('echo second'), 'second')
+            self.assertEqual(await first, 'waited')
+            self.assertEqual(server.logins, 1)
+            connection.close()
+
+    async def test_concurrent_commands_share_connections(self):
+        async with FakeServer() as server:
+            pool = rcon.RconPool('127.0.0.1', server.port, PASSWORD, size=2)
+            results = await asyncio.gather(*(pool.command(f'echo {number}') for number in range(20)))
+            self.assertEqual(results, [str(number) for number in range(20)])
+            self.assertLessEqual(server.logins, 2)
+            pool.close()
+
+    async def test_rejected_password(self):
+        async with FakeServer() as server:
+            pool = rcon.RconPool('127.0.0.1', server.port, 'wrong')
+            with self.assertRaises(rcon.RconAuthError):
+                await pool.command('echo hello')
+            self.assertEqual(server.logins, 0)
+            pool.close()
+
+    async def test_reconnect(self):
+        async with FakeServer() as server:
+            pool = rcon.RconPool('127.0.0.1', server.port, PASSWORD, size=1, timeout=1.0, retry=0)
+            self.assertEqual(await pool.command('echo before'), 'before')
+            with self.assertRaises(rcon.RconError):
+                await pool.command('drop')
+            self.assertEqual(await pool.command('echo after'), 'after')
+            self.assertEqual(server.logins, 2)
+            pool.close()
+
+    async def test_unreachable(self):
+        server = await asyncio.start_server(lambda reader, writer: None, '127.0.0.1', 0)
+        port = server.sockets[0].getsockname()[1]
+        server.close()
+        await server.wait_closed()
+        pool = rcon.RconPool('127.0.0.1', port, PASSWORD, size=1, retry=60)
+        with self.assertRaises(rcon.RconError):
+            await pool.command('echo hello')
+        # Within the retry delay the pool fails fast instead of connecting again.
+        with self.assertRaisesRegex(rcon.RconError, 'retrying'):
+            await pool.command('echo hello')
+
+
+if __name__ == '__main__':
+    unittest.main()
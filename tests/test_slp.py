@@ -0,0 +1,159 @@
+import asyncio
+import json
+import os
+import struct
+import sys
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import slp  # noqa: E402
+from status import Network, StatusCache  # noqa: E402
+
+STATUS = {
+    'version': {'name': 'Paper 1.21.1', 'protocol': 767},
+    'players': {'max': 100, 'online': 7},
+    'description': {'text': 'Hello ', 'extra': [{'text': 'world'}]},
+}
+
+
+class FakeServer:
+    """Minecraft server on localhost that answers the Server List Ping.
+
+    ``status`` is the payload of the status response, and ``pong`` whether
+    the ping is answered.
+    """
+
+    def __init__(self, status, pong=True):
+        self.status = status
+        self.pong = pong
+        self.server = None
+        self.port = None
+
+    async def __aenter__(self):
+        self.server = await asyncio.start_server(self.handle, '127.0.0.1', 0)
+        self.port = self.server.sockets[0].getsockname()[1]
+        return self
+
+    async def __aexit__(self, *exc_info):
+        self.server.close()
+        await self.server.wait_closed()
+
+    async def handle(self, reader, writer):
+        try:
+            await slp.read_packet(reader)  # Handshake
+            await slp.read_packet(reader)  # Status request
+            if self.status is None:
+                return
+            writer.write(slp.pack_packet(0x00, self.status))
+            await writer.drain()
+            packet_id, payload = await slp.read_packet(reader)
+            if self.pong:
+                writer.write(slp.pack_packet(packet_id, payload))
+                await writer.drain()
+        except asyncio.IncompleteReadError:
+            pass
+        finally:
+            writer.close()
+
+
+def status_payload(value):
+    return slp.pack_string(json.dumps(value))
+
+
+class PingTest(unittest.IsolatedAsyncioTestCase):
+
+    async def test_status(self):
+        async with FakeServer(status_payload(STATUS)) as server:
+            status = await slp.ping('127.0.0.1', server.port)
+        self.assertEqual(status['players'], {'max': 100, 'online': 7})
+        self.assertEqual(slp.motd_text(status['description']), 'Hello world')
+        self.assertGreaterEqual(status['latency'], 0)
+
+    async def test_no_pong(self):
+        async with FakeServer(status_payload(STATUS), pong=False) as server:
+            status = await slp.ping('127.0.0.1', server.port)
+        self.assertIn('latency', status)
+
+    async def test_empty_payload(self):
+        async with FakeServer(b'') as server:
+            with self.assertRaises(slp.PingError):
+                await slp.ping('127.0.0.1', server.port)
+
+    async def test_truncated_payload(self):
+        async with FakeServer(b'\xff') as server:
+            with self.assertRaises(slp.PingError):
+                await slp.ping('127.0.0.1', server.port)
+
+    async def test_json_array(self):
+        async with FakeServer(status_payload([1, 2, 3])) as server:
+            with self.assertRaises(slp.PingError):
+                await slp.ping('127.0.0.1', server.port)
+
+    async def test_invalid_json(self):
+        async with FakeServer(slp.pack_string('{"players":')) as server:
+            with self.assertRaises(slp.PingError):
+                await slp.ping('127.0.0.1', server.port)
+
+    async def test_closed_before_status(self):
+        async with FakeServer(None) as server:
+            with self.assertRaises(slp.PingError):
+                await slp.ping('127.0.0.1', server.port)
+
+    async def test_short_pong(self):
+        async def handle(reader, writer):
+            await slp.read_packet(reader)
+            await slp.read_packet(reader)
+            writer.write(slp.pack_packet(0x00, status_payload(STATUS)))
+            await slp.read_packet(reader)
+            writer.write(slp.pack_packet(0x01, struct.pack('>h', 1)))
+            await writer.drain()
+            writer.close()
+
+        server = await asyncio.start_server(handle, '127.0.0.1', 0)
+        try:
+            with self.assertRaises(slp.PingError):
+                await slp.ping('127.0.0.1', server.sockets[0].getsockname()[1])
+        finally:
+            server.close()
+            await server.wait_closed()
+
+
+class StatusCacheTest(unittest.IsolatedAsyncioTestCase):
+
+    async def test_online(self):
+        async with FakeServer(status_payload(STATUS)) as server:
+            snapshot = await StatusCache('127.0.0.1', server.port).refresh()
+        self.assertTrue(snapshot.online)
+        self.assertEqual((snapshot.players, snapshot.max_players, snapshot.version), (7, 100, 'Paper 1.21.1'))
+
+    async def test_malformed_status_is_offline(self):
+        for payload in (b'', status_payload([1, 2, 3]), status_payload({'players': [7]}), status_payload({'players': {'online': 'many'}})):
+            with self.subTest(payload=payload):
+                async with FakeServer(payload) as server:
+                    snapshot = await StatusCache('127.0.0.1', server.port).refresh()
+                self.assertFalse(snapshot.online)
+                self.assertTrue(snapshot.error)
+
+
+class BrokenCache(StatusCache):
+
+    async def _ping(self):
+        raise RuntimeError('boom')
+
+
+class NetworkTest(unittest.IsolatedAsyncioTestCase):
+
+    async def test_failure_is_isolated(self):
+        async with FakeServer(status_payload(STATUS)) as server:
+            network = Network([StatusCache('127.0.0.1', server.port, name='main'), BrokenCache('127.0.0.1', 1, name='broken')])
+            with self.assertLogs('status', 'ERROR'):
+                main, broken = await network.refresh()
+        self.assertTrue(main.online)
+        self.assertFalse(broken.online)
+        self.assertEqual(broken.error, 'boom')
+        self.assertIs(network.servers[1].snapshot, broken)
+
+
+if __name__ == '__main__':
+    unittest.main()
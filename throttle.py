@@ -0,0 +1,82 @@
+import collections
+import time
+
+import discord
+from discord.ext import commands
+
+
+class Throttle:
+    """Global command check with per-user, per-channel and per-guild cooldowns.
+
+    Each limit is a ``(rate, per)`` pair: at most ``rate`` commands every
+    ``per`` seconds, or None to disable it. A command over any limit fails
+    with ``CommandOnCooldown`` before its callback runs, so it sends nothing.
+    """
+
+    def __init__(self, user=None, channel=None, guild=None):
+        self.mappings = []
+        for limit, bucket_type in ((user, commands.BucketType.user), (channel, commands.BucketType.channel), (guild, commands.BucketType.guild)):
+            if limit is not None:
+                rate, per = limit
+                self.mappings.append(commands.CooldownMapping.from_cooldown(rate, per, bucket_type))
+
+    async def __call__(self, ctx):
+        now = time.time()
+        for mapping in self.mappings:
+            bucket = mapping.get_bucket(ctx.message, now)
+            retry_after = bucket.update_rate_limit(now)
+            if retry_after:
+                raise commands.CommandOnCooldown(bucket, retry_after, mapping.type)
+        return True
+
+    def allows(self, ctx):
+        """Counts an answer that is not a command, such as a suggestion, against the same limits."""
+        now = time.time()
+        for mapping in self.mappings:
+            if mapping.get_bucket(ctx.message, now).update_rate_limit(now):
+                return False
+        return True
+
+
+class Deduper:
+    """Avoids posting the same static embed twice in a channel within ``window`` seconds.
+
+    A repeated request gets a short reply pointing at the message that is
+    already in the channel instead of the full embed, in the language of
+    ``registry``. At most ``size`` channel/key pairs are remembered.
+    """
+
+    def __init__(self, window, size=10000):
+        self.window = window
+        self.size = size
+        self._recent = collections.OrderedDict()
+
+    def lookup(self, channel_id, key):
+        entry = self._recent.get((channel_id, key))
+        if entry is None:
+            return None
+        if entry[0] < time.monotonic():
+            del self._recent[(channel_id, key)]
+            return None
+        return entry[1]
+
+    def remember(self, channel_id, key, message):
+        # Only the reference is kept, not the message with its embed.
+        reference = message.to_reference(fail_if_not_exists=False)
+        self._recent[(channel_id, key)] = (time.monotonic() + self.window, reference)
+        self._recent.move_to_end((channel_id, key))
+        while len(self._recent) > self.size:
+            self._recent.popitem(last=False)
+
+    async def send(self, ctx, key, payload, registry):
+        if not self.window or 'embed' not in payload:
+            return await ctx.send(**payload)
+        reference = self.lookup(ctx.channel.id, key)
+        if reference is not None:
+            if ctx.interaction is None:
+                return await ctx.send(registry.text('posted_above'), reference=reference, mention_author=False)
+            return await ctx.send(registry.text('posted_above_link', url=reference.jump_url), ephemeral=True)
+        message = await ctx.send(**payload)
+        if isinstance(message, discord.Message):
+            self.remember(ctx.channel.id, key, message)
+        return message
@@ -0,0 +1,190 @@
+import asyncio
+import collections
+import heapq
+import itertools
+import logging
+import os
+import sys
+import threading
+import time
+
+from metrics import Counter, Gauge
+
+log = logging.getLogger(__name__)
+
+Stall = collections.namedtuple('Stall', 'duration timestamp stack')
+
+# Distinct stacks kept by the profiler; samples of any other stack are
+# counted under a single "[other]" entry.
+PROFILE_STACKS = 20000
+
+
+def loop_frames(frame):
+    """``(file, line, function)`` of each frame, outermost first.
+
+    The frames of asyncio's own machinery below the running callback are
+    left out, so the first frame is the callback or coroutine step that
+    holds the loop.
+    """
+    frames = []
+    while frame is not None:
+        code = frame.f_code
+        frames.append((code.co_filename, frame.f_lineno, code.co_name))
+        frame = frame.f_back
+    frames.reverse()
+    for index in range(len(frames) - 1, -1, -1):
+        filename, _, name = frames[index]
+        if name == '_run' and filename.endswith(os.path.join('asyncio', 'events.py')):
+            return frames[index + 1:] or frames
+    return frames
+
+
+def short_path(filename):
+    parts = filename.replace('\\', '/').split('/')
+    if 'site-packages' in parts:
+        return '/'.join(parts[parts.index('site-packages') + 1:])
+    return '/'.join(parts[-2:]) if len(parts) > 1 and parts[-2] == 'cogs' else parts[-1]
+
+
+def collapse(frames):
+    """One line of a collapsed stack, as read by flamegraph.pl and speedscope."""
+    return ';'.join(f'{name} ({short_path(filename)})' for filename, _, name in frames)
+
+
+class Watchdog:
+    """Watches the event loop from a separate thread.
+
+    A task on the loop wakes up every ``interval`` seconds and notes the
+    time. When the thread sees that the loop has been silent for longer
+    than ``threshold`` seconds, it takes the stack of the loop thread with
+    ``sys._current_frames``, which shows the callback that is blocking it.
+    Once the loop wakes up, the stall is recorded with that stack; the
+    ``size`` longest ones are kept.
+
+    With ``profile`` set to a path, the thread also samples the loop
+    thread every ``profile_interval`` seconds and writes the sample counts
+    of each stack to that file every minute, in the collapsed format read
+    by flamegraph.pl and speedscope. In cluster mode each worker writes its
+    own file.
+    """
+
+    def __init__(self, threshold=0.25, interval=0.1, size=10, profile=None, profile_interval=0.01, worker=None):
+        if profile and worker is not None:
+            root, extension = os.path.splitext(profile)
+            profile = f'{root}-{worker}{extension}'
+        self.threshold = threshold
+        self.interval = interval
+        self.size = size
+        self.profile = profile
+        self.profile_interval = profile_interval
+        self.lag = 0.0
+        self.worst = []
+        self.samples = collections.Counter()
+        self._beat = None
+        self._pending = None
+        self._order = itertools.count()
+        self._loop_thread = None
+        self._task = None
+        self._thread = None
+        self._stop = threading.Event()
+        self.stalls = Counter('bot_event_loop_stalls_total', 'Times the event loop was blocked for longer than the watchdog threshold.')
+
+    def collectors(self):
+        return [
+            self.stalls,
+            Gauge('bot_event_loop_worst_stall_seconds', 'Longest event loop stall kept by the watchdog.', lambda: {(): self.worst_stall()}),
+        ]
+
+    def start(self):
+        """Starts watching; must be called from the event loop."""
+        if self._task is not None:
+            return
+        self._loop_thread = threading.get_ident()
+        self._beat = time.monotonic()
+        self._task = asyncio.get_running_loop().create_task(self._heartbeat())
+        self._thread = threading.Thread(target=self._watch, name='watchdog', daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """Stops the thread, which writes the profile one last time."""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+
+    async def _heartbeat(self):
+        while True:
+            self._beat = time.monotonic()
+            await asyncio.sleep(self.interval)
+            self.lag = max(time.monotonic() - self._beat - self.interval, 0.0)
+            if self.lag > self.threshold:
+                pending = self._pending
+                self._record(self.lag, pending[1] if pending and pending[0] == self._beat else ())
+
+    def _record(self, duration, stack):
+        self.stalls.inc()
+        stall = Stall(duration, time.time(), stack)
+        where = f'{stack[-1][2]} ({short_path(stack[-1][0])}:{stack[-1][1]})' if stack else 'unknown'
+        log.warning('The event loop was blocked for %.3f s in %s', duration, where)
+        entry = (duration, next(self._order), stall)
+        if len(self.worst) < self.size:
+            heapq.heappush(self.worst, entry)
+        elif duration > self.worst[0][0]:
+            heapq.heapreplace(self.worst, entry)
+
+    def offenders(self):
+        """The longest stalls kept, longest first."""
+        return [entry[2] for entry in sorted(self.worst, reverse=True)]
+
+    def worst_stall(self):
+        return max(self.worst)[0] if self.worst else 0.0
+
+    def _stack(self):
+        frame = sys._current_frames().get(self._loop_thread)
+        return loop_frames(frame) if frame is not None else []
+
+    def _watch(self):
+        wait = min(self.interval / 2, self.profile_interval) if self.profile else self.interval / 2
+        written = time.monotonic()
+        while not self._stop.wait(wait):
+            beat = self._beat
+            if time.monotonic() - beat - self.interval > self.threshold and (self._pending is None or self._pending[0] != beat):
+                self._pending = (beat, tuple(self._stack()))
+            if self.profile:
+                self._sample()
+                if time.monotonic() - written > 60:
+                    self.write_profile()
+                    written = time.monotonic()
+        if self.profile:
+            self.write_profile()
+
+    def _sample(self):
+        stack = collapse(self._stack()) or '[idle]'
+        if stack in self.samples or len(self.samples) < PROFILE_STACKS:
+            self.samples[stack] += 1
+        else:
+            self.samples['[other]'] += 1
+
+    def write_profile(self):
+        temporary = self.profile + '.tmp'
+        try:
+            with open(temporary, 'w', encoding='utf-8') as file:
+                for stack, count in list(self.samples.items()):
+                    file.write(f'{stack} {count}\n')
+            os.replace(temporary, self.profile)
+        except OSError as error:
+            log.warning('Could not write the loop profile to %s: %s', self.profile, error)
+
+    def summary(self):
+        """The state of the loop as shown by /health."""
+        return {
+            'lag_ms': round(self.lag * 1000, 1),
+            'stalls': self.stalls.values[()],
+            'worst': [
+                {
+                    'duration_ms': round(stall.duration * 1000, 1),
+                    'timestamp': round(stall.timestamp),
+                    'stack': [f'{short_path(filename)}:{line} in {name}' for filename, line, name in stall.stack[-8:]],
+                }
+                for stall in self.offenders()
+            ],
+        }